@@ -1,39 +1,289 @@
 import argparse
+import json
 import sys
+import time
 
-import pandas as pd
-
-from .constraint import *
+from .algorithms import *
+from .corpus import CORPUS_SUFFIX
 from .grid import *
-from .solve import *
-from .solve_linear import solve_linear
-from .solve_cp import solve_cp
-from .solve import solve as solve_custom
-
-# dict name -> solve function
-ALGORITHMS = {
-    "ip": solve_linear,
-    "cp": solve_cp,
-    "custom": solve_custom,
-}
+from .trace import *
+
+# The subcommands import the modules they need, so that the command line
+# starts without the solvers, the combination table or the server.
+
+# number of functions listed by --profile
+PROFILE_LINES = 25
 
 def cmd_solve(args):
-    df = pd.read_csv(args.csv, header=None)
+    from .cache import Cache
+    from .decompose import solve_decomposed
 
     # create the grid
-    grid = Grid()
-    grid.parse_df(df)
+    with trace_span("parse"):
+        grid = Grid()
+        grid.parse_csv(args.csv)
 
-    # get the solve function
-    solve_fnc = ALGORITHMS[args.algo]
+    if args.unique or args.count_solutions is not None:
+        return _count_solutions(grid, args)
+
+    # a cached solution skips building and solving the model
+    cache = None if args.no_cache else Cache(args.cache)
+    with trace_span("cache"):
+        grid2 = cache.get(grid) if cache is not None else None
+    if grid2 is not None:
+        print("found solution in cache {}".format(cache.path))
+    else:
+        # solve each independent part of the puzzle
+        with trace_span("solve"):
+            grid2 = solve_decomposed(grid, args.algo, args.jobs,
+                                     **_solve_options(args))
+        if cache is not None:
+            with trace_span("cache"):
+                cache.put(grid, grid2)
+
+    output = args.output if args.output is not None else "solution.csv"
+    with trace_span("write"):
+        grid2.write_csv(output)
+
+
+def _count_solutions(grid, args):
+    # a second solution is enough to show that a puzzle is not unique
+    from .decompose import enumerate_decomposed
+
+    limit = 2 if args.unique else args.count_solutions
+    if limit == 0:
+        limit = None
+
+    start = time.time()
+    with trace_span("solve"):
+        solutions = enumerate_decomposed(grid, args.algo, limit, args.jobs,
+                                         **_solve_options(args))
+    elapsed = time.time() - start
+    count = len(solutions)
+    more = " or more" if count == limit else ""
+    print("found {}{} solution(s) in {} s".format(count, more, elapsed))
+
+    if solutions:
+        output = args.output if args.output is not None else "solution.csv"
+        with trace_span("write"):
+            solutions[0].write_csv(output)
+    if args.unique and count != 1:
+        sys.exit("puzzle has no solution" if count == 0 else
+                 "puzzle has more than one solution")
+
+
+def _solve_options(args):
+    """Return the backend options given on the command line."""
+    options = {
+        "encoding": args.cp_encoding,
+        "workers": args.search_workers,
+        "time_limit": args.time_limit,
+        "backend": args.milp_backend,
+        "verbose": True if args.verbose else None,
+        "order": args.order,
+        "engines": args.engines,
+        "log": args.portfolio_log,
+        "presolve": False if args.no_presolve else None,
+    }
+    if args.hint is not None:
+        options["hint"] = Grid()
+        options["hint"].parse_csv(args.hint)
+    return {k: v for k, v in options.items() if v is not None}
+
+
+def cmd_solve_batch(args):
+    from .batch import find_puzzles, solve_batch, solve_vectorized
+
+    paths = find_puzzles(args.puzzles)
+    if not paths:
+        raise RuntimeError("no puzzle files found")
+
+    if args.vectorized:
+        records = solve_vectorized(paths, args.output_dir)
+    else:
+        records = solve_batch(paths, args.algo, args.workers,
+                              args.output_dir)
+
+    # stream one JSON record per puzzle as it completes
+    if args.jsonl is None or args.jsonl == "-":
+        out = sys.stdout
+    else:
+        out = open(args.jsonl, "w")
+    failed = 0
+    try:
+        for record in records:
+            if record["status"] != "solved":
+                failed += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print("solved {}/{} puzzles".format(len(paths) - failed, len(paths)),
+          file=sys.stderr)
+
+
+def cmd_bench(args):
+    from .batch import find_puzzles
+    from .bench import (bench, bench_parallel, bench_startup,
+                        bench_throughput, generated_puzzles,
+                        startup_commands)
+    from .corpus import read_text
+
+    algos = args.algo if args.algo else algorithm_names()
+
+    if args.startup is not None:
+        commands = startup_commands(args.startup)
+        records = bench_startup(commands, args.repeat, args.timeout)
+        _write_bench(args, records)
+        return
+
+    # read the puzzle files and generate the rest
+    puzzles = []
+    for path in find_puzzles(args.puzzles):
+        puzzles.append((path, read_text(path)))
+    if args.sizes:
+        sizes = [int(s) for s in args.sizes.split(",")]
+        puzzles.extend(generated_puzzles(sizes, args.seed, args.density))
+
+    presolve = {"on": [True], "off": [False], "both": [False, True]}
+    if args.parallel:
+        workers = [int(n) for n in args.parallel.split(",")]
+        _write_bench(args, bench_parallel(puzzles, workers, args.repeat,
+                                          args.timeout))
+        return
+    if args.throughput:
+        _write_bench(args, bench_throughput(algos, puzzles, args.repeat,
+                                            args.timeout))
+        return
+    _write_bench(args, bench(algos, puzzles, args.repeat, args.timeout,
+                             presolve[args.presolve]))
+
+
+def _write_bench(args, records_iter):
+    from .bench import write_csv, write_json
+
+    records = []
+    for record in records_iter:
+        summary = ""
+        if record["status"] == "ok":
+            summary = "median {:.6f} s".format(record["total"]["median"])
+            if "model" in record:
+                summary += ", {} candidates".format(
+                    record["model"]["candidates"])
+            if "rate" in record:
+                summary += ", {:.1f} puzzles/s".format(record["rate"])
+            if "speedup" in record:
+                summary += ", speedup {:.2f}".format(record["speedup"])
+        algo = record["algo"]
+        if record.get("presolve"):
+            algo += "+pre"
+        if "workers" in record:
+            algo += "/{}".format(record["workers"])
+        print("{:14} {:40} {:8} {}".format(
+            algo, record["puzzle"], record["status"], summary),
+            file=sys.stderr)
+        records.append(record)
+
+    out = sys.stdout if args.output is None else open(args.output, "w")
+    try:
+        if args.format == "csv":
+            write_csv(records, out)
+        else:
+            write_json(records, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def cmd_generate(args):
+    from .generate import generate, generate_files
+
+    size = args.size.lower().split("x")
+    if len(size) > 2 or not all(s.isdigit() for s in size):
+        raise RuntimeError("invalid size '{}'".format(args.size))
+    rows = int(size[0])
+    cols = int(size[-1])
+
+    if args.output_dir is not None:
+        paths = generate_files(rows, cols, args.count, args.output_dir,
+                               args.density, args.seed, args.unique,
+                               args.jobs)
+        for path in paths:
+            print(path)
+        return
+
+    if args.count != 1:
+        raise RuntimeError("--output-dir is needed for more than one puzzle")
+    grid = generate(rows, cols, args.density, args.seed, args.unique)
+    if args.output is None:
+        sys.stdout.write(grid.to_text())
+    else:
+        grid.write_csv(args.output)
+
+
+def cmd_serve(args):
+    from .serve import serve
+
+    serve(args.host, args.port, args.unix, algo=args.algo,
+          workers=args.workers, queue_size=args.queue_size,
+          timeout=args.timeout)
+
+
+def cmd_load_test(args):
+    from .batch import find_puzzles
+    from .corpus import read_text
+    from .serve import load_test
+
+    puzzles = []
+    for path in find_puzzles(args.puzzles):
+        puzzles.append(read_text(path))
+    if not puzzles:
+        raise RuntimeError("no puzzle files found")
+
+    result = load_test(puzzles, args.requests, args.concurrency, args.algo,
+                       args.host, args.port, args.unix)
+    latency = result["latency"]
+    print("{:.1f} requests/s, latency p50 {:.4f} s, p99 {:.4f} s, "
+          "max {:.4f} s".format(result["throughput"], latency["p50"],
+                                latency["p99"], latency["max"]),
+          file=sys.stderr)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+def cmd_portfolio_stats(args):
+    from .portfolio import portfolio_stats
+
+    stats = portfolio_stats(args.log)
+    for algo, s in stats.items():
+        print("{:10} {:6} wins, median {:.4f} s".format(
+            algo, s["wins"], s["time"]))
+
+
+def cmd_pack(args):
+    from .batch import find_puzzles
+    from .corpus import is_entry, pack_files
+
+    paths = [p for p in find_puzzles(args.puzzles) if not is_entry(p)]
+    if not paths:
+        raise RuntimeError("no puzzle files found")
+    count = pack_files(paths, args.output)
+    print("packed {} puzzles into {}".format(count, args.output))
+
+
+def cmd_unpack(args):
+    from .corpus import unpack_files
+
+    outputs = unpack_files(args.corpus, args.output_dir)
+    print("wrote {} puzzles to {}".format(len(outputs), args.output_dir))
 
-    # solve
-    grid2 = solve_fnc(grid)
-    df2 = grid2.df()
-    df2.to_csv("solution.csv", header=False, index=False)
-    
 
 def cmd_sums(args):
+    from .combinations import (ALL_DIGITS, combinations, digit_mask,
+                               mask_digits, permutations)
+
     sum = args.sum
     count = args.count
     choices = list(map(lambda x: int(x), args.choices.split(",")))
@@ -43,25 +293,97 @@ def cmd_sums(args):
     print("choices: {}".format(choices))
 
     assert count <= len(choices)
+
+    # look up the digit sets in the precomputed table
+    excluded = ALL_DIGITS & ~digit_mask(choices)
+    masks = combinations(sum, count, excluded)
+
+    print("choice sets:")
+    for mask in masks:
+        print("  {}".format(mask_digits(mask)))
     
     print("choice lists:")
-    for choice_list in generate_sums(sum, count, choices):
-        print("  {}".format(choice_list))
+    for mask in masks:
+        for choice_list in permutations(mask):
+            print("  {}".format(list(choice_list)))
 
 
-def cmd_validate(args):
-    df = pd.read_csv(args.csv, header=None)
+def cmd_table(args):
+    from .combinations import TABLE, TABLE_FILE, save_table
+
+    output = args.output if args.output is not None else TABLE_FILE
+    save_table(output)
+    print("wrote {} table entries to {}".format(len(TABLE), output))
 
+
+def cmd_validate(args):
     # create the grid
     grid = Grid()
-    grid.parse_df(df)
+    grid.parse_csv(args.csv)
 
     print("found {} numerical cells".format(len(grid.cells)))
     
 
+def cmd_verify(args):
+    from .batch import find_puzzles
+    from .verify import verify_files
+
+    paths = find_puzzles(args.solutions)
+    if not paths:
+        raise RuntimeError("no solution files found")
+    puzzle = None
+    if args.puzzle is not None:
+        puzzle = Grid()
+        puzzle.parse_csv(args.puzzle)
+
+    records = verify_files(paths, puzzle)
+    invalid = 0
+    for record in records:
+        if record["status"] != "valid":
+            invalid += 1
+            for error in record["errors"]:
+                print("{}: {}".format(record["solution"], error))
+        elif args.verbose:
+            print("{}: valid".format(record["solution"]))
+    print("{}/{} solutions valid".format(len(records) - invalid,
+                                         len(records)), file=sys.stderr)
+    if invalid:
+        sys.exit(1)
+
+
+def _algorithm(name):
+    # argparse type of the algorithm options
+    try:
+        return check_algorithm(name)
+    except RuntimeError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _engines(names):
+    # argparse type of the portfolio engines
+    return [_algorithm(name) for name in names.split(",")]
+
+
 def get_parser():
     parser = argparse.ArgumentParser(
         description="Solve cross sums puzzles")
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=None,
+        help="write timed spans of the run and search counters to FILE")
+    parser.add_argument(
+        "--trace-format",
+        choices=TRACE_FORMATS,
+        default="json",
+        help="format of the trace, json (default) or chrome for "
+             "chrome://tracing and Perfetto")
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="run under cProfile, write the statistics to FILE and list "
+             "the most expensive functions")
     subparsers = parser.add_subparsers()
 
     # solve
@@ -70,8 +392,9 @@ def get_parser():
         help="read a CSV file representing a puzzle and output solution")
     p.add_argument("-a",
         "--algo",
-        choices=ALGORITHMS.keys(),
-        help=f"Select a algorithm from {list(ALGORITHMS.keys())}",
+        type=_algorithm,
+        help=f"Select a algorithm from {list(ALGORITHMS.keys())} or one "
+             "registered by an entry point",
         default="ip")
     p.add_argument(
         "csv",
@@ -80,8 +403,365 @@ def get_parser():
         "--output", "-o",
         default=None,
         help="CSV file containing puzzle solution")
+    p.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="number of processes solving independent parts of the puzzle")
+    p.add_argument(
+        "--cache",
+        default=None,
+        help="SQLite file of cached solutions, by default $CROSSSUMS_CACHE "
+             "or ~/.cache/crosssums/solutions.sqlite")
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="neither read nor store the solution in the cache")
+    p.add_argument(
+        "--cp-encoding",
+        choices=["sum", "table"],
+        default=None,
+        help="cp: encode runs as sum plus all-different (default) or as "
+             "tables of allowed digit orderings")
+    p.add_argument(
+        "--search-workers",
+        type=int,
+        default=None,
+        help="cp, parallel: number of search workers, by default one per "
+             "core")
+    p.add_argument(
+        "--time-limit",
+        type=float,
+        default=None,
+        help="cp, portfolio: seconds allowed for the search")
+    p.add_argument(
+        "--hint",
+        default=None,
+        help="cp: CSV file of a solution whose values are hinted")
+    p.add_argument(
+        "--milp-backend",
+        choices=["cbc", "highs", "scipy"],
+        default=None,
+        help="ip: solve with CBC in a subprocess (default), or with HiGHS "
+             "in process through PuLP or scipy")
+    p.add_argument(
+        "--engines",
+        type=_engines,
+        default=None,
+        help="portfolio: comma-separated algorithms to race, by default "
+             "{}".format(",".join(PORTFOLIO)))
+    p.add_argument(
+        "--portfolio-log",
+        metavar="FILE",
+        default=None,
+        help="portfolio: JSON lines file recording the winners, by default "
+             "$CROSSSUMS_PORTFOLIO_LOG or portfolio.jsonl next to the "
+             "cache, empty to record nothing")
+    p.add_argument(
+        "--order",
+        choices=ORDERINGS,
+        default=None,
+        help="custom: order the runs by fewest candidate fillings "
+             "(combos, default), fewest cells, fewest free cells (fixed), "
+             "or pick them while searching (dynamic)")
+    p.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="custom: print the constraints and every search node")
+    p.add_argument(
+        "--no-presolve",
+        action="store_true",
+        help="build the model from the puzzle as given, without first "
+             "narrowing the digits of its cells")
+    p.add_argument(
+        "--count-solutions",
+        metavar="N",
+        type=int,
+        default=None,
+        help="enumerate up to N solutions, 0 for all, and report the count; "
+             "the first solution is written to the output")
+    p.add_argument(
+        "--unique",
+        action="store_true",
+        help="check that the puzzle has exactly one solution, stopping at "
+             "the second, and exit with an error if not")
     p.set_defaults(func=cmd_solve)
 
+    # solve-batch
+    p = subparsers.add_parser(
+        "solve-batch",
+        help="solve many CSV puzzles on a pool of worker processes")
+    p.add_argument("-a",
+        "--algo",
+        type=_algorithm,
+        help=f"Select a algorithm from {list(ALGORITHMS.keys())} or one "
+             "registered by an entry point",
+        default="ip")
+    p.add_argument(
+        "puzzles",
+        nargs="+",
+        help="CSV files, corpus files, directories of CSV files or glob "
+             "patterns")
+    p.add_argument(
+        "--workers", "-j",
+        type=int,
+        default=None,
+        help="number of worker processes, by default the number of CPUs")
+    p.add_argument(
+        "--output-dir", "-d",
+        default=None,
+        help="directory for per-puzzle solution CSV files, if not given "
+             "the solutions are included in the JSONL records")
+    p.add_argument(
+        "--jsonl",
+        default=None,
+        help="JSONL file for per-puzzle records, by default stdout")
+    p.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="instead of the algorithm, solve the puzzles in this process "
+             "many at a time with array operations, which is fastest for "
+             "many small puzzles")
+    p.set_defaults(func=cmd_solve_batch)
+
+    # bench
+    p = subparsers.add_parser(
+        "bench",
+        help="time the algorithms on example and generated puzzles")
+    p.add_argument("-a",
+        "--algo",
+        action="append",
+        type=_algorithm,
+        help="algorithm to time, may be repeated, by default all of them")
+    p.add_argument(
+        "puzzles",
+        nargs="*",
+        default=["examples/*.csv"],
+        help="CSV files, corpus files, directories or glob patterns, by "
+             "default examples/*.csv")
+    p.add_argument(
+        "--sizes",
+        default="10,15,20",
+        help="comma-separated sizes of generated square puzzles, empty "
+             "for none")
+    p.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the first generated puzzle")
+    p.add_argument(
+        "--density",
+        type=float,
+        default=0.25,
+        help="fraction of blocked cells in generated puzzles")
+    p.add_argument(
+        "--presolve",
+        choices=["on", "off", "both"],
+        default="on",
+        help="time the algorithms with the presolve (default), without "
+             "it, or both to compare the model sizes and times")
+    p.add_argument(
+        "--throughput",
+        action="store_true",
+        help="instead time solving all the puzzles one at a time with each "
+             "algorithm, and together with the vectorized engine, and "
+             "report the puzzles solved per second")
+    p.add_argument(
+        "--parallel",
+        metavar="WORKERS",
+        default=None,
+        help="instead time the parallel search on each puzzle with each of "
+             "the comma-separated numbers of workers, and report the "
+             "speedup over the first")
+    p.add_argument(
+        "--startup",
+        metavar="PUZZLE",
+        default=None,
+        help="instead time the startup of each subcommand in a fresh "
+             "interpreter, reading PUZZLE where needed")
+    p.add_argument(
+        "--repeat", "-r",
+        type=int,
+        default=5,
+        help="number of timed runs per algorithm and puzzle")
+    p.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="seconds allowed for all runs of an algorithm on a puzzle")
+    p.add_argument(
+        "--format",
+        choices=["json", "csv"],
+        default="json",
+        help="format of the results")
+    p.add_argument(
+        "--output", "-o",
+        default=None,
+        help="file for the results, by default stdout")
+    p.set_defaults(func=cmd_bench)
+
+    # generate
+    p = subparsers.add_parser(
+        "generate",
+        help="generate random puzzles")
+    p.add_argument(
+        "size",
+        help="ROWSxCOLS, or N for a square puzzle, counting the sum cells "
+             "in the first row and column")
+    p.add_argument(
+        "--density",
+        type=float,
+        default=0.25,
+        help="fraction of blocked cells")
+    p.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the first puzzle, incremented for each puzzle")
+    p.add_argument(
+        "--unique",
+        action="store_true",
+        help="give digits of the solution until it is unique")
+    p.add_argument(
+        "--count", "-n",
+        type=int,
+        default=1,
+        help="number of puzzles, more than one needs --output-dir")
+    p.add_argument(
+        "--output", "-o",
+        default=None,
+        help="CSV file for a single puzzle, by default stdout")
+    p.add_argument(
+        "--output-dir", "-d",
+        default=None,
+        help="directory for the puzzle CSV files, named "
+             "generated-ROWSxCOLS-seedSEED.csv")
+    p.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=None,
+        help="number of worker processes with --output-dir, by default "
+             "the number of CPUs")
+    p.set_defaults(func=cmd_generate)
+
+    # serve
+    p = subparsers.add_parser(
+        "serve",
+        help="solve puzzles posted over HTTP on warm worker processes")
+    p.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on")
+    p.add_argument(
+        "--port", "-p",
+        type=int,
+        default=8000,
+        help="TCP port to listen on")
+    p.add_argument(
+        "--unix",
+        metavar="PATH",
+        default=None,
+        help="listen on a Unix socket instead of a TCP port")
+    p.add_argument("-a",
+        "--algo",
+        type=_algorithm,
+        default="propagate",
+        help="algorithm of requests that do not choose one")
+    p.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=None,
+        help="number of worker processes, by default the number of CPUs")
+    p.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="number of requests that can wait for a worker, further "
+             "requests are answered with 503")
+    p.add_argument(
+        "--timeout",
+        type=float,
+        default=30,
+        help="seconds allowed per puzzle, requests may ask for less")
+    p.set_defaults(func=cmd_serve)
+
+    # load-test
+    p = subparsers.add_parser(
+        "load-test",
+        help="measure the throughput and latency of a running server")
+    p.add_argument(
+        "puzzles",
+        nargs="*",
+        default=["examples/puzzle*.csv"],
+        help="CSV files, corpus files, directories or glob patterns sent "
+             "in turn, by default examples/puzzle*.csv")
+    p.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address of the server")
+    p.add_argument(
+        "--port", "-p",
+        type=int,
+        default=8000,
+        help="TCP port of the server")
+    p.add_argument(
+        "--unix",
+        metavar="PATH",
+        default=None,
+        help="Unix socket of the server")
+    p.add_argument("-a",
+        "--algo",
+        type=_algorithm,
+        default=None,
+        help="algorithm to ask for, by default the server's")
+    p.add_argument(
+        "--requests", "-n",
+        type=int,
+        default=100,
+        help="number of requests")
+    p.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=4,
+        help="number of requests in flight at once")
+    p.set_defaults(func=cmd_load_test)
+
+    # portfolio-stats
+    p = subparsers.add_parser(
+        "portfolio-stats",
+        help="count the races won by each engine of the portfolio")
+    p.add_argument(
+        "log",
+        nargs="?",
+        default=None,
+        help="JSON lines file of the races, by default the portfolio log")
+    p.set_defaults(func=cmd_portfolio_stats)
+
+    # pack
+    p = subparsers.add_parser(
+        "pack",
+        help="convert CSV puzzles to a binary corpus file")
+    p.add_argument(
+        "output",
+        help="corpus file to write, named *{}".format(CORPUS_SUFFIX))
+    p.add_argument(
+        "puzzles",
+        nargs="+",
+        help="CSV files, directories or glob patterns")
+    p.set_defaults(func=cmd_pack)
+
+    # unpack
+    p = subparsers.add_parser(
+        "unpack",
+        help="convert the puzzles of a corpus file to CSV files")
+    p.add_argument(
+        "corpus",
+        help="corpus file to read")
+    p.add_argument(
+        "output_dir",
+        help="directory for the CSV files, named after the puzzles")
+    p.set_defaults(func=cmd_unpack)
+
     # sums
     p = subparsers.add_parser(
         "sums",
@@ -99,6 +779,36 @@ def get_parser():
         help="comma-separate list of possible addends")
     p.set_defaults(func=cmd_sums)
 
+    # table
+    p = subparsers.add_parser(
+        "table",
+        help="write the precomputed combination table to a file")
+    p.add_argument(
+        "output",
+        nargs="?",
+        default=None,
+        help="file to write, by default the prebuilt table location")
+    p.set_defaults(func=cmd_table)
+
+    # verify
+    p = subparsers.add_parser(
+        "verify",
+        help="check that solution CSV files satisfy every run")
+    p.add_argument(
+        "solutions",
+        nargs="+",
+        help="solution CSV files, directories or glob patterns")
+    p.add_argument(
+        "--puzzle",
+        default=None,
+        help="CSV file of the puzzle whose given digits the solutions "
+             "must keep, by default only the runs are checked")
+    p.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="also list the valid solutions")
+    p.set_defaults(func=cmd_verify)
+
     # validate
     p = subparsers.add_parser(
         "validate",
@@ -116,10 +826,35 @@ def main():
 
     # execute the function
     args = parser.parse_args(sys.argv[1:])
-    if "func" in args:
-        return args.func(args)
-    else:
+    if "func" not in args:
         parser.print_help()
+        return
+
+    if args.trace is not None:
+        start_trace()
+    try:
+        if args.profile is not None:
+            return _profile(args)
+        return args.func(args)
+    finally:
+        tracer = stop_trace()
+        if tracer is not None:
+            tracer.write(args.trace, args.trace_format)
+
+
+def _profile(args):
+    # run the subcommand under cProfile, save the statistics and list
+    # the most expensive functions
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(args.func, args)
+    finally:
+        profiler.dump_stats(args.profile)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
 
     
 if __name__ == "__main__":
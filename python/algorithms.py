@@ -0,0 +1,106 @@
+import importlib
+
+# entry point group under which other packages can register algorithms,
+# each entry point names a solve function taking a Grid
+ENTRY_POINT_GROUP = "crosssums.algorithms"
+
+# dict name -> "module:function" of the solve function, relative modules
+# are in this package.  Modules are only imported when the algorithm is
+# selected, since pulp and ortools are slow to import.
+ALGORITHMS = {
+    "ip": ".solve_linear:solve_linear",
+    "cp": ".solve_cp:solve_cp",
+    "custom": ".solve:solve",
+    "propagate": ".solve_propagate:solve_propagate",
+    "parallel": ".parallel:solve_parallel",
+    "portfolio": ".portfolio:solve_portfolio",
+}
+
+# Options of the built-in algorithms, kept here so that the command line
+# lists them without importing the algorithms.
+
+# engines raced by the portfolio by default
+PORTFOLIO = ["ip", "cp", "custom"]
+
+# orderings of the constraints of the custom search, see
+# solve.get_ordered_constraints()
+ORDERINGS = ["cells", "combos", "fixed", "dynamic"]
+
+
+def algorithm_names():
+    """Return the names of the built-in and registered algorithms.
+    """
+    names = list(ALGORITHMS.keys())
+    for ep in _entry_points():
+        if ep.name not in names:
+            names.append(ep.name)
+    return names
+
+
+def check_algorithm(name):
+    """Return an algorithm name, raising RuntimeError if it is unknown.
+    """
+    if name not in ALGORITHMS and name not in algorithm_names():
+        msg = "unknown algorithm '{}', choose from {}".format(
+            name, algorithm_names())
+        raise RuntimeError(msg)
+    return name
+
+
+def load_algorithm(name):
+    """Import an algorithm and return its solve function.
+    """
+    if name in ALGORITHMS:
+        module, function = ALGORITHMS[name].split(":")
+        return getattr(_import(module), function)
+    return _entry_point(name).load()
+
+
+def load_solver(name):
+    """Import an algorithm and return its solver class.
+
+    Constructing the class with a grid builds the model, and its solve()
+    method returns the solved grid.  Returns None if the algorithm's
+    module has no Solver class.
+    """
+    return getattr(_module(name), "Solver", None)
+
+
+def load_enumerator(name):
+    """Import an algorithm and return its solution enumeration function.
+
+    The function takes a grid and a limit, and returns a list of up to
+    `limit` solved grids.
+    """
+    fnc = getattr(_module(name), "enumerate_solutions", None)
+    if fnc is None:
+        msg = "algorithm '{}' cannot enumerate solutions".format(name)
+        raise RuntimeError(msg)
+    return fnc
+
+
+def _module(name):
+    # the module defining an algorithm's solve function
+    if name in ALGORITHMS:
+        return _import(ALGORITHMS[name].split(":")[0])
+    return importlib.import_module(_entry_point(name).module)
+
+
+def _entry_point(name):
+    for ep in _entry_points():
+        if ep.name == name:
+            return ep
+    check_algorithm(name)
+
+
+def _import(module):
+    if module.startswith("."):
+        return importlib.import_module(module, __package__)
+    return importlib.import_module(module)
+
+
+def _entry_points():
+    # importlib.metadata scans every installed distribution, so it is
+    # only used for names that are not built in
+    import importlib.metadata
+    return importlib.metadata.entry_points(group=ENTRY_POINT_GROUP)
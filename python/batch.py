@@ -0,0 +1,211 @@
+import concurrent.futures
+import contextlib
+import glob
+import io
+import os
+import time
+
+from .algorithms import *
+from .corpus import *
+from .decompose import *
+from .grid import *
+
+
+def find_puzzles(patterns):
+    """Return the puzzle files named by a list of paths.
+
+    Arguments
+    ---------
+    patterns  list of CSV files, corpus files, directories or glob
+              patterns
+
+    Returns
+    -------
+    List of CSV file paths and corpus puzzles "CORPUS#INDEX", see
+    read_puzzle(), without duplicates.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(glob.glob(os.path.join(pattern, "*.csv"))))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+
+    puzzles = []
+    for path in paths:
+        if path.endswith(CORPUS_SUFFIX):
+            puzzles.extend(corpus_entries(path))
+        else:
+            puzzles.append(path)
+    return list(dict.fromkeys(puzzles))
+
+
+def solve_puzzle(path, algo, output=None):
+    """Solve one puzzle file and describe the outcome.
+
+    The puzzle is solved as the solve subcommand does, see
+    solve_decomposed().
+
+    Arguments
+    ---------
+    path        CSV file or corpus puzzle, see read_puzzle()
+    algo        name of the algorithm
+    output      file to write the solution CSV to, or None to return the
+                solution CSV text in the record
+
+    Returns
+    -------
+    Dictionary with the puzzle path, algorithm, status ("solved" or
+    "error"), time in seconds and either the solution or the error.
+    """
+    record = {"puzzle": path, "algo": algo}
+    start = time.perf_counter()
+    try:
+        # the backends print progress which would garble the records
+        with contextlib.redirect_stdout(io.StringIO()):
+            grid = read_puzzle(path)
+            solution = solve_decomposed(grid, algo)
+            text = solution.to_text()
+        _write_record(record, text, output)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = "{}: {}".format(type(e).__name__, e)
+    record["time"] = time.perf_counter() - start
+    return record
+
+
+def solve_batch(paths, algo, workers=None, output_dir=None):
+    """Solve puzzle files on a pool of worker processes.
+
+    Each worker imports the solver module once and then solves puzzles
+    until the batch is done.
+
+    Arguments
+    ---------
+    paths       list of CSV files
+    algo        name of the algorithm
+    workers     number of worker processes, None for the number of CPUs
+    output_dir  directory for the solution files, see output_paths(), or
+                None to return the solutions in the records
+
+    Yields
+    ------
+    The record of each puzzle as it completes.
+    """
+    # fail before starting the pool if the algorithm cannot be loaded
+    load_algorithm(algo)
+
+    if output_dir is not None:
+        outputs = output_paths(paths, output_dir)
+    else:
+        outputs = [None] * len(paths)
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(algo,)) as executor:
+        futures = [executor.submit(solve_puzzle, path, algo, output)
+                   for path, output in zip(paths, outputs)]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def solve_vectorized(paths, output_dir=None, chunk=None):
+    """Solve puzzle files in this process, many at once.
+
+    The puzzles are read and solved `chunk` at a time by
+    solve_vectorized.solve_many(), which propagates them together with
+    array operations and searches only the puzzles left with free cells.
+
+    Arguments
+    ---------
+    paths       list of CSV files or corpus puzzles
+    output_dir  directory for the solution files, see output_paths(), or
+                None to return the solutions in the records
+    chunk       number of puzzles solved together, None for
+                solve_vectorized.CHUNK
+
+    Yields
+    ------
+    The record of each puzzle, see solve_puzzle(), in the order of paths.
+    The time of a puzzle is its share of the time of its chunk.
+    """
+    from . import solve_vectorized as sv
+
+    chunk = chunk or sv.CHUNK
+    if output_dir is not None:
+        outputs = output_paths(paths, output_dir)
+    else:
+        outputs = [None] * len(paths)
+
+    for first in range(0, len(paths), chunk):
+        start = time.perf_counter()
+        records = []
+        grids = []
+        for path in paths[first:first + chunk]:
+            record = {"puzzle": path, "algo": "vectorized"}
+            try:
+                grids.append(read_puzzle(path))
+            except Exception as e:
+                record["status"] = "error"
+                record["error"] = "{}: {}".format(type(e).__name__, e)
+            records.append(record)
+        solutions = iter(sv.solve_many(grids))
+
+        for record, output in zip(records, outputs[first:first + chunk]):
+            if "status" in record:
+                continue
+            solution = next(solutions)
+            if solution is None:
+                record["status"] = "error"
+                record["error"] = "RuntimeError: puzzle has no solution"
+                continue
+            _write_record(record, solution.to_text(), output)
+        elapsed = time.perf_counter() - start
+        for record in records:
+            record["time"] = elapsed / len(records)
+            yield record
+
+
+def output_paths(paths, output_dir):
+    """Return the solution file of each puzzle file.
+
+    The solutions keep the puzzles' paths relative to the directory
+    containing all of them, so puzzles with the same name in different
+    directories get different solution files.  The puzzles of a corpus
+    are in a directory named after the corpus, under their own names.
+    """
+    names = []
+    for path in paths:
+        if is_entry(path):
+            (corpus, sep, index) = path.rpartition("#")
+            corpus = os.path.splitext(os.path.abspath(corpus))[0]
+            names.append(os.path.join(corpus, entry_name(path)))
+        else:
+            names.append(os.path.splitext(os.path.abspath(path))[0])
+    base = os.path.commonpath([os.path.dirname(p) for p in names])
+    return [os.path.join(output_dir, os.path.relpath(name, base) +
+                         ".solution.csv") for name in names]
+
+
+def _write_record(record, text, output):
+    # write a solution to its file, or into its record
+    if output is not None:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as f:
+            f.write(text)
+        record["output"] = output
+    else:
+        record["solution"] = text
+    record["status"] = "solved"
+
+
+def _init_worker(algo):
+    # import the solver module once per worker, a failure here would
+    # break the pool, solve_puzzle() reports it per puzzle instead
+    try:
+        load_algorithm(algo)
+    except Exception:
+        pass
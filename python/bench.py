@@ -0,0 +1,382 @@
+import contextlib
+import csv
+import functools
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from .algorithms import *
+from .decompose import *
+from .generate import *
+from .grid import *
+from .presolve import *
+
+# timed phases of a run, in order
+PHASES = ["parse", "presolve", "build", "solve", "write"]
+
+# percentiles reported for every phase
+PERCENTILES = [10, 50, 90, 99]
+
+
+def generated_puzzles(sizes, seed=0, density=0.25):
+    """Return generated puzzles of increasing size.
+
+    Arguments
+    ---------
+    sizes    list of board sizes, each board is size x size
+    seed     seed of the first board, incremented for each size
+
+    Returns
+    -------
+    List of (name, CSV text) tuples.
+    """
+    puzzles = []
+    for i, size in enumerate(sorted(sizes)):
+        grid = generate(size, size, density, seed + i)
+        name = puzzle_name(size, size, seed + i)
+        puzzles.append((name, grid.to_text()))
+    return puzzles
+
+
+def bench(algos, puzzles, repeat=5, timeout=60, presolve=(True,)):
+    """Time every algorithm on every puzzle.
+
+    Each (algorithm, puzzle) pair runs in a child process so that a slow
+    run can be stopped after `timeout` seconds.
+
+    Arguments
+    ---------
+    algos     list of algorithm names
+    puzzles   list of (name, CSV text) tuples
+    repeat    number of timed runs per pair
+    timeout   seconds allowed for all runs of a pair
+    presolve  settings to time every pair with, True to presolve the
+              puzzle before building the model, see Presolve
+
+    Yields
+    ------
+    Dictionary per pair and setting with the algorithm, puzzle, presolve
+    setting, status ("ok", "error" or "timeout"), the size of the model
+    the algorithm starts from, see model_size(), and the summary of each
+    phase, see summarize().
+    """
+    for algo in algos:
+        for name, text in puzzles:
+            for setting in presolve:
+                record = {"algo": algo, "puzzle": name, "presolve": setting}
+                record.update(_run_child(algo, text, repeat, timeout,
+                                         setting))
+                yield record
+
+
+def bench_throughput(algos, puzzles, repeat=1, timeout=600):
+    """Time solving many puzzles one at a time and all at once.
+
+    Each algorithm solves the puzzles one after the other, as the solve
+    subcommand does, see solve_decomposed().  Then the vectorized engine
+    solves them together, see solve_vectorized.solve_many().  Each runs
+    in a child process, and the puzzles are parsed before the timing.
+
+    Arguments
+    ---------
+    algos     list of algorithm names
+    puzzles   list of (name, CSV text) tuples
+    repeat    number of timed runs of each algorithm
+    timeout   seconds allowed for all runs of an algorithm
+
+    Yields
+    ------
+    Dictionary per algorithm, then for "vectorized", with the number of
+    puzzles as "puzzle", the status, the summary of the "total" time and
+    the puzzles solved per second in the median run as "rate".
+    """
+    texts = [text for (name, text) in puzzles]
+    for algo in list(algos) + ["vectorized"]:
+        record = {"algo": algo, "puzzle": "{} puzzles".format(len(texts))}
+        record.update(_run_in_child(_throughput_child,
+                                    (algo, texts, repeat), timeout))
+        if record["status"] == "ok":
+            record["rate"] = len(texts) / record["total"]["median"]
+        yield record
+
+
+def bench_parallel(puzzles, workers, repeat=1, timeout=600):
+    """Time the parallel search with different numbers of workers.
+
+    Each puzzle is solved by solve_decomposed() with the "parallel"
+    algorithm and each number of workers, in a child process.
+
+    Arguments
+    ---------
+    puzzles   list of (name, CSV text) tuples
+    workers   list of numbers of worker processes, the speedups are
+              relative to the first
+    repeat    number of timed runs per puzzle and number of workers
+    timeout   seconds allowed for all runs of a puzzle with some workers
+
+    Yields
+    ------
+    Dictionary per puzzle and number of workers with the puzzle, the
+    workers, the status, the summary of the "total" time and the ratio
+    of the median times of the first number of workers and this one as
+    "speedup".
+    """
+    for name, text in puzzles:
+        base = None
+        for n in workers:
+            record = {"algo": "parallel", "puzzle": name, "workers": n}
+            record.update(_run_in_child(_throughput_child,
+                                        ("parallel", [text], repeat,
+                                         {"workers": n}), timeout))
+            if record["status"] == "ok":
+                median = record["total"]["median"]
+                if base is None and n == workers[0]:
+                    base = median
+                if base is not None:
+                    record["speedup"] = base / median
+            yield record
+
+
+def startup_commands(puzzle):
+    """Return the subcommands timed by bench_startup().
+
+    Arguments
+    ---------
+    puzzle   CSV file for the subcommands that read one
+
+    Returns
+    -------
+    List of argument lists, one per subcommand and algorithm.
+    """
+    commands = [
+        ["--help"],
+        ["sums", "10", "3", "1,2,3,4,5,6,7,8,9"],
+        ["validate", puzzle],
+    ]
+    for algo in algorithm_names():
+        command = ["solve", "-a", algo, "--no-cache", puzzle,
+                   "-o", os.devnull]
+        # the portfolio would record every race in the user's log
+        if algo == "portfolio":
+            command += ["--portfolio-log", ""]
+        commands.append(command)
+    return commands
+
+
+def bench_startup(commands, repeat=5, timeout=60):
+    """Time complete command line invocations in fresh interpreters.
+
+    This includes interpreter startup and module imports, which the
+    in-process timings of bench() leave out.
+
+    Arguments
+    ---------
+    commands  list of argument lists, see startup_commands()
+    repeat    number of timed runs per command
+    timeout   seconds allowed for each run
+
+    Yields
+    ------
+    Dictionary per command with the subcommand as "algo", the arguments
+    as "puzzle", the status and the summary of the "total" time.
+    """
+    for args in commands:
+        record = {"algo": args[0], "puzzle": " ".join(args)}
+        times = []
+        try:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                subprocess.run([sys.executable, "-m", __package__] + args,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL,
+                               check=True, timeout=timeout)
+                times.append(time.perf_counter() - t0)
+        except subprocess.TimeoutExpired:
+            record["status"] = "timeout"
+        except subprocess.CalledProcessError as e:
+            record["status"] = "error"
+            record["error"] = "exit status {}".format(e.returncode)
+        else:
+            record["status"] = "ok"
+            record["runs"] = repeat
+            record["total"] = summarize(times)
+        yield record
+
+
+def summarize(times):
+    """Return the min, max, mean and percentiles of a list of times.
+    """
+    times = sorted(times)
+    summary = {
+        "min": times[0],
+        "max": times[-1],
+        "mean": sum(times) / len(times),
+    }
+    for p in PERCENTILES:
+        summary["p{}".format(p)] = _percentile(times, p)
+    summary["median"] = summary["p50"]
+    return summary
+
+
+def write_json(records, f):
+    """Write benchmark records as a JSON list.
+    """
+    json.dump(list(records), f, indent=2)
+    f.write("\n")
+
+
+def write_csv(records, f):
+    """Write benchmark records as CSV, one row per record and phase.
+    """
+    keys = ["min", "max", "mean", "median"] + \
+        ["p{}".format(p) for p in PERCENTILES]
+    writer = csv.writer(f)
+    writer.writerow(["algo", "puzzle", "presolve", "workers", "candidates",
+                     "status", "runs", "phase"] + keys)
+    for r in records:
+        head = [r["algo"], r["puzzle"], r.get("presolve", ""),
+                r.get("workers", ""),
+                r["model"]["candidates"] if "model" in r else ""]
+        if r["status"] != "ok":
+            writer.writerow(head + [r["status"], 0])
+            continue
+        for phase in [p for p in PHASES + ["total"] if p in r]:
+            summary = r[phase]
+            writer.writerow(head + [r["status"], r["runs"], phase] +
+                            [summary[k] for k in keys])
+
+
+def _percentile(times, p):
+    # linear interpolation between closest ranks of sorted times
+    k = (len(times) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(times) - 1)
+    return times[lo] + (times[hi] - times[lo]) * (k - lo)
+
+
+class _Deferred:
+    """Solver that calls a solve function, for algorithms without a class.
+    """
+    def __init__(self, solve_fnc, grid, **options):
+        self.solve_fnc = solve_fnc
+        self.grid = grid
+        self.options = options
+
+    def solve(self):
+        return self.solve_fnc(self.grid, **self.options)
+
+
+def _run_child(algo, text, repeat, timeout, presolve):
+    """Run the timed phases in a child process.
+    """
+    return _run_in_child(_child, (algo, text, repeat, presolve), timeout)
+
+
+def _run_in_child(target, args, timeout):
+    """Run target(conn, *args) in a child process and return what it sends.
+    """
+    (parent_conn, child_conn) = multiprocessing.Pipe(duplex=False)
+    p = multiprocessing.Process(target=target, args=(child_conn,) + args)
+    p.start()
+    child_conn.close()
+
+    if parent_conn.poll(timeout):
+        result = parent_conn.recv()
+        p.join()
+    else:
+        p.terminate()
+        p.join()
+        result = {"status": "timeout"}
+    parent_conn.close()
+    return result
+
+
+def _child(conn, algo, text, repeat, presolve):
+    phases = [p for p in PHASES if presolve or p != "presolve"]
+    times = {phase: [] for phase in phases + ["total"]}
+    model = None
+    try:
+        solver_class = load_solver(algo)
+        if solver_class is None:
+            # the model build is timed as part of the solve
+            solve_fnc = load_algorithm(algo)
+            solver_class = functools.partial(_Deferred, solve_fnc)
+
+        # the backends print progress, which is not timed
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                grid = Grid()
+                grid.parse_text(text)
+                t1 = time.perf_counter()
+                # the portfolio would record every race in the user's log
+                options = {"log": ""} if algo == "portfolio" else {}
+                if presolve:
+                    presolved = Presolve(grid)
+                    grid = presolved.grid
+                    model = presolved.after
+                    if algo in ALGORITHMS:
+                        options["domains"] = presolved.domains
+                else:
+                    model = model_size([0 if v else ALL_DIGITS
+                                        for v in grid.values])
+                t2 = time.perf_counter()
+                solver = solver_class(grid, **options)
+                t3 = time.perf_counter()
+                solution = solver.solve()
+                if solution is None:
+                    raise RuntimeError("puzzle has no solution")
+                t4 = time.perf_counter()
+                solution.to_text()
+                t5 = time.perf_counter()
+
+                dts = [t1-t0, t2-t1, t3-t2, t4-t3, t5-t4]
+                for phase, dt in zip(PHASES, dts):
+                    if phase in times:
+                        times[phase].append(dt)
+                times["total"].append(t5 - t0)
+    except Exception as e:
+        conn.send({"status": "error",
+                   "error": "{}: {}".format(type(e).__name__, e)})
+        return
+
+    result = {"status": "ok", "runs": repeat, "model": model}
+    for phase, t in times.items():
+        result[phase] = summarize(t)
+    conn.send(result)
+
+
+def _throughput_child(conn, algo, texts, repeat, options=None):
+    times = []
+    try:
+        grids = []
+        for text in texts:
+            grid = Grid()
+            grid.parse_text(text)
+            grids.append(grid)
+        options = dict(options or {})
+        # the portfolio would record every race in the user's log
+        if algo == "portfolio":
+            options["log"] = ""
+        if algo == "vectorized":
+            from .solve_vectorized import solve_many
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                if algo == "vectorized":
+                    if None in solve_many(grids):
+                        raise RuntimeError("puzzle has no solution")
+                else:
+                    for grid in grids:
+                        solve_decomposed(grid, algo, **options)
+                times.append(time.perf_counter() - t0)
+    except Exception as e:
+        conn.send({"status": "error",
+                   "error": "{}: {}".format(type(e).__name__, e)})
+        return
+    conn.send({"status": "ok", "runs": repeat, "total": summarize(times)})
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import sqlite3
+import time
+from array import array
+
+# default limits of the cache, least recently used entries are evicted
+MAX_ENTRIES = 100000
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_path():
+    """Return the cache file location.
+
+    This is $CROSSSUMS_CACHE if set, else solutions.sqlite in the user's
+    cache directory.
+    """
+    path = os.environ.get("CROSSSUMS_CACHE")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "crosssums", "solutions.sqlite")
+
+
+def fingerprint(grid):
+    """Return a canonical hash of a puzzle.
+
+    The hash covers the run layout, the sums and the cell values.  It does
+    not change when the puzzle is moved within the sheet or transposed.
+
+    Returns
+    -------
+    (key, ids) where key is a hex string and ids lists the grid's cell ids
+    in canonical order.
+    """
+    r0 = min(c[0] for c in grid.coords)
+    c0 = min(c[1] for c in grid.coords)
+
+    encodings = []
+    for transpose in (False, True):
+        def place(row, col):
+            (row, col) = (row - r0, col - c0)
+            return (col, row) if transpose else (row, col)
+
+        runs = sorted((c.vertical != transpose,) + place(c.row, c.col) +
+                      (c.length, c.sum) for c in grid.constraints)
+        ids = sorted(range(len(grid.coords)),
+                     key=lambda i: place(*grid.coords[i]))
+        values = bytes(grid.values[i] for i in ids)
+        encodings.append((repr(runs).encode() + b"|" + values, ids))
+
+    text, ids = min(encodings)
+    return hashlib.sha256(text).hexdigest(), ids
+
+
+class Cache:
+    """Solutions stored in SQLite, keyed by puzzle fingerprint.
+    """
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        if path is None:
+            path = default_path()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " key TEXT PRIMARY KEY,"
+            " solution BLOB NOT NULL,"
+            " used REAL NOT NULL)")
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+        self.db.commit()
+
+    def get(self, grid):
+        """Return the cached solution of a puzzle, or None.
+        """
+        key, ids = fingerprint(grid)
+        row = self.db.execute(
+            "SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None or len(row[0]) != len(ids):
+            return None
+        self.db.execute(
+            "UPDATE solutions SET used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+
+        solution = grid.clone()
+        values = array("b", row[0])
+        for i, value in zip(ids, values):
+            solution.values[i] = value
+        return solution
+
+    def put(self, grid, solution):
+        """Store the solution of a puzzle and evict old entries.
+        """
+        key, ids = fingerprint(grid)
+        blob = array("b", [solution.values[i] for i in ids]).tobytes()
+        self.db.execute(
+            "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)",
+            (key, blob, time.time()))
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        """Remove least recently used entries beyond the limits.
+        """
+        (count, size) = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(solution)), 0) "
+            "FROM solutions").fetchone()
+        while count > self.max_entries or size > self.max_bytes:
+            (key, length) = self.db.execute(
+                "SELECT key, LENGTH(solution) FROM solutions "
+                "ORDER BY used LIMIT 1").fetchone()
+            self.db.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            count -= 1
+            size -= length
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,114 @@
+import itertools
+import os
+import pickle
+
+# Digit sets are represented as 9-bit masks: bit (d-1) is set iff digit d
+# is in the set.
+ALL_DIGITS = 0x1FF
+
+# per-mask popcount and digit sum, indexed by mask
+MASK_LENGTH = [bin(m).count("1") for m in range(ALL_DIGITS + 1)]
+MASK_SUM = [sum(d for d in range(1, 10) if m & (1 << (d-1)))
+            for m in range(ALL_DIGITS + 1)]
+
+# location of an optional prebuilt table shipped next to this module
+TABLE_FILE = os.path.join(os.path.dirname(__file__), "combinations.pickle")
+TABLE_VERSION = 1
+
+
+def digit_mask(digits):
+    """Return the mask of a list of digits in 1..9.
+    """
+    mask = 0
+    for d in digits:
+        if d < 1 or d > 9:
+            raise RuntimeError("invalid digit '{}'".format(d))
+        mask |= 1 << (d-1)
+    return mask
+
+
+def mask_digits(mask):
+    """Return the sorted list of digits in a mask.
+    """
+    return [d for d in range(1, 10) if mask & (1 << (d-1))]
+
+
+def build_table():
+    """Build the combination table.
+
+    Returns
+    -------
+    Dictionary of (sum, length, excluded mask) -> tuple of digit set masks.
+    Every mask in an entry has `length` digits adding to `sum` and shares
+    no digit with the excluded mask.  Empty entries are not stored.
+    """
+    table = {}
+    for mask in range(1, ALL_DIGITS + 1):
+        s = MASK_SUM[mask]
+        length = MASK_LENGTH[mask]
+
+        # visit every subset of the digits not in the mask
+        free = ALL_DIGITS & ~mask
+        excluded = free
+        while True:
+            table.setdefault((s, length, excluded), []).append(mask)
+            if excluded == 0:
+                break
+            excluded = (excluded - 1) & free
+
+    return {key: tuple(sorted(masks)) for key, masks in table.items()}
+
+
+def save_table(path, table=None):
+    """Write a combination table to a file.
+
+    The table is pickled since loading it is faster than building it.
+    """
+    if table is None:
+        table = TABLE
+    with open(path, "wb") as f:
+        pickle.dump({"version": TABLE_VERSION, "table": table}, f)
+
+
+def load_table(path):
+    """Read a combination table written by save_table().
+    """
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if data.get("version") != TABLE_VERSION:
+        msg = "unsupported combination table version in {}".format(path)
+        raise RuntimeError(msg)
+    return data["table"]
+
+
+def combinations(sum, length, excluded=0):
+    """Return the digit sets that can fill a run.
+
+    Arguments
+    ---------
+    sum       value that the digits should add to
+    length    number of digits
+    excluded  mask of digits that may not be used
+
+    Returns
+    -------
+    Tuple of digit set masks, in increasing order.
+    """
+    return TABLE.get((sum, length, excluded), ())
+
+
+def permutations(mask):
+    """Generate the orderings of the digits in a mask.
+
+    Yields
+    ------
+    Tuples of digits, in lexicographic order.
+    """
+    return itertools.permutations(mask_digits(mask))
+
+
+# the table is built once per process, or loaded if shipped prebuilt
+if os.path.exists(TABLE_FILE):
+    TABLE = load_table(TABLE_FILE)
+else:
+    TABLE = build_table()
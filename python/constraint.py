@@ -9,6 +9,7 @@ class Constraint:
         self.vertical = vertical # True iff this is vertical constraint
         self.length = length     # number of cells in this constraint
         self.cells = []          # list of (rol,col) tuples
+        self.ids = None          # array of the cells' ids in the Grid
 
         self._populate_cells()
 
@@ -40,11 +41,11 @@ class Constraint:
         return True
 
     def _populate_cells(self):
-        cell = (self.row, self.col)
-        step = (1,0) if self.vertical else (0,1)
-        for i in range(self.length):
-            self.cells.append(cell)
-            cell = (cell[0] + step[0], cell[1] + step[1])
+        row, col = self.row, self.col
+        if self.vertical:
+            self.cells = [(row + i, col) for i in range(self.length)]
+        else:
+            self.cells = [(row, col + i) for i in range(self.length)]
         
     def __str__(self):
         dir = "vertical" if self.vertical else "horizontal"
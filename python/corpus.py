@@ -0,0 +1,350 @@
+import mmap
+import os
+import struct
+
+from .constraint import *
+from .grid import *
+
+# first bytes of a corpus file and version of its format
+MAGIC = b"XSUMCORP"
+VERSION = 1
+
+# extension of corpus files, whose puzzles are named "CORPUS#INDEX"
+CORPUS_SUFFIX = ".xsc"
+
+# A corpus is little-endian:
+#   header   magic, version, number of puzzles, offset of the index
+#   records  one per puzzle, see _encode()
+#   index    offset of each record, then the end of the last one
+HEADER = struct.Struct("<8sIQQ")
+OFFSET = struct.Struct("<Q")
+
+# rows, columns, numerical cells, horizontal and vertical segments, and
+# length of the name of a record
+RECORD = struct.Struct("<HHIHHH")
+
+# corpora opened by read_puzzle(), by path
+_open = {}
+
+
+class Record:
+    """Puzzle of a corpus as views of the corpus bytes.
+
+    The grid has `rows` x `cols` cells.  Bit r*cols+c of `white`, in
+    little-endian order, is set if cell (r,c) is numerical.  `values`
+    holds the digit of each numerical cell in row-major order, 0 if
+    empty.  A segment is a maximal line of numerical cells, `hsums` and
+    `vsums` hold the sum of the run on each horizontal and vertical
+    segment, in the row-major order of their first cells, 0 if there is
+    no run.
+    """
+    def __init__(self, buffer, offset):
+        (self.rows, self.cols, ncells, nh, nv, nname) = \
+            RECORD.unpack_from(buffer, offset)
+        view = memoryview(buffer)
+        k = offset + RECORD.size
+        self.name = bytes(view[k:k + nname]).decode("utf-8")
+        k += nname
+        nbytes = (self.rows * self.cols + 7) // 8
+        self.white = view[k:k + nbytes]
+        k += nbytes
+        self.values = view[k:k + ncells]
+        k += ncells
+        self.hsums = view[k:k + nh]
+        k += nh
+        self.vsums = view[k:k + nv]
+
+    def grid(self):
+        """Return the Grid of the puzzle.
+
+        Cells and constraints are added in the order parse_csv() adds
+        them, so the grid is the same as the one of the puzzle's CSV.
+        """
+        cols = self.cols
+        # flag of each cell, padded with a row for the vertical scans
+        white = bytearray((self.rows + 1) * cols)
+        positions = []
+        bits = int.from_bytes(self.white, "little")
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            p = low.bit_length() - 1
+            white[p] = 1
+            positions.append(p)
+
+        grid = Grid()
+        grid.add_cells([divmod(p, cols) for p in positions], self.values)
+
+        # A run covers a segment and its sum cell precedes it.  Runs are
+        # added in the row-major order of their sum cells, vertical
+        # first, as parse_csv() adds them.
+        runs = []
+        h = 0
+        v = 0
+        hsums = self.hsums
+        vsums = self.vsums
+        for p in positions:
+            (r, c) = divmod(p, cols)
+            if c == 0 or not white[p - 1]:
+                if hsums[h]:
+                    length = 1
+                    while c + length < cols and white[p + length]:
+                        length += 1
+                    runs.append((p - 1, 1, Constraint(
+                        hsums[h], r, c, False, length)))
+                h += 1
+            if r == 0 or not white[p - cols]:
+                if vsums[v]:
+                    length = 1
+                    while white[p + length * cols]:
+                        length += 1
+                    runs.append((p - cols, 0, Constraint(
+                        vsums[v], r, c, True, length)))
+                v += 1
+        runs.sort(key=lambda run: run[:2])
+        for (head, order, constraint) in runs:
+            grid.add_constraint(constraint)
+        return grid
+
+
+class Corpus:
+    """Memory-mapped corpus of puzzles.
+
+    Records are decoded when they are accessed, so opening a corpus costs
+    the same whatever its size.  corpus[k] returns the Grid of puzzle k,
+    see record() for views of its bytes.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer.size() < HEADER.size:
+            raise RuntimeError("{} is not a puzzle corpus".format(path))
+        (magic, version, self.count, self.index) = \
+            HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise RuntimeError("{} is not a puzzle corpus".format(path))
+        if version != VERSION:
+            msg = "unsupported corpus version {} in {}".format(version, path)
+            raise RuntimeError(msg)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        return self.record(k).grid()
+
+    def __iter__(self):
+        for k in range(self.count):
+            yield self[k]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, k):
+        """Return the Record of puzzle k.
+        """
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError("puzzle {} not in {}".format(k, self.path))
+        (offset,) = OFFSET.unpack_from(self.buffer,
+                                       self.index + k * OFFSET.size)
+        return Record(self.buffer, offset)
+
+    def name(self, k):
+        """Return the name of puzzle k.
+        """
+        return self.record(k).name
+
+    def close(self):
+        """Unmap the corpus.
+
+        Records returned by record() must be released first, since they
+        are views of the mapping.
+        """
+        self.buffer.close()
+
+
+def write_corpus(path, puzzles):
+    """Write puzzles to a corpus file.
+
+    Arguments
+    ---------
+    path     corpus file
+    puzzles  iterable of (name, Grid) pairs
+
+    Returns
+    -------
+    Number of puzzles written.
+    """
+    offsets = []
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        for name, grid in puzzles:
+            offsets.append(f.tell())
+            f.write(_encode(name, grid))
+        offsets.append(f.tell())
+        index = f.tell()
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(offsets) - 1, index))
+    return len(offsets) - 1
+
+
+def pack_files(paths, output):
+    """Convert CSV puzzle files to a corpus.
+
+    The puzzles are named by their paths relative to the directory
+    containing all of them, without the extension.
+
+    Returns
+    -------
+    Number of puzzles written.
+    """
+    paths = [os.path.abspath(p) for p in paths]
+    base = os.path.commonpath([os.path.dirname(p) for p in paths]) \
+        if paths else ""
+
+    def puzzles():
+        for path in paths:
+            grid = Grid()
+            grid.parse_csv(path)
+            name = os.path.splitext(os.path.relpath(path, base))[0]
+            yield (name, grid)
+
+    return write_corpus(output, puzzles())
+
+
+def unpack_files(path, output_dir):
+    """Write the puzzles of a corpus to CSV files named after them.
+
+    Returns
+    -------
+    List of the CSV files written.
+    """
+    outputs = []
+    with Corpus(path) as corpus:
+        for k in range(len(corpus)):
+            record = corpus.record(k)
+            output = os.path.join(output_dir, record.name + ".csv")
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            record.grid().write_csv(output)
+            outputs.append(output)
+            del record
+    return outputs
+
+
+def corpus_entries(path):
+    """Return the names "CORPUS#INDEX" of the puzzles of a corpus.
+    """
+    return ["{}#{}".format(path, k) for k in range(len(_corpus(path)))]
+
+
+def is_entry(path):
+    """Return True if a path names a puzzle of a corpus.
+    """
+    (file, sep, index) = path.rpartition("#")
+    return bool(sep) and file.endswith(CORPUS_SUFFIX) and index.isdigit()
+
+
+def read_puzzle(path):
+    """Return the Grid of a CSV file, or of a corpus puzzle "CORPUS#INDEX".
+
+    Corpora stay open, so reading their puzzles in turn costs no more
+    than decoding them.
+    """
+    if is_entry(path):
+        (file, sep, index) = path.rpartition("#")
+        return _corpus(file)[int(index)]
+    grid = Grid()
+    grid.parse_csv(path)
+    return grid
+
+
+def read_text(path):
+    """Return the CSV text of a puzzle, see read_puzzle().
+    """
+    if is_entry(path):
+        return read_puzzle(path).to_text()
+    with open(path) as f:
+        return f.read()
+
+
+def entry_name(path):
+    """Return the name of a corpus puzzle "CORPUS#INDEX".
+    """
+    (file, sep, index) = path.rpartition("#")
+    return _corpus(file).name(int(index))
+
+
+def _corpus(path):
+    corpus = _open.get(path)
+    if corpus is None:
+        corpus = _open[path] = Corpus(path)
+    return corpus
+
+
+def _encode(name, grid):
+    # return the bytes of the record of a grid, see Record
+    if not grid.coords:
+        raise RuntimeError("puzzle {} has no cells".format(name))
+    rows = max(r for (r, c) in grid.coords) + 1
+    cols = max(c for (r, c) in grid.coords) + 1
+    white = set(grid.coords)
+
+    bits = 0
+    for (r, c) in white:
+        bits |= 1 << (r * cols + c)
+    values = [grid.values[grid.ids[cell]] for cell in sorted(white)]
+
+    runs = {(c.row, c.col, c.vertical): c for c in grid.constraints}
+    sums = []
+    for vertical in (False, True):
+        s = []
+        for (cell, length) in _segments(white, vertical):
+            c = runs.pop((cell[0], cell[1], vertical), None)
+            if c is not None and c.length != length:
+                msg = "{} does not cover its whole line of cells".format(c)
+                raise RuntimeError(msg)
+            s.append(c.sum if c is not None else 0)
+        sums.append(s)
+    if runs:
+        msg = "{} does not start a line of cells".format(
+            next(iter(runs.values())))
+        raise RuntimeError(msg)
+    if max(sums[0] + sums[1] + [0]) > 255:
+        raise RuntimeError("puzzle {} has a sum over 255".format(name))
+
+    name = name.encode("utf-8")
+    return b"".join([
+        RECORD.pack(rows, cols, len(values), len(sums[0]), len(sums[1]),
+                    len(name)),
+        name,
+        bits.to_bytes((rows * cols + 7) // 8, "little"),
+        bytes(values),
+        bytes(sums[0]),
+        bytes(sums[1]),
+    ])
+
+
+def _segments(white, vertical):
+    # return the (first cell, length) of the maximal lines of numerical
+    # cells, in row-major order of their first cells
+    segments = []
+    step = (1, 0) if vertical else (0, 1)
+    for cell in sorted(white):
+        before = (cell[0] - step[0], cell[1] - step[1])
+        if before in white:
+            continue
+        length = 1
+        after = (cell[0] + step[0], cell[1] + step[1])
+        while after in white:
+            length += 1
+            after = (after[0] + step[0], after[1] + step[1])
+        segments.append((cell, length))
+    return segments
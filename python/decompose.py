@@ -0,0 +1,177 @@
+import concurrent.futures
+import functools
+import itertools
+
+from .algorithms import *
+from .constraint import *
+from .grid import *
+from .presolve import *
+from .trace import *
+from .verify import *
+
+
+def components(grid):
+    """Return the connected components of the constraint intersection graph.
+
+    Returns
+    -------
+    List of lists of constraints, in the order of grid.constraints.
+    """
+    seen = set()
+    result = []
+    for start in grid.constraints:
+        if start in seen:
+            continue
+        seen.add(start)
+        component = [start]
+        k = 0
+        while k < len(component):
+            for c in grid.adjacency[component[k]]:
+                if c not in seen:
+                    seen.add(c)
+                    component.append(c)
+            k += 1
+        result.append(component)
+    return result
+
+
+def subgrid(grid, constraints):
+    """Return a new grid holding only some constraints and their cells.
+    """
+    sub = Grid()
+    for con in constraints:
+        for c in con.cells:
+            if c not in sub.ids:
+                sub.add_cell(c, grid.cells[c])
+    for con in constraints:
+        sub.add_constraint(Constraint(
+            con.sum, con.row, con.col, con.vertical, con.length))
+    return sub
+
+
+def merge(grid, parts):
+    """Return a copy of a grid with the cell values of solved subgrids.
+
+    The cells outside every run belong to no subgrid, they take any
+    digit and are given 1 if empty.
+    """
+    merged = grid.clone()
+    for part in parts:
+        merged.write_cells(part.coords, part.values)
+    values = merged.values
+    for i, slots in enumerate(merged.cell_constraints):
+        if values[i] == 0 and slots == [None, None]:
+            values[i] = 1
+    return merged
+
+
+def solve_decomposed(grid, algo, jobs=1, presolve=True, **options):
+    """Solve each connected component of a puzzle independently.
+
+    Arguments
+    ---------
+    grid      puzzle to solve
+    algo      name of the algorithm used for every component
+    jobs      number of worker processes, 1 to solve in this process
+    presolve  False to leave out the presolve, see Presolve
+    options   keyword options passed to the algorithm's solve function
+
+    Returns
+    -------
+    The solved grid, checked against the puzzle, see check_solution().
+    """
+    puzzle = grid
+    presolved = None
+    if presolve:
+        with trace_span("presolve"):
+            presolved = Presolve(grid)
+        print(presolved.report())
+        grid = presolved.grid
+    with trace_span("decompose"):
+        parts = [subgrid(grid, c) for c in components(grid)]
+    if len(parts) == 1:
+        solution = _solve_part(
+            algo, _part_options(algo, options, presolved, grid), grid)
+    else:
+        print("solving {} independent components".format(len(parts)))
+        part_options = [_part_options(algo, options, presolved, part)
+                        for part in parts]
+        if jobs == 1:
+            solutions = list(map(_solve_part, itertools.repeat(algo),
+                                 part_options, parts))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=jobs) as ex:
+                solutions = list(ex.map(_solve_part, itertools.repeat(algo),
+                                        part_options, parts))
+        solution = merge(grid, solutions)
+    with trace_span("verify"):
+        return check_solution(solution, puzzle)
+
+
+def enumerate_decomposed(grid, algo, limit=None, jobs=1, presolve=True,
+                         **options):
+    """Enumerate the solutions of a puzzle component by component.
+
+    Each component is enumerated up to the limit, and the solutions of
+    the puzzle are the combinations of its components' solutions.
+
+    Arguments
+    ---------
+    grid      puzzle to solve
+    algo      name of the algorithm used for every component
+    limit     number of solutions to stop at, None for all of them
+    jobs      number of worker processes, 1 to solve in this process
+    presolve  False to leave out the presolve, which only removes
+              candidates no solution uses, see Presolve
+    options   keyword options passed to the algorithm
+
+    Returns
+    -------
+    List of up to `limit` solved grids.
+    """
+    presolved = None
+    if presolve:
+        try:
+            with trace_span("presolve"):
+                presolved = Presolve(grid)
+        except RuntimeError:
+            return []
+        print(presolved.report())
+        grid = presolved.grid
+    with trace_span("decompose"):
+        parts = [subgrid(grid, c) for c in components(grid)]
+    if len(parts) == 1:
+        return load_enumerator(algo)(
+            grid, limit, **_part_options(algo, options, presolved, grid))
+
+    part_options = [_part_options(algo, options, presolved, part)
+                    for part in parts]
+    enumerate_part = functools.partial(_enumerate_part, algo, limit)
+    if jobs == 1:
+        solutions = list(map(enumerate_part, part_options, parts))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as ex:
+            solutions = list(ex.map(enumerate_part, part_options, parts))
+    combined = itertools.product(*solutions)
+    return [merge(grid, c) for c in itertools.islice(combined, limit)]
+
+
+def _part_options(algo, options, presolved, part):
+    # the options of a part, with its presolved candidates for the
+    # built-in algorithms, which take them as the `domains` option
+    if presolved is None or algo not in ALGORITHMS:
+        return options
+    return dict(options, domains=presolved.part_domains(part))
+
+
+def _enumerate_part(algo, limit, options, part):
+    return load_enumerator(algo)(part, limit, **options)
+
+
+def _solve_part(algo, options, part):
+    solution = load_algorithm(algo)(part, **options)
+    if solution is None:
+        msg = "no solution for the runs from {}".format(part.constraints[0])
+        raise RuntimeError(msg)
+    return solution
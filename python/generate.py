@@ -0,0 +1,266 @@
+import concurrent.futures
+import os
+import random
+
+from .combinations import *
+from .constraint import *
+from .grid import *
+from .solve_propagate import Solver as PropagateSolver
+
+# longest run that can hold distinct digits
+MAX_RUN = 9
+
+# number of times a layout is filled from scratch before giving up
+FILL_ATTEMPTS = 100
+
+# number of random layouts tried for one with a run before giving up
+LAYOUT_ATTEMPTS = 1000
+
+
+def generate(rows, cols, density=0.25, seed=None, unique=False):
+    """Generate a random puzzle.
+
+    The first row and column hold only sum cells.  Every run has between
+    2 and 9 cells, and the sums come from a random filling so the puzzle
+    is solvable.  Its solution need not be unique unless `unique` is set,
+    in which case digits of the filling are given, see make_unique().
+
+    Arguments
+    ---------
+    rows     number of rows, including the sum cells
+    cols     number of columns, including the sum cells
+    density  fraction of the cells that are blocked before the layout is
+             repaired
+    seed     seed for the random generator
+    unique   True to give digits until the solution is unique
+
+    Returns
+    -------
+    Grid with the derived constraints, and all cells 0 except the given
+    digits.
+    """
+    # a run needs two cells after the sum cells in both directions
+    if rows < 3 or cols < 3:
+        raise RuntimeError("puzzle size {}x{} is smaller than 3x3"
+                           .format(rows, cols))
+    if not 0 <= density < 1:
+        raise RuntimeError("density {} is not in [0, 1)".format(density))
+
+    rnd = random.Random(seed)
+    for _ in range(LAYOUT_ATTEMPTS):
+        white = _layout(rows, cols, density, rnd)
+        if any(any(row) for row in white):
+            break
+    else:
+        raise RuntimeError("no layout with a run found in {} attempts"
+                           .format(LAYOUT_ATTEMPTS))
+    values = _fill(white, rnd)
+
+    grid = Grid()
+    for cell in values:
+        grid.add_cell(cell)
+    for vertical in (True, False):
+        for run in _runs(white, vertical):
+            s = sum(values[c] for c in run)
+            row, col = run[0]
+            c = Constraint(s, row, col, vertical, len(run))
+            grid.add_constraint(c)
+    if unique:
+        make_unique(grid, values, rnd)
+    return grid
+
+
+def puzzle_name(rows, cols, seed):
+    """Return the name of a generated puzzle."""
+    return "generated-{}x{}-seed{}".format(rows, cols, seed)
+
+
+def generate_files(rows, cols, count, output_dir, density=0.25, seed=0,
+                   unique=False, jobs=None):
+    """Generate puzzles into CSV files on a pool of worker processes.
+
+    Puzzle k uses seed + k and is written to output_dir as
+    puzzle_name() + ".csv".
+
+    Arguments
+    ---------
+    count    number of puzzles
+    jobs     number of worker processes, None for the number of CPUs
+
+    See generate() for the other arguments.
+
+    Yields
+    ------
+    The path of each puzzle as it is written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, puzzle_name(rows, cols, s) + ".csv")
+             for s in range(seed, seed + count)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as ex:
+        futures = [ex.submit(_write_puzzle, rows, cols, density, s, unique, p)
+                   for s, p in zip(range(seed, seed + count), paths)]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def _write_puzzle(rows, cols, density, seed, unique, path):
+    generate(rows, cols, density, seed, unique).write_csv(path)
+    return path
+
+
+def make_unique(grid, solution, rnd=None):
+    """Give digits of a solution until a puzzle has no other solution.
+
+    Random cells are given their digit until constraint propagation
+    alone assigns every cell.  Propagation only removes digits that no
+    solution can hold, so the puzzle then has exactly one solution.  A
+    given digit only narrows the candidates, so propagation continues
+    from the runs of the cell instead of starting over.
+
+    Arguments
+    ---------
+    grid      puzzle, changed in place
+    solution  dict of (row,col) -> digit, a solution of the puzzle
+    rnd       random.Random choosing the cells, None for a new one
+
+    Returns
+    -------
+    Number of digits given.
+    """
+    if rnd is None:
+        rnd = random.Random()
+    s = PropagateSolver(grid)
+    domains = s.propagate(list(s.domains), range(len(s.runs)))
+    if domains is None:
+        raise RuntimeError("puzzle has no solution")
+
+    # visit the cells in random order, skipping those already assigned
+    order = list(range(len(domains)))
+    rnd.shuffle(order)
+    given = 0
+    for i in order:
+        if MASK_LENGTH[domains[i]] == 1:
+            continue
+        digit = solution[grid.coords[i]]
+        grid.values[i] = digit
+        domains[i] = digit_mask([digit])
+        domains = s.propagate(domains, s.cell_runs[i])
+        if domains is None:
+            raise RuntimeError("digits given are not a solution")
+        given += 1
+    return given
+
+
+def _layout(rows, cols, density, rnd):
+    """Return a rows x cols list of lists, True for cells to be filled.
+    """
+    white = [[i > 0 and j > 0 and rnd.random() >= density
+              for j in range(cols)] for i in range(rows)]
+
+    changed = True
+    while changed:
+        changed = False
+
+        # block cells that would be a run of one in either direction
+        for i in range(1, rows):
+            for j in range(1, cols):
+                if not white[i][j]:
+                    continue
+                h = white[i][j-1] or (j+1 < cols and white[i][j+1])
+                v = white[i-1][j] or (i+1 < rows and white[i+1][j])
+                if not h or not v:
+                    white[i][j] = False
+                    changed = True
+
+        # split runs that are too long at a random cell
+        for vertical in (True, False):
+            for run in _runs(white, vertical):
+                if len(run) > MAX_RUN:
+                    i, j = run[rnd.randrange(1, len(run) - 1)]
+                    white[i][j] = False
+                    changed = True
+
+    return white
+
+
+def _runs(white, vertical):
+    """Return the runs of a layout as lists of (row,col) tuples.
+    """
+    rows = len(white)
+    cols = len(white[0])
+    runs = []
+    (outer, inner) = (cols, rows) if vertical else (rows, cols)
+    for a in range(outer):
+        run = []
+        for b in range(inner + 1):
+            cell = (b, a) if vertical else (a, b)
+            if b < inner and white[cell[0]][cell[1]]:
+                run.append(cell)
+            elif run:
+                runs.append(run)
+                run = []
+    return runs
+
+
+def _fill(white, rnd):
+    """Return a dict of (row,col) -> digit with distinct digits in every run.
+
+    Cells are filled in row-major order with a random free digit.  A cell
+    left without one takes a digit whose holders in its runs can switch
+    to another digit, and the fill starts over if there is none.
+    """
+    # map each cell to the cells of its runs
+    cells = [(i, j) for i, row in enumerate(white)
+             for j, w in enumerate(row) if w]
+    peers = {c: [] for c in cells}
+    for vertical in (True, False):
+        for run in _runs(white, vertical):
+            for c in run:
+                peers[c].extend(p for p in run if p != c)
+
+    for _ in range(FILL_ATTEMPTS):
+        values = {}
+        for c in cells:
+            digits = _free_digits(c, peers, values)
+            if digits:
+                values[c] = rnd.choice(digits)
+            elif not _repair(c, peers, values, rnd):
+                break
+        else:
+            return values
+    raise RuntimeError("layout cannot be filled")
+
+
+def _free_digits(cell, peers, values, taken=0):
+    # digits not held by the cell's peers, nor in the taken mask
+    used = taken
+    for p in peers[cell]:
+        used |= 1 << values.get(p, 0)
+    return [d for d in range(1, 10) if not used & (1 << d)]
+
+
+def _repair(cell, peers, values, rnd):
+    """Give a cell a digit by moving that digit's holders to other digits.
+
+    Returns
+    -------
+    True if the cell was assigned.
+    """
+    digits = list(range(1, 10))
+    rnd.shuffle(digits)
+    for d in digits:
+        # a digit is held at most once in each of the cell's two runs, and
+        # the holders are not in a run together
+        holders = [p for p in peers[cell] if values.get(p) == d]
+        moves = []
+        for p in holders:
+            free = _free_digits(p, peers, values, 1 << d)
+            if not free:
+                break
+            moves.append((p, rnd.choice(free)))
+        else:
+            for p, e in moves:
+                values[p] = e
+            values[cell] = d
+            return True
+    return False
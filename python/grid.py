@@ -1,78 +1,212 @@
-import pandas as pd
+import collections.abc
+import csv
+import io
+from array import array
 
 from .constraint import *
 from .utils import *
 
+class Cells(collections.abc.MutableMapping):
+    """Dict-like view of the cell values of a Grid.
+
+    Keys are (row,col) tuples and values are integers in the grid's flat
+    value buffer.  Setting a new key adds a cell to the grid.
+    """
+    def __init__(self, grid):
+        self._grid = grid
+
+    def __getitem__(self, coord):
+        grid = self._grid
+        return grid.values[grid.ids[coord]]
+
+    def __setitem__(self, coord, value):
+        grid = self._grid
+        i = grid.ids.get(coord)
+        if i is None:
+            grid.add_cell(coord, value)
+        else:
+            grid.values[i] = value
+
+    def __delitem__(self, coord):
+        raise RuntimeError("cannot remove cell {}".format(coord))
+
+    def __contains__(self, coord):
+        return coord in self._grid.ids
+
+    def __iter__(self):
+        return iter(self._grid.coords)
+
+    def __len__(self):
+        return len(self._grid.coords)
+
+    def keys(self):
+        return self._grid.ids.keys()
+
+
 class Grid:
     def __init__(self):
-        # Dict where key is (row,col) tuples, value is integer in cell
-        self.cells = {}
+        # Cells are numbered by integer ids in the order they are added.
+        # The layout (coords, ids and the constraint indexes) may be
+        # shared between clones and is copied before it is changed.
+        self.coords = []          # list of (row,col) tuples, indexed by id
+        self.ids = {}             # dict of (row,col) tuple -> id
+        self.values = array("b")  # integer in each cell, indexed by id
+        self._shared = False      # True if the layout may be shared
 
         # list of sum constraints
         self.constraints = []
 
+        # [horizontal, vertical] Constraint covering each cell, indexed
+        # by id, None where there is none yet
+        self.cell_constraints = []
+
+        # dict of Constraint -> list of intersecting constraints
+        self.adjacency = {}
+
+    @property
+    def cells(self):
+        """Dict-like view where key is (row,col) tuples, value is integer
+        in cell."""
+        return Cells(self)
+
+    @cells.setter
+    def cells(self, cells):
+        constraints = self.constraints
+        self.coords = []
+        self.ids = {}
+        self.values = array("b")
+        self._shared = False
+        self.constraints = []
+        self.cell_constraints = []
+        self.adjacency = {}
+        for c, value in cells.items():
+            self.add_cell(c, value)
+
+        # the constraints refer to cells by id, and the old objects may
+        # be shared with clones whose ids must not change
+        for c in constraints:
+            self.add_constraint(
+                Constraint(c.sum, c.row, c.col, c.vertical, c.length))
+
+    def add_cell(self, coord, value=0):
+        """Add a numerical cell and return its id.
+        """
+        self._unshare()
+        i = len(self.coords)
+        self.coords.append(coord)
+        self.ids[coord] = i
+        self.values.append(value)
+        self.cell_constraints.append([None, None])
+        return i
+
+    def add_cells(self, coords, values):
+        """Add numerical cells, see add_cell().
+
+        Arguments
+        ---------
+        coords    list of (row,col) tuples
+        values    list of the integers in the cells
+        """
+        self._unshare()
+        n = len(self.coords)
+        self.coords.extend(coords)
+        self.ids.update(zip(coords, range(n, len(self.coords))))
+        self.values.extend(values)
+        self.cell_constraints.extend([[None, None] for _ in coords])
+        if len(self.ids) != len(self.coords):
+            raise RuntimeError("cells added twice")
+
+    def add_constraint(self, constraint):
+        """Add a sum constraint whose cells are already in the grid.
+
+        The constraint is linked to the constraints crossing its cells, so
+        the adjacency is built in one pass over the cells.
+        """
+        self._unshare()
+        self._index_constraint(constraint)
+
+        # a cell is covered by at most one run in each direction, and two
+        # runs cross in at most one cell
+        d = 1 if constraint.vertical else 0
+        adj = []
+        for i in constraint.ids:
+            slots = self.cell_constraints[i]
+            if slots[d] is not None:
+                msg = "{} overlaps {}".format(constraint, slots[d])
+                raise RuntimeError(msg)
+            slots[d] = constraint
+            other = slots[1-d]
+            if other is not None:
+                adj.append(other)
+                self.adjacency[other].append(constraint)
+        self.adjacency[constraint] = adj
+        self.constraints.append(constraint)
+
+    def parse_csv(self, path):
+        """Populate this object from a CSV file.
+        """
+        with open(path, newline="") as f:
+            self._parse_rows(csv.reader(f))
+
+    def parse_text(self, text):
+        """Populate this object from the text of a CSV file.
+        """
+        self._parse_rows(csv.reader(io.StringIO(text)))
 
     def parse_df(self, df):
         """Populate this object from a pandas dataframe.
         """
-        # parse the numerical cells in one pass
-        (rows, cols) = df.shape
-        for j in range(cols):
-            col = df.iloc[:, j]
-            for i in range(len(col)):
-                cell = col[i]
-                if cell == "*":
-                    pass # not recorded
-                elif cell == "0":
-                    self.cells[(i,j)] = 0
-
-        # parse the constraint cells in a second pass
-        for j in range(cols):
-            col = df.iloc[:, j]
-            for i in range(len(col)):
-                cell = col[i]
-                if "\\" in cell:
-                    self._parse_constraint_cell(cell, i, j)
+        self._parse_rows(df.astype(str).values.tolist())
 
-    def df(self):
-        """Return a dataframe representing the grid and constraints."""
-        nrows = max([c[0] for c in self.cells]) + 2
-        ncols = max([c[1] for c in self.cells]) + 2
+    def rows(self):
+        """Return the grid and constraints as a list of rows of strings."""
+        nrows = max([c[0] for c in self.coords]) + 2
+        ncols = max([c[1] for c in self.coords]) + 2
 
-        # initialize the columns to "*"
-        cols = [["*"] * nrows for _ in range(ncols)]
+        # initialize the rows to "*"
+        rows = [["*"] * ncols for _ in range(nrows)]
 
         # fill in the values for the cells
-        for c in self.cells:
-            cols[c[1]][c[0]] = self.cells[c]
+        for c, value in zip(self.coords, self.values):
+            rows[c[0]][c[1]] = str(value)
 
-        def get_row_col(constraint):
-            row = c.row
-            col = c.col
+        # fill in the constraint indicators, the sum cell is left of a
+        # horizontal run and above a vertical run
+        for c in self.constraints:
             if c.vertical:
-                row -= 1
+                row, col = c.row - 1, c.col
             else:
-                col -= 1
-            return row, col
-
-        # initialize the constraint indicators
-        for c in self.constraints:
-            row, col = get_row_col(c)
-            cols[col][row] = "\\"
-
-        # fill in the constraint indicators
-        for c in self.constraints:
-            row, col = get_row_col(c)
-            vertical, horizontal = cols[col][row].split("\\")
+                row, col = c.row, c.col - 1
+            cell = rows[row][col]
+            if "\\" not in cell:
+                cell = "\\"
+            vertical, horizontal = cell.split("\\")
             if c.vertical:
-                cols[col][row] = str(c.sum) + "\\" + horizontal
+                rows[row][col] = str(c.sum) + "\\" + horizontal
             else:
-                cols[col][row] = vertical + "\\" + str(c.sum)
+                rows[row][col] = vertical + "\\" + str(c.sum)
+
+        return rows
+
+    def to_text(self):
+        """Return the text of a CSV file representing the grid."""
+        f = io.StringIO()
+        csv.writer(f, lineterminator="\n").writerows(self.rows())
+        return f.getvalue()
 
-        data = {i: col for i, col in enumerate(cols)}
-        df = pd.DataFrame(data)
-        print(df)
-        return df
+    def write_csv(self, path):
+        """Write a CSV file representing the grid."""
+        with open(path, "w", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(self.rows())
+
+    def df(self):
+        """Return a dataframe representing the grid and constraints."""
+        # pandas is slow to import and only needed here
+        import pandas as pd
+
+        rows = self.rows()
+        data = {j: [row[j] for row in rows] for j in range(len(rows[0]))}
+        return pd.DataFrame(data)
         
 
     def read_cells(self, coords):
@@ -82,7 +216,7 @@ class Grid:
         ---------
         coords    list of (row,col) tuples
         """
-        return [self.cells[c] for c in coords]
+        return [self.values[self.ids[c]] for c in coords]
 
     def write_cells(self, coords, values):
         """Write values into the the specified coordinate tuples.
@@ -92,17 +226,50 @@ class Grid:
         coords    list of (row,col) tuples
         values    list of values for the corresponding cells
         """
+        cells = self.cells
         for item in zip(coords, values):
-            self.cells[item[0]] = item[1]
+            cells[item[0]] = item[1]
 
     def clone(self):
         """Return a deep copy.
+
+        The copy shares the layout of the cells and copies their values.
         """
         grid = Grid()
-        grid.cells = dict(self.cells)
+        grid.coords = self.coords
+        grid.ids = self.ids
+        grid.values = array("b", self.values)
         grid.constraints = list(self.constraints)
+        grid.cell_constraints = self.cell_constraints
+        grid.adjacency = self.adjacency
+        grid._shared = self._shared = True
         return grid
         
+    def _parse_rows(self, rows):
+        """Populate this object from rows of cell strings in one pass.
+
+        Cells are "*" for blocked cells, "0" for empty cells, a digit for
+        cells with a known value, or "vertical\\horizontal" sums.
+        """
+        # record the numerical cells, and the sum cells to be parsed once
+        # the lengths of their runs are known
+        sums = []
+        for i, row in enumerate(rows):
+            for j, cell in enumerate(row):
+                cell = cell.strip()
+                if cell == "*":
+                    pass # not recorded
+                elif "\\" in cell:
+                    sums.append((cell, i, j))
+                elif len(cell) == 1 and cell.isdigit():
+                    self.add_cell((i,j), int(cell))
+                else:
+                    msg = "invalid cell '{}' in cell {}".format(cell, coord(i,j))
+                    raise RuntimeError(msg)
+
+        for cell, i, j in sums:
+            self._parse_constraint_cell(cell, i, j)
+
     def _parse_constraint_cell(self, cell, i, j):
         constraints = cell.split("\\")
         if len(constraints) != 2:
@@ -137,11 +304,29 @@ class Grid:
 
         # store the constraint
         c = Constraint(s, start_cell[0], start_cell[1], vertical, length)
-        self.constraints.append(c)
+        self.add_constraint(c)
             
     def _get_constraint_length(self, cell, step):
         length = 0
-        while cell in self.cells:
+        while cell in self.ids:
             length = length + 1
             cell = (cell[0] + step[0], cell[1] + step[1])
         return length
+
+    def _unshare(self):
+        # copy a layout that may be shared before changing it
+        if self._shared:
+            self.coords = list(self.coords)
+            self.ids = dict(self.ids)
+            self.constraints = list(self.constraints)
+            self.cell_constraints = [list(s) for s in self.cell_constraints]
+            self.adjacency = {c: list(a) for c, a in self.adjacency.items()}
+            self._shared = False
+
+    def _index_constraint(self, constraint):
+        try:
+            constraint.ids = array("i", [self.ids[c] for c in constraint.cells])
+        except KeyError as e:
+            msg = "{} covers cell {} not in the grid".format(
+                constraint, coord(*e.args[0]))
+            raise RuntimeError(msg)
@@ -0,0 +1,237 @@
+import collections
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+from array import array
+
+from .combinations import *
+from .solve import *
+from .trace import *
+
+# subproblems per worker made before the search starts
+SPLIT_FACTOR = 8
+
+# nodes a worker searches in a subproblem before splitting it again, the
+# budget of the new subproblems is doubled each time
+SPLIT_NODES = 20000
+
+
+def split(grid, constraints, values, domains=None):
+    """Return the subproblems of a search node.
+
+    The free cells of the first constraint of the ordering that has some
+    are filled in with each of the constraint's candidate fillings, in
+    the order the search tries them.  Fillings that repeat a digit in a
+    crossing run, exceed its sum or leave it without digit sets are left
+    out.
+
+    Arguments
+    ---------
+    grid         puzzle
+    constraints  ordering of the constraints, see get_ordered_constraints()
+    values       cell values of the node indexed by cell id, 0 if free
+    domains      candidate digit masks of the cells, see presolve.Presolve
+
+    Returns
+    -------
+    List of the cell values of each subproblem, or None if the node has
+    no free cell.
+    """
+    for c in constraints:
+        free = [i for i in c.ids if values[i] == 0]
+        if free:
+            break
+    else:
+        return None
+
+    given = [values[i] for i in c.ids if values[i] != 0]
+    if len(set(given)) != len(given):
+        return []
+    children = []
+    for mask in combinations(c.sum - sum(given), len(free),
+                             digit_mask(given)):
+        for digits in permutations(mask):
+            if domains is not None and any(
+                    not domains[i] & (1 << (v - 1))
+                    for i, v in zip(free, digits)):
+                continue
+            child = array("b", values)
+            for i, v in zip(free, digits):
+                child[i] = v
+            if _consistent(grid, child, free):
+                children.append(child)
+    return children
+
+
+def solve_parallel(grid, workers=0, order="combos", domains=None,
+                   split_nodes=SPLIT_NODES, **options):
+    """Solve with the custom search spread over worker processes.
+
+    The search tree is split at its first levels into subproblems, see
+    split(), until there are SPLIT_FACTOR per worker.  The workers take
+    the subproblems in the order the search would visit them, one at a
+    time from the parent.  A subproblem not solved within its node
+    budget is split again and its subproblems are handed out before the
+    rest, so a large subtree is shared by the workers that are idle.
+    All workers are stopped as soon as one of them finds a solution.
+
+    Arguments
+    ---------
+    grid         grid to solve
+    workers      number of worker processes, 0 for one per core, 1 to
+                 search in this process
+    order        constraint ordering, one of ORDERINGS
+    domains      candidate digit masks of the cells, see presolve.Presolve
+    split_nodes  node budget of the first subproblems
+
+    Returns
+    -------
+    The solved grid.
+    """
+    workers = workers or os.cpu_count() or 1
+    with trace_span("ordering"):
+        adj = constraint_adjacency(grid)
+        constraints = get_ordered_constraints(grid, adj, order)
+    # workers of a process pool are daemons, which cannot start processes
+    if workers == 1 or multiprocessing.current_process().daemon:
+        with trace_span("search"):
+            solution = Solver(grid, adj, constraints, order=order,
+                              domains=domains).solve()
+        if solution is None:
+            raise RuntimeError("puzzle has no solution")
+        return solution
+
+    start = time.time()
+    with trace_span("split"):
+        pending = collections.deque([array("b", grid.values)])
+        while 0 < len(pending) < workers * SPLIT_FACTOR:
+            children = []
+            for values in pending:
+                nodes = split(grid, constraints, values, domains)
+                if nodes is None:
+                    children = None # a solution, left to the workers
+                    break
+                children.extend(nodes)
+            if children is None:
+                break
+            pending = collections.deque(children)
+    tasks = len(pending)
+    pending = collections.deque((values, split_nodes) for values in pending)
+
+    with trace_span("search"):
+        (solution, stats) = _search(grid, adj, constraints, domains,
+                                    pending, workers)
+    print("Total time {} s, {} workers, {} subproblems, {} splits, "
+          "{} nodes".format(time.time() - start, workers,
+                            tasks + stats["split"], stats["splits"],
+                            stats["nodes"]))
+    trace_count("nodes", stats["nodes"])
+    trace_count("splits", stats["splits"])
+    if solution is None:
+        raise RuntimeError("puzzle has no solution")
+    return solution
+
+
+def _search(grid, adj, constraints, domains, pending, workers):
+    # hand out the subproblems to worker processes until one is solved,
+    # and return the solution, or None, with the search statistics
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=_worker, args=(grid, adj, constraints, domains, tasks,
+                              results), daemon=True)
+                 for _ in range(min(workers, len(pending)))]
+    stats = {"nodes": 0, "splits": 0, "split": 0}
+    solution = None
+    try:
+        for p in processes:
+            p.start()
+        running = 0
+        while pending or running:
+            while pending and running < len(processes):
+                tasks.put(pending.popleft())
+                running += 1
+            (values, children, budget, nodes, error) = results.get()
+            running -= 1
+            stats["nodes"] += nodes
+            if error is not None:
+                raise RuntimeError("search worker failed, {}".format(error))
+            if values is not None:
+                solution = grid.clone()
+                solution.values = values
+                break
+            if children:
+                # the subtree is shared before the rest of the tree
+                stats["splits"] += 1
+                stats["split"] += len(children)
+                pending.extendleft((child, budget * 2)
+                                   for child in reversed(children))
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join()
+        tasks.cancel_join_thread()
+        tasks.close()
+        results.close()
+    return (solution, stats)
+
+
+def _worker(grid, adj, constraints, domains, tasks, results):
+    # search subproblems, reporting (solution, subproblems, budget,
+    # nodes, error) for each
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            (values, budget) = tasks.get()
+            try:
+                work = grid.clone()
+                work.values = values
+                solver = Solver(work, adj, constraints, domains=domains,
+                                max_nodes=budget)
+                solution = solver.solve()
+                children = None
+                if solution is None and solver.limited:
+                    children = split(grid, constraints, values, domains)
+                    if children is None:
+                        # every cell is filled in, only checks are left
+                        solver.max_nodes = None
+                        solution = solver.solve()
+                if solution is not None:
+                    solution = solution.values
+                results.put((solution, children, budget, solver.nodes,
+                             None))
+            except Exception as e:
+                results.put((None, None, budget, 0,
+                             "{}: {}".format(type(e).__name__, e)))
+
+
+def _consistent(grid, values, cells):
+    # True if the runs of some newly filled cells can still be completed
+    for i in cells:
+        for c in grid.cell_constraints[i]:
+            if c is None:
+                continue
+            digits = [values[j] for j in c.ids if values[j] != 0]
+            total = sum(digits)
+            if len(set(digits)) != len(digits) or total > c.sum:
+                return False
+            if len(digits) == c.length:
+                if total != c.sum:
+                    return False
+            elif combination_count(c, values) == 0:
+                return False
+    return True
+
+
+def enumerate_solutions(grid, limit=None, verbose=False, order="combos",
+                        domains=None, **options):
+    """Return up to `limit` solutions of a grid, all if limit is None.
+
+    Solutions are enumerated by the custom search in this process.
+    """
+    with trace_span("build"):
+        solver = Solver(grid, order=order, domains=domains)
+    with trace_span("search"):
+        return solver.solutions(limit)
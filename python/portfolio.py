@@ -0,0 +1,180 @@
+import json
+import multiprocessing.connection
+import os
+import time
+
+from .algorithms import PORTFOLIO
+from .cache import default_path, fingerprint
+from .grid import *
+from .verify import *
+from .workers import *
+
+
+def default_log():
+    """Return the file recording the winner of each race.
+
+    This is $CROSSSUMS_PORTFOLIO_LOG if set, else portfolio.jsonl next to
+    the solution cache.
+    """
+    path = os.environ.get("CROSSSUMS_PORTFOLIO_LOG")
+    if path:
+        return path
+    return os.path.join(os.path.dirname(default_path()), "portfolio.jsonl")
+
+
+def solve_portfolio(grid, engines=None, time_limit=None, log=None,
+                    domains=None, **options):
+    """Race algorithms in separate processes and keep the first solution.
+
+    Every engine solves the whole grid in its own worker process.  The
+    first solution that satisfies the grid's runs wins, and the other
+    workers are killed together with the processes they started, such
+    as CBC.  An engine that fails or returns an invalid grid is left out
+    of the race.
+
+    Arguments
+    ---------
+    grid        grid to solve
+    engines     list of algorithm names, by default PORTFOLIO
+    time_limit  seconds to wait for a solution, None to wait for all
+                engines, also passed to the engines
+    log         JSON lines file to append the winner to, by default
+                default_log(), or "" to record nothing
+    domains     candidate digit masks of the presolve, left out since
+                every engine presolves the grid again
+    options     options passed to every engine
+
+    Returns
+    -------
+    The solved grid.
+    """
+    engines = list(engines) if engines is not None else PORTFOLIO
+    if not engines:
+        raise RuntimeError("the portfolio needs at least one engine")
+    if "portfolio" in engines:
+        raise RuntimeError("the portfolio cannot race itself")
+    if time_limit is not None:
+        options["time_limit"] = time_limit
+    text = grid.to_text()
+
+    start = time.perf_counter()
+    workers = {}
+    errors = []
+    try:
+        for algo in engines:
+            worker = Worker([algo])
+            worker.send(text, algo, options)
+            workers[worker.conn] = (algo, worker)
+
+        winner = None
+        while workers and winner is None:
+            wait = None
+            if time_limit is not None:
+                wait = max(0, time_limit - (time.perf_counter() - start))
+            ready = multiprocessing.connection.wait(list(workers), wait)
+            if not ready:
+                raise RuntimeError("no solution within {} s".format(
+                    time_limit))
+            for conn in ready:
+                (algo, worker) = workers.pop(conn)
+                try:
+                    record = worker.recv()
+                except EOFError:
+                    record = {"status": "error",
+                              "error": "worker process died"}
+                worker.close()
+                if record["status"] != "solved":
+                    errors.append("{}: {}".format(algo, record["error"]))
+                    continue
+
+                solution = _read_solution(grid, record["solution"])
+                invalid = ["the cells differ from the puzzle's"] \
+                    if solution is None else verify(solution, grid)
+                if invalid:
+                    errors.append("{}: invalid solution, {}".format(
+                        algo, invalid[0]))
+                    continue
+                winner = (algo, record["time"], solution)
+                break
+    finally:
+        kill_workers([worker for (algo, worker) in workers.values()])
+
+    elapsed = time.perf_counter() - start
+    if winner is None:
+        raise RuntimeError("no engine solved the puzzle, {}".format(
+            "; ".join(errors)))
+    (algo, solve_time, solution) = winner
+    print("portfolio winner {} in {} s of {}".format(algo, elapsed,
+                                                     ", ".join(engines)))
+    if log != "":
+        record_winner(log, grid, engines, algo, solve_time, elapsed)
+    return solution
+
+
+def record_winner(path, grid, engines, winner, solve_time, elapsed):
+    """Append the outcome of a race to a JSON lines file.
+
+    Arguments
+    ---------
+    path        file to append to, None for default_log()
+    grid        puzzle of the race
+    engines     algorithms raced
+    winner      algorithm that won
+    solve_time  seconds the winner spent solving
+    elapsed     seconds of the race, including the process startup
+    """
+    if path is None:
+        path = default_log()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    record = {
+        "puzzle": fingerprint(grid)[0],
+        "cells": len(grid.coords),
+        "runs": len(grid.constraints),
+        "engines": list(engines),
+        "winner": winner,
+        "solve_time": solve_time,
+        "time": elapsed,
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def portfolio_stats(path=None):
+    """Summarize the races recorded in a log.
+
+    Returns
+    -------
+    Dictionary of engine -> dictionary with the number of "wins" and the
+    median "time" of the races it won.
+    """
+    if path is None:
+        path = default_log()
+    times = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                times.setdefault(record["winner"], []).append(record["time"])
+    stats = {}
+    for algo, t in sorted(times.items(), key=lambda kv: -len(kv[1])):
+        t.sort()
+        stats[algo] = {"wins": len(t), "time": t[len(t) // 2]}
+    return stats
+
+
+def _read_solution(puzzle, text):
+    # return a copy of the puzzle with the values of a solution's text,
+    # or None if the text has other cells
+    parsed = Grid()
+    try:
+        parsed.parse_text(text)
+    except RuntimeError:
+        return None
+    if set(parsed.coords) != set(puzzle.coords):
+        return None
+    solution = puzzle.clone()
+    solution.write_cells(parsed.coords, parsed.values)
+    return solution
+
@@ -0,0 +1,79 @@
+import time
+
+from .combinations import *
+from . import solve_propagate
+from .trace import *
+
+
+def model_size(domains):
+    """Return the size of the model a backend builds from candidate masks.
+
+    Cells with one candidate are constants in every backend, so only the
+    free cells count.
+
+    Returns
+    -------
+    Dictionary with the number of free cells, and of their candidate
+    digits, which is the number of binary variables of the ip backend.
+    """
+    free = [d for d in domains if MASK_LENGTH[d] > 1]
+    return {
+        "cells": len(free),
+        "candidates": sum(MASK_LENGTH[d] for d in free),
+    }
+
+
+class Presolve:
+    """Puzzle narrowed by propagation before any backend builds its model.
+
+    The candidate digits of each cell are narrowed to those its runs'
+    combinations allow, until no run narrows them further, see
+    solve_propagate.Solver.propagate().  Cells left with one candidate
+    are filled in, and the candidates of the others are passed to the
+    backends as the `domains` option.  Cells outside every run take any
+    digit and are given 1, as merge() does.
+    """
+    def __init__(self, grid):
+        """Presolve a puzzle.
+
+        Arguments
+        ---------
+        grid   puzzle to presolve, it is left unchanged
+
+        Raises RuntimeError if some cell is left without candidates.
+        """
+        start = time.perf_counter()
+        model = solve_propagate.Solver(grid)
+        self.before = model_size(model.domains)
+        domains = model.propagate(list(model.domains),
+                                  range(len(model.runs)))
+        if domains is None:
+            raise RuntimeError("puzzle has no solution, found by the "
+                               "presolve")
+        for i, slots in enumerate(grid.cell_constraints):
+            if slots == [None, None] and MASK_LENGTH[domains[i]] > 1:
+                domains[i] = digit_mask([1])
+
+        self.domains = domains # cell id -> mask of candidate digits
+        self.grid = grid.clone() # the puzzle with the forced digits
+        values = self.grid.values
+        for i, d in enumerate(domains):
+            if MASK_LENGTH[d] == 1:
+                values[i] = MASK_SUM[d]
+        self.after = model_size(domains)
+        self.time = time.perf_counter() - start
+        trace_count("fixed_cells", self.before["cells"] - self.after["cells"])
+
+    def report(self):
+        """Return a line describing the model sizes before and after.
+        """
+        return ("Presolve {} -> {} free cells, {} -> {} candidates in {} s"
+                .format(self.before["cells"], self.after["cells"],
+                        self.before["candidates"],
+                        self.after["candidates"], self.time))
+
+    def part_domains(self, part):
+        """Return the candidate masks of the cells of a subgrid.
+        """
+        ids = self.grid.ids
+        return [self.domains[ids[c]] for c in part.coords]
@@ -0,0 +1,449 @@
+import asyncio
+import json
+import math
+import os
+import signal
+import time
+import urllib.parse
+
+from .algorithms import *
+from .bench import summarize
+from .workers import *
+
+# largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+# seconds a client may take to send its request
+READ_TIMEOUT = 10
+
+# reason phrases of the status codes sent
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP status code.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class WorkerPool:
+    """Pool of warm worker processes used from an event loop.
+
+    A worker is killed and replaced when its puzzle times out or the
+    request is cancelled, the others keep their imported modules.
+    """
+    def __init__(self, size, algos):
+        """Start the workers.
+
+        Arguments
+        ---------
+        size    number of worker processes
+        algos   algorithms the workers import before the first puzzle
+        """
+        self.algos = warm(algos)
+        self.size = size
+        self.idle = asyncio.Queue()
+        self.workers = set()
+        for _ in range(size):
+            self._add()
+
+    def _add(self):
+        # start a worker and make it idle
+        worker = Worker(self.algos)
+        self.workers.add(worker)
+        self.idle.put_nowait(worker)
+
+    async def solve(self, text, algo, options=None, timeout=None):
+        """Solve a puzzle on the first idle worker.
+
+        Raises asyncio.TimeoutError if the puzzle is not solved within
+        `timeout` seconds, the time waiting for a worker is not counted.
+
+        Returns
+        -------
+        Record of the puzzle, see solve_text().
+        """
+        worker = await self.idle.get()
+        try:
+            record = await asyncio.wait_for(
+                self._call(worker, text, algo, options), timeout)
+        except BaseException:
+            # cancelled, timed out or died: the worker may be busy or
+            # gone, so it is replaced by a new one
+            self.workers.discard(worker)
+            worker.kill()
+            self._add()
+            raise
+        self.idle.put_nowait(worker)
+        return record
+
+    async def _call(self, worker, text, algo, options):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def on_readable():
+            if not ready.done():
+                ready.set_result(None)
+
+        loop.add_reader(worker.fileno(), on_readable)
+        try:
+            worker.send(text, algo, options)
+            await ready
+        finally:
+            loop.remove_reader(worker.fileno())
+        try:
+            return worker.recv()
+        except EOFError:
+            raise RuntimeError("worker process died") from None
+
+    def close(self):
+        """Stop all workers, busy ones included.
+        """
+        kill_workers(list(self.workers))
+        self.workers.clear()
+
+
+class Server:
+    """HTTP server solving puzzles on a pool of warm workers.
+
+    POST /solve takes the CSV text of a puzzle, or a JSON object with
+    the CSV text as "puzzle" and optional "algo" and "timeout".  The
+    algo and timeout can also be given in the query string.  The answer
+    is the JSON record of solve_text() with status 200 if solved, 422 if
+    the puzzle has no solution or is invalid, 504 on timeout, 503 if
+    the queue is full and 500 if the worker died.  GET /health returns
+    the state of the pool.
+
+    Each connection carries one request.  A client closing its
+    connection cancels its puzzle.
+    """
+    def __init__(self, algo="propagate", workers=None, queue_size=16,
+                 timeout=30, algos=None):
+        """
+        Arguments
+        ---------
+        algo        algorithm of requests that do not choose one
+        workers     number of worker processes, None for the number of
+                    CPUs
+        queue_size  number of requests that can wait for a worker,
+                    further requests are answered with 503
+        timeout     seconds allowed per puzzle unless the request asks
+                    for less
+        algos       algorithms the workers import, by default all
+        """
+        self.algo = check_algorithm(algo)
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.algos = algos if algos is not None else algorithm_names()
+        self.pool = None
+        self.server = None
+        self.active = 0      # requests waiting for or on a worker
+        self.served = 0      # requests answered
+        self.rejected = 0    # requests refused with a full queue
+        self.timeouts = 0    # puzzles stopped by their timeout
+        self.cancelled = 0   # puzzles stopped by the client leaving
+
+    async def start(self, host="127.0.0.1", port=8000, unix=None):
+        """Start the workers and listen on a TCP port or a Unix socket.
+
+        Returns
+        -------
+        The asyncio server, port 0 picks a free port, see its sockets.
+        """
+        self.pool = WorkerPool(self.workers, self.algos)
+        if unix is not None:
+            self.server = await asyncio.start_unix_server(self._handle, unix)
+        else:
+            self.server = await asyncio.start_server(
+                self._handle, host, port)
+        return self.server
+
+    async def serve_forever(self):
+        """Answer requests until cancelled, then stop the workers.
+        """
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop listening and stop the workers.
+        """
+        if self.server is not None:
+            self.server.close()
+        if self.pool is not None:
+            self.pool.close()
+
+    def health(self):
+        """Return the state of the server as a dictionary.
+        """
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "idle": self.pool.idle.qsize(),
+            "active": self.active,
+            "queue_size": self.queue_size,
+            "served": self.served,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                (method, path, query, body) = await asyncio.wait_for(
+                    _read_request(reader), READ_TIMEOUT)
+                (status, record) = await self._route(
+                    reader, method, path, query, body)
+            except HTTPError as e:
+                (status, record) = (e.status, {"error": str(e)})
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                return # the client is too slow or went away
+            headers = {"Retry-After": "1"} if status == 503 else {}
+            _write_response(writer, status, record, headers)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, reader, method, path, query, body):
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET on /health")
+            return (200, self.health())
+        if path != "/solve":
+            raise HTTPError(404, "unknown path '{}'".format(path))
+        if method != "POST":
+            raise HTTPError(405, "use POST on /solve")
+
+        (text, algo, timeout) = self._parse_solve(query, body)
+        if self.active >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPError(503, "queue is full")
+
+        self.active += 1
+        try:
+            record = await self._solve(reader, text, algo, timeout)
+        finally:
+            self.active -= 1
+        self.served += 1
+        return (200 if record["status"] == "solved" else 422, record)
+
+    def _parse_solve(self, query, body):
+        # return the puzzle text, algorithm and timeout of a request
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPError(400, "the body is not UTF-8") from None
+        params = {}
+        if text.lstrip().startswith("{"):
+            try:
+                params = json.loads(text)
+            except ValueError as e:
+                raise HTTPError(400, "invalid JSON: {}".format(e)) from None
+            if not isinstance(params, dict) or \
+                    not isinstance(params.get("puzzle"), str):
+                raise HTTPError(400, "the JSON needs a puzzle string")
+            text = params["puzzle"]
+        params.update(query)
+
+        algo = params.get("algo", self.algo)
+        try:
+            check_algorithm(algo)
+        except RuntimeError as e:
+            raise HTTPError(400, str(e)) from None
+        try:
+            timeout = float(params.get("timeout", self.timeout))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "the timeout is not a number") from None
+        if not math.isfinite(timeout) or timeout <= 0:
+            raise HTTPError(400, "the timeout is not a positive number")
+        return (text, algo, min(timeout, self.timeout))
+
+    async def _solve(self, reader, text, algo, timeout):
+        # solve on a worker unless the client leaves first, which shows
+        # as the end of its stream
+        solve = asyncio.ensure_future(
+            self.pool.solve(text, algo, timeout=timeout))
+        left = asyncio.ensure_future(reader.read())
+        try:
+            await asyncio.wait([solve, left],
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            left.cancel()
+        if not solve.done():
+            self.cancelled += 1
+            solve.cancel()
+            await asyncio.gather(solve, return_exceptions=True)
+            raise asyncio.CancelledError()
+        try:
+            return solve.result()
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPError(504, "no solution within {} s".format(
+                timeout)) from None
+        except RuntimeError as e:
+            raise HTTPError(500, str(e)) from None
+
+
+def serve(host="127.0.0.1", port=8000, unix=None, **options):
+    """Run a Server until interrupted, see Server for the options.
+    """
+    async def main():
+        server = Server(**options)
+        await server.start(host, port, unix)
+        where = unix if unix is not None else "http://{}:{}".format(
+            *server.server.sockets[0].getsockname()[:2])
+        print("serving on {} with {} workers".format(where, server.workers),
+              flush=True)
+
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except asyncio.CancelledError:
+        pass
+
+
+async def request(method, path, body=b"", host="127.0.0.1", port=8000,
+                  unix=None):
+    """Send one request to a Server.
+
+    Returns
+    -------
+    Tuple of the status code and the decoded JSON answer.
+    """
+    if unix is not None:
+        (reader, writer) = await asyncio.open_unix_connection(unix)
+    else:
+        (reader, writer) = await asyncio.open_connection(host, port)
+    try:
+        head = "{} {} HTTP/1.1\r\nHost: {}\r\nContent-Length: {}\r\n" \
+               "Connection: close\r\n\r\n".format(method, path, host,
+                                                  len(body))
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    (head, _, data) = response.partition(b"\r\n\r\n")
+    status = int(head.split(None, 2)[1])
+    return (status, json.loads(data))
+
+
+def load_test(puzzles, requests=100, concurrency=4, algo=None,
+              host="127.0.0.1", port=8000, unix=None):
+    """Measure the throughput and latency of a Server.
+
+    Arguments
+    ---------
+    puzzles      list of CSV texts, sent in turn
+    requests     number of requests
+    concurrency  number of requests in flight at once
+    algo         algorithm asked for, None for the server's default
+
+    Returns
+    -------
+    Dictionary with the number of requests per status code, the
+    throughput in requests per second and the summary of the latencies,
+    see summarize().
+    """
+    path = "/solve"
+    if algo is not None:
+        path += "?" + urllib.parse.urlencode({"algo": algo})
+
+    async def main():
+        latencies = []
+        statuses = {}
+        queue = asyncio.Queue()
+        for k in range(requests):
+            queue.put_nowait(puzzles[k % len(puzzles)].encode("utf-8"))
+
+        async def client():
+            while not queue.empty():
+                body = queue.get_nowait()
+                t0 = time.perf_counter()
+                try:
+                    (status, _) = await request(
+                        "POST", path, body, host, port, unix)
+                except (OSError, ValueError):
+                    status = "failed"
+                latencies.append(time.perf_counter() - t0)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        return {
+            "requests": requests,
+            "concurrency": concurrency,
+            "statuses": {str(k): v for k, v in sorted(
+                statuses.items(), key=lambda kv: str(kv[0]))},
+            "throughput": requests / elapsed,
+            "latency": summarize(latencies),
+        }
+
+    return asyncio.run(main())
+
+
+async def _read_request(reader):
+    # return the method, path, query parameters and body of a request
+    line = await reader.readline()
+    if not line:
+        raise asyncio.IncompleteReadError(line, None)
+    try:
+        (method, target, _) = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "invalid request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        (name, _, value) = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length") from None
+    if length < 0:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "the body is over {} bytes".format(MAX_BODY))
+    body = await reader.readexactly(length)
+
+    url = urllib.parse.urlsplit(target)
+    query = dict(urllib.parse.parse_qsl(url.query))
+    return (method.upper(), url.path, query, body)
+
+
+def _write_response(writer, status, record, headers):
+    body = json.dumps(record).encode("utf-8") + b"\n"
+    lines = ["HTTP/1.1 {} {}".format(status, REASONS.get(status, "")),
+             "Content-Type: application/json",
+             "Content-Length: {}".format(len(body)),
+             "Connection: close"]
+    lines += ["{}: {}".format(k, v) for k, v in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
@@ -0,0 +1,284 @@
+import time
+from array import array
+
+from .combinations import *
+from .decompose import *
+from .grid import *
+from .solve import combination_count
+from .solve_propagate import LIMIT, Solver
+
+# rings of runs around an edit that are re-solved with the rest of the
+# previous solution kept, before the whole component is searched again
+REPAIR_RINGS = 2
+
+# search nodes allowed per edit, beyond which the session gives up until
+# the next edit
+MAX_NODES = 2000
+
+
+class Session:
+    """Puzzle being edited, re-solved after every change.
+
+    The session keeps its own copy of the grid, the connected components
+    of its runs, the model of the propagate solver and the solution of
+    each component.  An edit re-checks only the runs it touches.  If the
+    previous solution still fits, it is kept; otherwise the runs around
+    the edit are searched again with the rest of the previous solution
+    kept as given digits, and only if that fails is the edit's component
+    searched from scratch.
+
+    The cells of the grid hold the digits entered by the user, 0 where
+    a cell is empty.
+    """
+    def __init__(self, grid, max_nodes=MAX_NODES):
+        """Solve the puzzle.
+
+        Arguments
+        ---------
+        grid       puzzle to edit, it is copied and left unchanged
+        max_nodes  search nodes allowed per edit, None for no limit, the
+                   first solve has no limit
+        """
+        # the cells setter builds constraints of the copy's own, so that
+        # changing a sum does not change the caller's grid
+        self.grid = grid.clone()
+        self.grid.cells = dict(grid.cells)
+        # the propagation model is built once, edits change its sums and
+        # the candidates it starts from
+        self.model = Solver(self.grid)
+        self.max_nodes = None # the first solve has no node limit
+        self.run = {c: r for r, c in enumerate(self.grid.constraints)}
+        self.components = components(self.grid)
+        self.component = {} # dict of Constraint -> component index
+        for k, component in enumerate(self.components):
+            for c in component:
+                self.component[c] = k
+
+        self.solution = array("b", self.grid.values) # previous solution
+        for i, slots in enumerate(self.grid.cell_constraints):
+            if self.solution[i] == 0 and slots == [None, None]:
+                self.solution[i] = 1 # outside every run, any digit
+        # per component: True if solved, False if it has no solution,
+        # None if the search gave up
+        self.solved = [None] * len(self.components)
+        self.conflicts = {} # dict of Constraint -> list of messages
+        for c in self.grid.constraints:
+            self._check_run(c)
+        self.nodes = 0      # search nodes of the last edit
+        for k in range(len(self.components)):
+            self._resolve(k, [])
+        self.max_nodes = max_nodes
+
+    def set_cell(self, cell, value):
+        """Enter a digit in a cell, 0 to clear it.
+
+        Arguments
+        ---------
+        cell    (row,col) tuple of a numerical cell
+        value   digit in 1..9, or 0
+
+        Returns
+        -------
+        The state of the puzzle, see state().
+        """
+        i = self._cell_id(cell)
+        if not 0 <= value <= 9:
+            raise RuntimeError("invalid digit '{}' for cell {}".format(
+                value, coord(*cell)))
+        start = time.perf_counter()
+        self.grid.values[i] = value
+        runs = [c for c in self.grid.cell_constraints[i] if c is not None]
+        self._edit(runs)
+        if not runs:
+            # a cell outside every run takes any digit
+            self.solution[i] = value if value != 0 else 1
+        return self.state(time.perf_counter() - start)
+
+    def clear_cell(self, cell):
+        """Clear a cell, see set_cell().
+        """
+        return self.set_cell(cell, 0)
+
+    def set_sum(self, cell, vertical, total):
+        """Change the sum of a run.
+
+        Arguments
+        ---------
+        cell      (row,col) tuple of any cell of the run
+        vertical  True for the vertical run of the cell, False for the
+                  horizontal one
+        total     new sum of the run
+
+        Returns
+        -------
+        The state of the puzzle, see state().
+        """
+        c = self.grid.cell_constraints[self._cell_id(cell)][int(vertical)]
+        if c is None:
+            raise RuntimeError("no {} run covers cell {}".format(
+                "vertical" if vertical else "horizontal", coord(*cell)))
+        if total < 1:
+            raise RuntimeError("invalid sum '{}' for {}".format(total, c))
+        start = time.perf_counter()
+        c.sum = total
+        self.model.sums[self.run[c]] = total
+        self._edit([c])
+        return self.state(time.perf_counter() - start)
+
+    def state(self, elapsed=0):
+        """Return the state of the puzzle.
+
+        Returns
+        -------
+        Dictionary with
+          conflicts  list of messages naming the runs that cannot be
+                     completed
+          unknown    list of messages naming the parts of the puzzle
+                     whose search gave up
+          hints      dictionary of (row,col) -> digit of a solution for
+                     the empty cells of the solved parts
+          solved     True if every cell is filled in and valid
+          time       seconds taken by the edit
+        """
+        conflicts = [m for c in self.grid.constraints
+                     for m in self.conflicts.get(c, [])]
+        unknown = []
+        for k, solved in enumerate(self.solved):
+            first = self.components[k][0]
+            if solved is None:
+                unknown.append("no solution found for the runs from {} "
+                               "within {} nodes".format(first,
+                                                        self.max_nodes))
+            elif not solved and not any(c in self.conflicts
+                                        for c in self.components[k]):
+                conflicts.append(
+                    "no solution for the runs from {}".format(first))
+
+        hints = {}
+        values = self.grid.values
+        for i, v in enumerate(values):
+            runs = [c for c in self.grid.cell_constraints[i] if c is not None]
+            if v == 0 and all(self.solved[self.component[c]] for c in runs):
+                hints[self.grid.coords[i]] = self.solution[i]
+        return {
+            "conflicts": conflicts,
+            "unknown": unknown,
+            "hints": hints,
+            "solved": not conflicts and not unknown and not hints,
+            "time": elapsed,
+        }
+
+    def to_grid(self):
+        """Return a copy of the grid holding the current solution.
+        """
+        grid = self.grid.clone()
+        grid.values = array("b", self.solution)
+        return grid
+
+    def _cell_id(self, cell):
+        i = self.grid.ids.get(cell)
+        if i is None:
+            raise RuntimeError("cell {} is not a numerical cell".format(
+                coord(*cell)))
+        return i
+
+    def _edit(self, runs):
+        # re-check the runs of an edit and re-solve their components
+        self.nodes = 0
+        for c in runs:
+            self._check_run(c)
+        for k in sorted(set(self.component[c] for c in runs)):
+            self._resolve(k, [c for c in runs if self.component[c] == k])
+
+    def _check_run(self, c):
+        # record the messages of a run whose entered digits cannot be
+        # completed to its sum
+        values = self.grid.values
+        digits = [values[i] for i in c.ids if values[i] != 0]
+        messages = []
+        repeated = sorted(set(d for d in digits if digits.count(d) > 1))
+        if repeated:
+            messages.append("{} repeats {}".format(
+                c, ", ".join(map(str, repeated))))
+        elif len(digits) == c.length:
+            if sum(digits) != c.sum:
+                messages.append("{} adds up to {} instead of {}".format(
+                    c, sum(digits), c.sum))
+        elif combination_count(c, values) == 0:
+            messages.append("{} cannot add up to {}".format(c, c.sum))
+        if messages:
+            self.conflicts[c] = messages
+        else:
+            self.conflicts.pop(c, None)
+
+    def _fits(self, runs):
+        # True if the previous solution keeps the entered digits and
+        # satisfies the edited runs, the other runs are unchanged
+        values = self.grid.values
+        solution = self.solution
+        for c in runs:
+            digits = [solution[i] for i in c.ids]
+            if sum(digits) != c.sum or len(set(digits)) != c.length:
+                return False
+            if any(values[i] not in (0, solution[i]) for i in c.ids):
+                return False
+        return True
+
+    def _resolve(self, k, runs):
+        # re-solve component k after an edit of some of its runs
+        component = self.components[k]
+        if any(c in self.conflicts for c in component):
+            self.solved[k] = False
+            return
+        if self.solved[k] and self._fits(runs):
+            return
+
+        # free the runs around the edit, keeping the previous solution
+        # elsewhere, then the whole component
+        attempts = []
+        if self.solved[k] and runs:
+            freed = set(runs)
+            for _ in range(REPAIR_RINGS + 1):
+                attempts.append(set(freed))
+                freed.update(a for c in list(freed)
+                             for a in self.grid.adjacency[c])
+                if len(freed) == len(component):
+                    break
+        attempts.append(component)
+
+        for freed in attempts:
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                self.solved[k] = None
+                break
+            solution = self._search(freed)
+            if solution is LIMIT:
+                self.solved[k] = None
+            elif solution is not None:
+                for i in set(i for c in component for i in c.ids):
+                    self.solution[i] = MASK_SUM[solution[i]]
+                self.solved[k] = True
+                return
+            else:
+                self.solved[k] = False
+
+    def _search(self, freed):
+        # search the cells of some runs, the others keep the digits of
+        # the previous solution, and return the digit mask of each cell
+        values = self.grid.values
+        domains = [digit_mask([v]) if v != 0 else
+                   digit_mask([self.solution[i] or 1])
+                   for i, v in enumerate(values)]
+        runs = set()
+        for c in freed:
+            for i in c.ids:
+                if values[i] == 0:
+                    domains[i] = ALL_DIGITS
+                runs.update(self.run[c2] for c2 in
+                            self.grid.cell_constraints[i] if c2 is not None)
+        nodes = self.model.nodes
+        max_nodes = None
+        if self.max_nodes is not None:
+            max_nodes = self.max_nodes - self.nodes
+        solution = self.model.search(domains, sorted(runs), max_nodes)
+        self.nodes += self.model.nodes - nodes
+        return solution
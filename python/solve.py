@@ -1,4 +1,14 @@
-import sys
+import heapq
+import itertools
+import math
+import time
+
+from .algorithms import ORDERINGS
+from .combinations import *
+from .trace import *
+
+# number of orderings of the digits of a set of each size
+FACTORIAL = [math.factorial(n) for n in range(10)]
 
 def generate_sums(sum, count, choices):
     """Generate all ordered lists adding to a particular value.
@@ -7,183 +17,400 @@ def generate_sums(sum, count, choices):
     ---------
     sum      value that the returned lists should add to
     count    length of lists to be returned
-    choices  list of possible addends
+    choices  list of possible addends, digits in 1..9
 
     Yields
     ------
     Lists of all ordered sums of the specified size.
     """
-    # handle the base case
-    if count == 1:
-        for i in range(len(choices)):
-            n = choices[i]
-            if sum == n:
-                yield [n]
-    else:
-        # there are 2 or more choices left to be made
-        for i in range(len(choices)):
-            n = choices[i]
-            if n < sum:
-                sub_choices = choices[0:i] + choices[i+1:]
-                for sub_list in generate_sums(sum - n, count-1, sub_choices):
-                    yield [n] + sub_list
+    excluded = ALL_DIGITS & ~digit_mask(choices)
+    for mask in combinations(sum, count, excluded):
+        for values in permutations(mask):
+            yield list(values)
 
 
 def constraint_adjacency(grid):
     """Returns the constraint adjacency list.
 
+    The adjacency is built by the grid as its constraints are added, the
+    returned dictionary is shared with the grid and should not be changed.
+
     Returns
     -------
     Dictionary of Constraint -> list[Constraint]
     """
-    # constraint -> list of adjacent constraints
-    adj = {c: [] for c in grid.constraints}
-    for c1 in grid.constraints:
-        for c2 in grid.constraints:
-            # intersection should be symmetric
-            assert c1.intersects(c2) == c2.intersects(c1)
-            
-            if c1.intersects(c2):
-                adj[c1].append(c2)
-
-    return adj
+    return grid.adjacency
     
 
-def get_ordered_constraints(grid, adj):
-    """Return a somewhat ordering of the constraints.
+def get_ordered_constraints(grid, adj, order="combos"):
+    """Return an ordering of the constraints for the search.
+
+    Each connected component of constraints is ordered in turn, so no
+    constraint is left out on a disconnected puzzle.  A component starts
+    at its best constraint, then the best constraint adjacent to one
+    already ordered is taken next, from a heap of the frontier.  Ties
+    go to the constraint added to the grid first.
+
+    Arguments
+    ---------
+    grid     grid to order
+    adj      constraint adjacency list, see constraint_adjacency()
+    order    one of ORDERINGS:
+             cells    fewest cells first
+             combos   fewest candidate fillings first, the digit sets
+                      of the run times the orderings of its cells not
+                      crossed by constraints already ordered, so nearly
+                      forced runs such as 3 in 2 come early
+             fixed    fewest free cells first, a cell is fixed if it is
+                      given or crossed by a constraint already ordered,
+                      then most fixed cells and fewest digit sets
+             dynamic  combos, the search then picks the run with the
+                      fewest candidate fillings left at every node
+
+    Returns
+    -------
+    List of all the constraints of the grid.
     """
-    # initialize the set of consumed and available constraints
+    if order not in ORDERINGS:
+        raise RuntimeError("unknown constraint ordering '{}'".format(order))
+
+    index = {c: k for k, c in enumerate(grid.constraints)}
+    combos = {c: combination_count(c, grid.values) for c in grid.constraints}
+    fixed = {c: sum(1 for i in c.ids if grid.values[i] != 0)
+             for c in grid.constraints}
+
+    def key(c):
+        free = c.length - fixed[c]
+        if order == "cells":
+            return (c.length, index[c])
+        if order == "fixed":
+            return (free, -fixed[c], combos[c], index[c])
+        return (combos[c] * FACTORIAL[free], index[c])
+
+    covered = set(i for i, v in enumerate(grid.values) if v != 0)
     consumed = set() # set of used constraints
     constraints = [] # ordered list of constraints
-    constraints.append(grid.constraints[0])
-    consumed.add(grid.constraints[0])
-    available = set(adj[constraints[0]]) # set of unconsumed constraints on front
-
-    # repeatedly find an unconsumed constraint adjacent to a consumed one
-    while len(available) > 0:
-        # find the smallest constraint next
-        c1 = None
-        for c in available:
-            if c1 is None:
-                c1 = c
-            elif len(c.cells) < len(c1.cells):
-                c1 = c
-
-        available.remove(c1)
-        if c1 not in consumed:
+    for start in sorted(grid.constraints, key=key):
+        if start in consumed:
+            continue
+
+        # heap of (key, constraint) on the front, an entry is stale if
+        # the key of its constraint has changed since it was pushed
+        frontier = [(key(start), start)]
+        while frontier:
+            (k1, c1) = heapq.heappop(frontier)
+            if c1 in consumed or k1 != key(c1):
+                continue
+
             constraints.append(c1)
             consumed.add(c1)
+            covered.update(c1.ids)
             for c2 in adj[c1]:
                 if c2 not in consumed:
-                    available.add(c2)
+                    fixed[c2] = sum(1 for i in c2.ids if i in covered)
+                    heapq.heappush(frontier, (key(c2), c2))
 
     return constraints
 
 
+def combination_count(c, values):
+    """Return the number of digit sets that can fill the free cells of a run.
+
+    Arguments
+    ---------
+    c        constraint of the run
+    values   cell values indexed by cell id, 0 for a free cell
+    """
+    given = [values[i] for i in c.ids if values[i] != 0]
+    return len(combinations(c.sum - sum(given), c.length - len(given),
+                            digit_mask(given)))
+
+
 class Solver:
-    def __init__(self, grid, adj, constraints):
+    def __init__(self, grid, adj=None, constraints=None, verbose=False,
+                 order="combos", domains=None, max_nodes=None):
+        # the adjacency and ordering are computed if not given
+        if adj is None:
+            adj = constraint_adjacency(grid)
+        if constraints is None:
+            constraints = get_ordered_constraints(grid, adj, order)
+
         self.grid = grid                 # grid to solve
         self.adj = adj                   # constraint adjacency list
         self.constraints = constraints   # ordered list of constraints
+        self.verbose = verbose           # True to print every search node
+        self.dynamic = order == "dynamic" # True to pick runs while searching
         self.results = []                # list of grids satisfying constraints
+        self.nodes = 0                   # number of search nodes visited
+        self.backtracks = 0              # number of depths exhausted
+        self.prunes = 0                  # number of candidates rejected
+        self.max_nodes = max_nodes       # nodes allowed, None for no limit
+        self.limited = False             # True if the search hit max_nodes
+        # cell id -> mask of the digits the cell may hold, with bit d for
+        # digit d as in the search, from the presolve if given
+        self.allowed = [ALL_DIGITS << 1] * len(grid.coords)
+        if domains is not None:
+            self.allowed = [d << 1 for d in domains]
+
+        # Constraint k is the k-th of the ordering.  The search assigns
+        # the cells of one constraint per depth, so unless the ordering
+        # is dynamic the cells still free at each depth are known in
+        # advance.
+        index = {c: k for k, c in enumerate(constraints)}
+        self.sums = [c.sum for c in constraints]
+        self.lengths = [c.length for c in constraints]
+        self.cell_constraints = [[] for _ in grid.coords] # id -> [k]
+        for k, c in enumerate(constraints):
+            for i in c.ids:
+                self.cell_constraints[i].append(k)
+
+        self.free = []  # depth -> list of cell ids assigned at that depth
+        assigned = [v != 0 for v in grid.values]
+        for c in constraints:
+            free = [i for i in c.ids if not assigned[i]]
+            for i in free:
+                assigned[i] = True
+            self.free.append(free)
 
     def solve(self):
-        self._satisfy_constraints(0)
-        pass
+        """Return the first solution found, or None if there is none.
+        """
+        results = self.solutions(1)
+        return results[0] if results else None
+
+    def solutions(self, limit=None):
+        """Return up to `limit` solutions, or all of them if limit is None.
 
-    def _satisfy_constraints(self, index):
-        """Satisfy a list of constraints starting from an index.
+        The search continues after each solution and stops as soon as
+        the limit is reached, or after max_nodes nodes, which sets
+        `limited`.
         """
-        if index == len(self.constraints):
-            # success!
-            print("found solution!")
-            self.results.append(self.grid.clone())
-            raise StopIteration()
-        
-        print("Satisfying constraint {}/{}".format(index, len(self.constraints)))
-            
-        # get the first constraint
-        constraint = self.constraints[index]
-        
-        # determine the constraint's fixed cells
-        fixed_cells = [c for c in constraint.cells if self.grid.cells[c] != 0]
-        
-        # find the values in the fixed cells
-        fixed_values = [self.grid.cells[c] for c in fixed_cells]
-        
-        # check that the fixed values have no repeats
-        fixed_values.sort()
-        for i in range(1, len(fixed_values)):
-            if fixed_values[i-1] == fixed_values[i]:
-                return # unsatisfiable: repeated values in fixed cells
-        
-        # maybe all cells in the constraint are fixed
-        if len(fixed_values) == constraint.length:
-            # the sum must be right
-            if sum(fixed_values) != constraint.sum:
-                return # unsatisfiable: all cells fixed with incorrect sum
-        
-            # proceed to next constraint
-            self._satisfy_constraints(index+1)
-        else:
-            # check that the sum of the fixed constraints is small enough
-            fixed_sum = sum(fixed_values)
-            if fixed_sum >= constraint.sum:
-                return # unsatisfiable: sum in fixed values too high
-        
-            # determine the free cells
-            free_cells = [c for c in constraint.cells if self.grid.cells[c] == 0]
-        
-            # determine the free sum
-            free_sum = constraint.sum - fixed_sum
-        
-            # determine the available choices for values for the free sum
-            choices = [v for v in range(1,10) if v not in fixed_values]
-        
-            # generate fixed values that satisfy this constraint
-            for free_values in generate_sums(free_sum, len(free_cells), choices):
-                # apply the change to the grid
-                for item in zip(free_cells, free_values):
-                    self.grid.cells[item[0]] = item[1]
-
-                # optimization: check if adjacent constraints are
-                # still satisfiable
-                if not self._check_adjacent_constraints(constraint):
+        start = time.time()
+        self.results = []
+        self.nodes = 0
+        self.backtracks = 0
+        self.prunes = 0
+        self.limited = False
+        self._search(limit)
+        elapsed = time.time() - start
+        rate = self.nodes / elapsed if elapsed > 0 else 0
+        print(f"Total time {elapsed} s, {self.nodes} nodes, "
+              f"{rate:.0f} nodes/s, {self.backtracks} backtracks, "
+              f"{self.prunes} prunes")
+        trace_count("nodes", self.nodes)
+        trace_count("backtracks", self.backtracks)
+        trace_count("prunes", self.prunes)
+        return self.results
+
+    def _search(self, limit):
+        """Depth first search over the constraints without recursion.
+
+        Each constraint keeps the sum and the digit mask of its assigned
+        cells, so a repeated digit, an exceeded sum or a wrong complete
+        sum in any constraint is found as soon as a cell is assigned.
+        Assignments are undone from the cells of their depth.
+
+        With a static ordering depth k assigns constraint k, a dynamic
+        ordering picks the constraint of each depth when entering it.
+        """
+        # the search fills in a copy, leaving the grid unchanged
+        work = self.grid.clone()
+        values = work.values
+        sums = self.sums
+        lengths = self.lengths
+        cell_constraints = self.cell_constraints
+        allowed = self.allowed
+        n = len(self.constraints)
+
+        # a cell outside every run takes any digit
+        for i, ks in enumerate(cell_constraints):
+            if not ks and values[i] == 0:
+                values[i] = 1
+
+        # per constraint: sum, digit mask and number of assigned cells
+        run_sum = [0] * n
+        run_mask = [0] * n
+        run_count = [0] * n
+        for i, v in enumerate(values):
+            if v != 0:
+                for k in cell_constraints[i]:
+                    if run_mask[k] & (1 << v):
+                        return # repeated given digits
+                    run_sum[k] += v
+                    run_mask[k] |= 1 << v
+                    run_count[k] += 1
+        for k in range(n):
+            if run_count[k] == lengths[k] and run_sum[k] != sums[k]:
+                return # wrong sum of given digits
+
+        # per depth: constraint, its free cells, candidate iterator, and
+        # True if the cells are assigned
+        order = list(range(n))
+        frees = list(self.free)
+        candidates = [None] * n
+        assigned = [False] * n
+
+        depth = 0
+        entering = True
+        while depth >= 0:
+            if entering:
+                if self.dynamic:
+                    k = self._pick(run_sum, run_mask, run_count)
+                    if k is not None:
+                        order[depth] = k
+                        frees[depth] = [i for i in self.constraints[k].ids
+                                        if values[i] == 0]
+                else:
+                    k = depth if depth < n else None
+                if k is None:
+                    # success!
+                    self.results.append(work.clone())
+                    if limit is not None and len(self.results) >= limit:
+                        return
+                    depth -= 1
+                    entering = False
                     continue
-        
-                # proceed to the next constraint
-                self._satisfy_constraints(index+1)
-            
-            # restore the free cells to zero
-            for c in free_cells:
-                self.grid.cells[c] = 0
-
-    def _check_adjacent_constraints(self, constraint):
-        """Check that the adjacent constraints are still satisfiable."""
-        for c in self.adj[constraint]:
-            if not self._satisfiable(c):
-                return False
-        return True
-
-    def _satisfiable(self, constraint):
-        """Approximately check that this constraint is still satisfiable."""
-        # find the values of the constraint's cells
-        values = [self.grid.cells[c] for c in constraint.cells]
-        return sum(values) <= constraint.sum
-        
-                    
-def solve(grid):
-    print("num constraints: {}".format(len(grid.constraints)))
-    for c in grid.constraints:
-        print("  ", c)
-    print("num cells: {}".format(len(grid.cells)))
-    adj = constraint_adjacency(grid)
-    constraints = get_ordered_constraints(grid, adj)
-    print("constraints in ordering: {}".format(len(constraints)))
-
-    solver = Solver(grid, adj, constraints)
-    try:
-        solver.solve()
-    except StopIteration:
-        return solver.results[0]
-    
+
+                self.nodes += 1
+                if self.max_nodes is not None and self.nodes > self.max_nodes:
+                    self.limited = True
+                    return
+                if self.verbose:
+                    print("Satisfying constraint {}/{}".format(depth, n))
+                free = frees[depth]
+                free_sum = sums[k] - run_sum[k]
+                if not free:
+                    # all cells are assigned and were checked on the way
+                    candidates[depth] = iter(((),) if free_sum == 0 else ())
+                else:
+                    # the digit masks here have bit d for digit d, and
+                    # digits no free cell allows are excluded too
+                    union = 0
+                    for i in free:
+                        union |= allowed[i]
+                    masks = combinations(free_sum, len(free),
+                                         ((run_mask[k] | ~union) >> 1)
+                                         & ALL_DIGITS)
+                    candidates[depth] = itertools.chain.from_iterable(
+                        map(permutations, masks))
+                entering = False
+
+            # undo the previous assignment of this depth
+            free = frees[depth]
+            if assigned[depth]:
+                assigned[depth] = False
+                for i in free:
+                    v = values[i]
+                    for k in cell_constraints[i]:
+                        run_sum[k] -= v
+                        run_mask[k] &= ~(1 << v)
+                        run_count[k] -= 1
+                    values[i] = 0
+
+            # assign the next candidate that keeps every constraint
+            # satisfiable, or backtrack
+            for candidate in candidates[depth]:
+                j = 0
+                for j, i in enumerate(free):
+                    v = candidate[j]
+                    bit = 1 << v
+                    ok = bool(allowed[i] & bit)
+                    for k in cell_constraints[i]:
+                        s = run_sum[k] + v
+                        if run_mask[k] & bit or s > sums[k] or \
+                                (run_count[k] + 1 == lengths[k] and
+                                 s != sums[k]):
+                            ok = False
+                    if not ok:
+                        self.prunes += 1
+                        break
+                    values[i] = v
+                    for k in cell_constraints[i]:
+                        run_sum[k] += v
+                        run_mask[k] |= bit
+                        run_count[k] += 1
+                else:
+                    assigned[depth] = True
+                    depth += 1
+                    entering = True
+                    break
+
+                # undo the cells assigned before the conflict
+                for i in free[:j]:
+                    v = values[i]
+                    for k in cell_constraints[i]:
+                        run_sum[k] -= v
+                        run_mask[k] &= ~(1 << v)
+                        run_count[k] -= 1
+                    values[i] = 0
+            else:
+                candidates[depth] = None
+                self.backtracks += 1
+                depth -= 1
+
+    def _pick(self, run_sum, run_mask, run_count):
+        # Return the constraint with free cells and the fewest candidate
+        # fillings left, or None if every cell is assigned.  Constraints
+        # crossing an assigned cell come first, jumping to an untouched
+        # part of the grid makes the search thrash between the parts.
+        sums = self.sums
+        lengths = self.lengths
+        best = None
+        best_key = None
+        for k in range(len(sums)):
+            free = lengths[k] - run_count[k]
+            if free == 0:
+                continue
+            count = len(combinations(sums[k] - run_sum[k], free,
+                                     run_mask[k] >> 1))
+            if count == 0:
+                return k # dead end
+            key = (run_count[k] == 0, count * FACTORIAL[free])
+            if best is None or key < best_key:
+                best = k
+                best_key = key
+        return best
+
+
+def solve(grid, verbose=False, order="combos", domains=None, **options):
+    """Solve with the custom search.
+
+    Arguments
+    ---------
+    grid     grid to solve
+    verbose  True to print the constraints and every search node
+    order    constraint ordering, one of ORDERINGS
+    domains  candidate digit masks of the cells, see presolve.Presolve
+
+    Returns
+    -------
+    The solved grid.  Raises RuntimeError if the puzzle has no solution.
+    """
+    with trace_span("adjacency"):
+        adj = constraint_adjacency(grid)
+    with trace_span("ordering"):
+        constraints = get_ordered_constraints(grid, adj, order)
+    if verbose:
+        print("num constraints: {}".format(len(grid.constraints)))
+        for c in grid.constraints:
+            print("  ", c)
+        print("num cells: {}".format(len(grid.cells)))
+        print("constraints in ordering: {}".format(len(constraints)))
+
+    with trace_span("build"):
+        solver = Solver(grid, adj, constraints, verbose, order, domains)
+    with trace_span("search"):
+        solution = solver.solve()
+    if solution is None:
+        raise RuntimeError("puzzle has no solution")
+    return solution
+
+
+def enumerate_solutions(grid, limit=None, verbose=False, order="combos",
+                        domains=None, **options):
+    """Return up to `limit` solutions of a grid, all if limit is None.
+    """
+    with trace_span("build"):
+        solver = Solver(grid, verbose=verbose, order=order, domains=domains)
+    with trace_span("search"):
+        return solver.solutions(limit)
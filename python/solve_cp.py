@@ -1,49 +1,186 @@
 from ortools.sat.python import cp_model
 
+from .combinations import *
+from .trace import *
+
+# encodings of the run constraints
+ENCODINGS = ["sum", "table"]
+
+# runs with more allowed orderings than this use the sum encoding even
+# when the table encoding is selected
+TABLE_LIMIT = 5000
+
 
 class Solver:
-    def __init__(self, grid):
+    def __init__(self, grid, encoding="sum", workers=0, time_limit=None,
+                 hint=None, domains=None):
+        """Build the CP-SAT model.
+
+        Arguments
+        ---------
+        grid        grid to solve
+        encoding    "sum" for a linear sum and all-different per run, or
+                    "table" for the allowed orderings of the run's digits
+        workers     number of search workers, 0 for one per core
+        time_limit  seconds allowed for the search, None for no limit
+        hint        grid whose nonzero cells are hinted to the search
+        domains     candidate digit masks of the cells, None for all
+                    digits, see presolve.Presolve
+        """
+        if encoding not in ENCODINGS:
+            raise RuntimeError("unknown CP encoding '{}'".format(encoding))
+
         self.grid = grid
         self.prob = cp_model.CpModel() # OR tools cp model
         self._x = {}     # dict of cell -> CP Variable
+        self.workers = workers
+        self.time_limit = time_limit
+        self.table_runs = 0 # number of runs with the table encoding
 
         # Make a dictionary of integer variables. Every variable can
-        # have a value from 1 to 9.
+        # have a value from 1 to 9, or its candidate digits if given,
+        # cells with a known value are constants.
         for c in grid.cells.keys():
-            if grid.cells[c] == 0:
+            if grid.cells[c] == 0 and domains is not None:
+                digits = mask_digits(domains[grid.ids[c]])
+                v = self.prob.NewIntVarFromDomain(
+                    cp_model.Domain.FromValues(digits), "x%i_%i" % c)
+            elif grid.cells[c] == 0:
                 v = self.prob.NewIntVar(1, 9, "x%i_%i" % c)
-                self._x[c] = v
+            else:
+                v = self.prob.NewConstant(grid.cells[c])
+            self._x[c] = v
 
         # Add the constraints
         for con in grid.constraints:
             v = [self._x[c] for c in con.cells]
+            if encoding == "table" and self._add_table(con, v):
+                continue
             # Sum of cells
             self.prob.Add(sum(v) == con.sum)
             # All values are unique
             self.prob.AddAllDifferent(v)
 
-        
+        # Hint the values of a previous solution
+        if hint is not None:
+            for c, v in self._x.items():
+                if grid.cells[c] == 0 and hint.cells.get(c, 0) != 0:
+                    self.prob.AddHint(v, hint.cells[c])
+
+    def _add_table(self, con, v):
+        """Add the allowed orderings of a run, if there are few enough.
+        """
+        masks = combinations(con.sum, con.length)
+        count = 1
+        for k in range(2, con.length + 1):
+            count *= k
+        if len(masks) * count > TABLE_LIMIT:
+            return False
+
+        tuples = [t for mask in masks for t in permutations(mask)]
+        self.prob.AddAllowedAssignments(v, tuples)
+        self.table_runs += 1
+        return True
+
     def solve(self):
         # solve the problem
         solver = cp_model.CpSolver()
-        solver.Solve(self.prob)
+        solver.parameters.num_search_workers = self.workers
+        if self.time_limit is not None:
+            solver.parameters.max_time_in_seconds = self.time_limit
+        status = solver.Solve(self.prob)
+        trace_count("branches", solver.NumBranches())
+        trace_count("conflicts", solver.NumConflicts())
+
+        # print the status and search statistics
+        print(f"Total time {solver.WallTime()} s, "
+              f"status {solver.StatusName(status)}, "
+              f"{solver.NumBranches()} branches, "
+              f"{solver.NumConflicts()} conflicts, "
+              f"{self.table_runs}/{len(self.grid.constraints)} table runs")
+
+        if status == cp_model.INFEASIBLE:
+            raise RuntimeError("puzzle has no solution")
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            msg = "no solution found, CP-SAT status {}".format(
+                solver.StatusName(status))
+            raise RuntimeError(msg)
 
-        # print wall time
-        print(f"Total time {solver.WallTime()} s")
+        return self._grid(solver.Value)
 
+    def solutions(self, limit=None):
+        """Return up to `limit` solutions, or all of them if limit is None.
+
+        CP-SAT enumerates the solutions with a single search worker and
+        stops as soon as the limit is reached.
+        """
+        solver = cp_model.CpSolver()
+        solver.parameters.enumerate_all_solutions = True
+        solver.parameters.num_search_workers = 1
+        if self.time_limit is not None:
+            solver.parameters.max_time_in_seconds = self.time_limit
+        collector = _Collector(self, limit)
+        status = solver.Solve(self.prob, collector)
+        trace_count("branches", solver.NumBranches())
+        trace_count("conflicts", solver.NumConflicts())
+
+        print(f"Total time {solver.WallTime()} s, "
+              f"status {solver.StatusName(status)}, "
+              f"{len(collector.results)} solutions, "
+              f"{solver.NumBranches()} branches, "
+              f"{solver.NumConflicts()} conflicts")
+
+        # the search is complete unless it was stopped by the time limit
+        if status == cp_model.UNKNOWN or (status == cp_model.FEASIBLE and
+                                          len(collector.results) != limit):
+            msg = "enumeration stopped after {} solutions".format(
+                len(collector.results))
+            raise RuntimeError(msg)
+        return collector.results
+
+    def _grid(self, value):
         # create a copy of the input grid to store the solution
         grid = self.grid.clone()
 
         # fill in the solution values
         for c in grid.cells.keys():
             if grid.cells[c] == 0:
-                grid.cells[c] = str(solver.Value(self._x[c]))
+                grid.cells[c] = value(self._x[c])
         return grid
 
-                    
-def solve_cp(grid):
-    s = Solver(grid)
-    return s.solve()
+
+class _Collector(cp_model.CpSolverSolutionCallback):
+    """Store the solutions found by CP-SAT until there are enough.
+    """
+    def __init__(self, solver, limit):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.solver = solver
+        self.limit = limit
+        self.results = []
+
+    def on_solution_callback(self):
+        self.results.append(self.solver._grid(self.Value))
+        if len(self.results) == self.limit:
+            self.StopSearch()
+
+
+def solve_cp(grid, encoding="sum", workers=0, time_limit=None, hint=None,
+             domains=None, **options):
+    """Solve with CP-SAT, see Solver for the arguments.
+
+    Options of other algorithms are ignored.
+    """
+    with trace_span("build"):
+        s = Solver(grid, encoding, workers, time_limit, hint, domains)
+    with trace_span("search"):
+        return s.solve()
 
 
-    
+def enumerate_solutions(grid, limit=None, encoding="sum", time_limit=None,
+                        domains=None, **options):
+    """Return up to `limit` solutions of a grid, all if limit is None.
+    """
+    with trace_span("build"):
+        s = Solver(grid, encoding, time_limit=time_limit, domains=domains)
+    with trace_span("search"):
+        return s.solutions(limit)
@@ -1,117 +1,263 @@
-import sys
-import pulp
+import time
+
+from .combinations import *
+from .trace import *
+
+# MILP backends: CBC through a PuLP subprocess, HiGHS in process through
+# PuLP (needs highspy) or through scipy.optimize.milp
+BACKENDS = ["cbc", "highs", "scipy"]
 
 
 class Solver:
-    def __init__(self, grid):
+    def __init__(self, grid, backend="cbc", domains=None):
+        """Build the integer program.
+
+        Arguments
+        ---------
+        grid      grid to solve
+        backend   MILP backend, one of BACKENDS
+        domains   candidate digit masks of the cells to start the presolve
+                  from, see presolve.Presolve, None for all digits
+        """
+        if backend not in BACKENDS:
+            raise RuntimeError("unknown MILP backend '{}'".format(backend))
+
+        start = time.time()
         self.grid = grid
-        self.prob = None # pulp LpProblem
-        self._x = {}     # dict of string key -> LpVariable
-
-        # make the problem object
-        self.prob = pulp.LpProblem("crosssums")
-
-        # Make a dictionary of binary variables indexed as (see
-        # self._key() for definition of key).  There are 9 variables
-        # for each grid cell.  Per cell, the variables represent
-        # whether the value in the cell is the (idx+1).  In a
-        # solution, only one of the 9 variables has value 1 and the
-        # rest have value 0.
-        for c in grid.cells.keys():
-            if grid.cells[c] == 0:
-                for idx in range(0,9):
-                    key = self.key(c, idx)
-                    v = pulp.LpVariable(key, cat="Binary")
-                    self._x[key] = v
-
-        # Add constraints for the encoding of the cells.  Each cell
-        # should have a value, meaning that the sum of the 9 variables should
-        # be 1.
-        for c in grid.cells.keys():
-            if grid.cells[c] == 0:
-                values = [self.x(c, idx) for idx in range(0,9)]
-                self.prob += pulp.lpSum(values) == 1
-
-        # Add the sum constraints in the grid.
-        for con in grid.constraints:
-            # The numbers in the cells of the constraint should be
-            # unique.  Therefore only one of the per-cell variables
-            # representing the same number can be set.
-            for idx in range(0,9):
-                v = [self.x(c, idx) for c in con.cells]
-                self.prob += pulp.lpSum(v) <= 1
-
-            # Add the constraint for the sum of the cells.
-            sum_expr = []
-            for c in con.cells:
-                cell_expr = [(idx+1)*self.x(c, idx) for idx in range(0,9)]
-                sum_expr.extend(cell_expr)
-            self.prob += pulp.lpSum(sum_expr) == con.sum
-
-    def x(self, cell, idx):
-        key = self.key(cell, idx)
-        return self._x[key]
+        self.backend = backend
+
+        # The model is kept independent of the backend.  There is a
+        # binary variable for each free cell id and digit the cell can
+        # still hold; in a solution exactly one of a cell's variables is
+        # 1.  Each row is (list of variable indices, list of coefficients,
+        # lower bound, upper bound).
+        self.columns = []  # variable index -> (cell id, digit)
+        self._x = {}       # dict of (cell id, digit) -> variable index
+        self.rows = []
+
+        # cells left with one digit by the presolve are constants, and
+        # there is no model if it finds the puzzle unsatisfiable
+        self.domains = self.presolve(domains)
+        if self.domains is not None:
+            self._build()
+
+        self.build_time = time.time() - start
+        nonzeros = sum(len(row[0]) for row in self.rows)
+        trace_count("variables", len(self.columns))
+        trace_count("constraints", len(self.rows))
+        print(f"Model {len(self.columns)} variables, {len(self.rows)} "
+              f"constraints, {nonzeros} nonzeros, "
+              f"built in {self.build_time} s")
+
+    def _build(self):
+        free = [MASK_LENGTH[mask] > 1 for mask in self.domains]
+        for i, mask in enumerate(self.domains):
+            if free[i]:
+                for d in mask_digits(mask):
+                    self._x[(i, d)] = len(self.columns)
+                    self.columns.append((i, d))
+
+        # Each free cell holds one of its digits
+        for i, mask in enumerate(self.domains):
+            if free[i]:
+                x = [self._x[(i, d)] for d in mask_digits(mask)]
+                self.rows.append((x, [1] * len(x), 1, 1))
+
+        for con in self.grid.constraints:
+            # The numbers in the cells of the constraint are unique, so
+            # at most one of the variables of a digit can be set.  Digits
+            # of fixed cells are already removed from the other cells.
+            for d in range(1, 10):
+                x = [self._x[(i, d)] for i in con.ids if (i, d) in self._x]
+                if len(x) > 1:
+                    self.rows.append((x, [1] * len(x), 0, 1))
+
+            # The free cells add up to the sum less the fixed cells
+            x = []
+            coeffs = []
+            total = con.sum
+            for i in con.ids:
+                if free[i]:
+                    for d in mask_digits(self.domains[i]):
+                        x.append(self._x[(i, d)])
+                        coeffs.append(d)
+                else:
+                    total -= MASK_SUM[self.domains[i]]
+            if x:
+                self.rows.append((x, coeffs, total, total))
+
+    def presolve(self, domains=None):
+        """Narrow the digits of each cell to those of its runs' combinations.
+
+        A run's combinations must contain the digits of its fixed cells and
+        give every cell a digit.  This is repeated until nothing changes,
+        so cells left with one digit fix the digits of their runs.
+
+        Arguments
+        ---------
+        domains   candidate digit masks to start from, None for all digits
+
+        Returns
+        -------
+        List of candidate digit masks indexed by cell id, or None if some
+        run cannot be satisfied.
+        """
+        grid = self.grid
+        if domains is None:
+            domains = [ALL_DIGITS] * len(grid.values)
+        domains = [d if value == 0 else digit_mask([value])
+                   for d, value in zip(domains, grid.values)]
+
+        changed = True
+        while changed:
+            changed = False
+            for con in grid.constraints:
+                fixed = 0
+                for i in con.ids:
+                    if MASK_LENGTH[domains[i]] == 1:
+                        if domains[i] & fixed:
+                            return None
+                        fixed |= domains[i]
+                allowed = 0
+                for mask in combinations(con.sum, con.length):
+                    if mask & fixed == fixed and \
+                            all(domains[i] & mask for i in con.ids):
+                        allowed |= mask
+                for i in con.ids:
+                    mask = domains[i] & allowed
+                    if MASK_LENGTH[domains[i]] > 1:
+                        mask &= ~fixed
+                    if mask == 0:
+                        return None
+                    if mask != domains[i]:
+                        domains[i] = mask
+                        changed = True
+        return domains
 
     def solve(self):
         # solve the problem
-        self.prob.solve(pulp.PULP_CBC_CMD(msg=False))
-        print(f"Total time {self.prob.solutionTime} s")
+        start = time.time()
+        values = self._solve_model()
+        print(f"Total time {time.time() - start} s, backend {self.backend}")
+        if values is None:
+            raise RuntimeError("puzzle has no solution")
+        return self._grid(values)
 
+    def solutions(self, limit=None):
+        """Return up to `limit` solutions, or all of them if limit is None.
+
+        After each solution a no-good cut, which forbids the digits of
+        that solution's free cells, is added and the model solved again.
+        """
+        start = time.time()
+        results = []
+        while len(results) != limit:
+            values = self._solve_model()
+            if values is None:
+                break
+            results.append(self._grid(values))
+            if not self.columns:
+                break # the presolve fixed every cell
+
+            chosen = [k for k, v in enumerate(values) if v > 0.5]
+            self.rows.append((chosen, [1] * len(chosen), 0, len(chosen) - 1))
+        print(f"Total time {time.time() - start} s, backend {self.backend}, "
+              f"{len(results)} solutions")
+        return results
+
+    def _solve_model(self):
+        # Return the column values, or None if there is no solution
+        if self.domains is None:
+            return None
+        if not self.columns:
+            return [] # the presolve fixed every cell
+        if self.backend == "scipy":
+            return self._solve_scipy()
+        return self._solve_pulp()
+
+    def _grid(self, values):
         # create a copy of the input grid to store the solution
         grid = self.grid.clone()
 
-        # fill in the solution values
-        for c in grid.cells.keys():
-            if grid.cells[c] == 0:
-                v = [(idx+1)*pulp.value(self.x(c, idx)) for idx in range(0,9)]
-                grid.cells[c] = str(sum([int(a) for a in v]))
-
+        # fill in the presolved and solution values
+        for i, mask in enumerate(self.domains):
+            if MASK_LENGTH[mask] == 1:
+                grid.values[i] = MASK_SUM[mask]
+        for k, (i, d) in enumerate(self.columns):
+            if values[k] > 0.5:
+                grid.values[i] = d
         return grid
 
-    def key(self, cell, idx):
-        """Return a key into self.x based on a cell and per-cell index"""
-        return "{}-{}-{}".format(cell[0], cell[1], idx)
-
-
-def solver_example():        
-    # Objective of the optimization.  Represents a linear expression
-    # to minimize.  Values are the coefficients of the list of
-    # variables.
-    obj = [-1, -2]
-
-    # Matrix of LHS coefficients of <= inequality constraints.
-    lhs_ineq = [[ 2,  1],  # Red constraint left side
-                [-4,  5],  # Blue constraint left side
-                [ 1, -2]]  # Yellow constraint left side
-
-    # Vector of RHS of inequality constraints.
-    rhs_ineq = [20,  # Red constraint right side
-                10,  # Blue constraint right side
-                2]  # Yellow constraint right side
-
-    # Matrix of LHS coefficients of equality constraints.
-    lhs_eq = [[-1, 5]]  # Green constraint left side
-
-    # Vector of RHS of equality constraints.
-    rhs_eq = [15]
-
-    # Vector of bounds of variables.
-    bnd = [(0, float("inf")),  # Bounds of x
-           (0, float("inf"))]  # Bounds of y
-
-    # call the solver
-    opt = opt.linprog(
-        c=obj,
-        A_ub=lhs_ineq,
-        b_ub=rhs_ineq,
-        A_eq=lhs_eq,
-        b_eq=rhs_eq,
-        bounds=bnd,
-        method="highs")
-
-    print(opt)
-                    
-def solve_linear(grid):
-    s = Solver(grid)
-    return s.solve()
-    
+    def _solve_pulp(self):
+        import pulp
+
+        prob = pulp.LpProblem("crosssums")
+        x = [pulp.LpVariable("x{}_{}".format(i, d), cat="Binary")
+             for (i, d) in self.columns]
+        for (index, coeffs, lo, hi) in self.rows:
+            expr = pulp.lpSum(c * x[k] for k, c in zip(index, coeffs))
+            if lo == hi:
+                prob += expr == lo
+            else:
+                prob += expr <= hi
+
+        if self.backend == "highs":
+            solver = pulp.HiGHS(msg=False)
+            if not solver.available():
+                raise RuntimeError("the highs backend needs highspy")
+        else:
+            solver = pulp.PULP_CBC_CMD(msg=False)
+        prob.solve(solver)
+        if prob.status == pulp.LpStatusInfeasible:
+            return None
+        if prob.status != pulp.LpStatusOptimal:
+            msg = "no solution found, status {}".format(
+                pulp.LpStatus[prob.status])
+            raise RuntimeError(msg)
+        return [v.value() for v in x]
+
+    def _solve_scipy(self):
+        import numpy as np
+        from scipy.optimize import Bounds, LinearConstraint, milp
+        from scipy.sparse import csr_array
+
+        n = len(self.columns)
+        data = []
+        indices = []
+        indptr = [0]
+        for (index, coeffs, lo, hi) in self.rows:
+            indices.extend(index)
+            data.extend(coeffs)
+            indptr.append(len(indices))
+        A = csr_array((data, indices, indptr), shape=(len(self.rows), n))
+        lo = np.array([row[2] for row in self.rows])
+        hi = np.array([row[3] for row in self.rows])
+
+        res = milp(np.zeros(n), integrality=np.ones(n), bounds=Bounds(0, 1),
+                   constraints=LinearConstraint(A, lo, hi))
+        if res.status == 2:
+            return None # infeasible
+        if res.x is None:
+            raise RuntimeError("no solution found, {}".format(res.message))
+        return res.x
+
+
+def solve_linear(grid, backend="cbc", domains=None, **options):
+    """Solve with an integer program, see Solver for the arguments.
+
+    Options of other algorithms are ignored.
+    """
+    with trace_span("build"):
+        s = Solver(grid, backend, domains)
+    with trace_span("search"):
+        return s.solve()
+
+
+def enumerate_solutions(grid, limit=None, backend="cbc", domains=None,
+                        **options):
+    """Return up to `limit` solutions of a grid, all if limit is None.
+    """
+    with trace_span("build"):
+        s = Solver(grid, backend, domains)
+    with trace_span("search"):
+        return s.solutions(limit)
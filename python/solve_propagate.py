@@ -0,0 +1,303 @@
+import collections
+import random
+import time
+
+from .combinations import *
+from .trace import *
+
+# node limit of the first search attempt, doubled on every restart
+RESTART_NODES = 100
+
+# yielded by Solver._search() when the node limit is hit
+LIMIT = "limit"
+
+
+class Solver:
+    def __init__(self, grid, domains=None):
+        """Build the propagation model.
+
+        Arguments
+        ---------
+        grid      grid to solve
+        domains   candidate masks of the cells to start from, for
+                  instance those of the presolve, None for all digits
+        """
+        self.grid = grid
+        self.coords = grid.coords # cell index -> (row,col)
+        self.runs = []       # run index -> list of cell indices
+        self.sums = []       # run index -> sum of the run
+        self.cell_runs = []  # cell index -> list of run indices
+        self.domains = []    # cell index -> mask of candidate digits
+        self.weights = []    # run index -> number of failures in the run
+        self.nodes = 0       # number of search nodes visited
+        self.random = random.Random(0) # digit order, seeded for repeatability
+
+        self.cell_runs = [[] for _ in self.coords]
+        for con in grid.constraints:
+            run = list(con.ids)
+            for i in run:
+                self.cell_runs[i].append(len(self.runs))
+            self.runs.append(run)
+            self.sums.append(con.sum)
+            self.weights.append(1)
+
+        # fixed cells have a single candidate
+        for value in grid.values:
+            if value == 0:
+                self.domains.append(ALL_DIGITS)
+            else:
+                self.domains.append(digit_mask([value]))
+        if domains is not None:
+            self.domains = [d & d2 for d, d2 in zip(self.domains, domains)]
+
+    def solve(self):
+        start = time.time()
+        solution = self.search(list(self.domains), range(len(self.runs)))
+        print(f"Total time {time.time() - start} s, {self.nodes} nodes")
+        if solution is None:
+            raise RuntimeError("puzzle has no solution")
+        return self._grid(solution)
+
+    def search(self, domains, runs, max_nodes=None):
+        """Find the first assignment of some candidate masks.
+
+        Arguments
+        ---------
+        domains    list of candidate masks, modified in place
+        runs       indices of the runs to propagate first, runs whose
+                   cells are all assigned may be left out
+        max_nodes  nodes allowed over all restarts, None for no limit
+
+        Returns
+        -------
+        List of the single digit mask of each cell, None if there is no
+        solution, or LIMIT if the search gave up.
+        """
+        domains = self.propagate(domains, runs)
+
+        # restart the search with a growing node limit, the run weights
+        # learned in one attempt steer the next
+        start = self.nodes
+        limit = RESTART_NODES
+        if max_nodes is not None:
+            limit = min(limit, max_nodes)
+        solution = next(self._search(domains, limit), None)
+        while solution is LIMIT:
+            limit *= 2
+            if max_nodes is not None:
+                left = max_nodes - (self.nodes - start)
+                if left <= 0:
+                    break
+                limit = min(limit, left)
+            solution = next(self._search(domains, limit), None)
+        return solution
+
+    def solutions(self, limit=None):
+        """Return up to `limit` solutions, or all of them if limit is None.
+
+        A single search without restarts continues after each solution,
+        so no solution is visited twice.
+        """
+        start = time.time()
+        domains = self.propagate(list(self.domains), range(len(self.runs)))
+        results = []
+        for solution in self._search(domains, None):
+            results.append(self._grid(solution))
+            if len(results) == limit:
+                break
+        print(f"Total time {time.time() - start} s, {self.nodes} nodes")
+        return results
+
+    def _grid(self, solution):
+        # create a copy of the input grid to store the solution
+        grid = self.grid.clone()
+        for i, mask in enumerate(solution):
+            grid.values[i] = MASK_SUM[mask]
+        return grid
+
+    def propagate(self, domains, runs):
+        """Narrow candidate masks until no run can narrow them further.
+
+        Arguments
+        ---------
+        domains   list of candidate masks, modified in place
+        runs      indices of the runs to check first
+
+        Returns
+        -------
+        The domains, or None if some cell is left without candidates.
+        """
+        queue = collections.deque(runs)
+        queued = [False] * len(self.runs)
+        for r in queue:
+            queued[r] = True
+
+        while queue:
+            r = queue.popleft()
+            queued[r] = False
+
+            changed = self._narrow_run(domains, r)
+            if changed is None:
+                self.weights[r] += 1
+                return None
+
+            # recheck the crossing runs of every narrowed cell
+            for i in changed:
+                for r2 in self.cell_runs[i]:
+                    if not queued[r2]:
+                        queued[r2] = True
+                        queue.append(r2)
+
+        return domains
+
+    def _narrow_run(self, domains, r):
+        """Narrow the candidates of the cells in a run.
+
+        Returns
+        -------
+        List of cells whose candidates changed, or None if unsatisfiable.
+        """
+        run = self.runs[r]
+
+        # split the run into assigned cells and free cells
+        fixed_mask = 0
+        fixed_sum = 0
+        free = []
+        union = 0
+        for i in run:
+            d = domains[i]
+            if MASK_LENGTH[d] == 1:
+                if fixed_mask & d:
+                    return None # repeated digit
+                fixed_mask |= d
+                fixed_sum += MASK_SUM[d]
+            else:
+                free.append(i)
+                union |= d
+
+        free_sum = self.sums[r] - fixed_sum
+        if not free:
+            return [] if free_sum == 0 else None
+
+        # keep the digit sets that the free cells can still hold, where
+        # every cell can take a digit of the set
+        free_domains = [domains[i] & ~fixed_mask for i in free]
+        supports = [0] * len(free)
+        required = ALL_DIGITS
+        union &= ~fixed_mask
+        for mask in combinations(free_sum, len(free), fixed_mask):
+            if mask & ~union:
+                continue
+            for d in free_domains:
+                if d & mask == 0:
+                    break
+            else:
+                for k, d in enumerate(free_domains):
+                    supports[k] |= d & mask
+                required &= mask
+
+        changed = []
+        for i, d in zip(free, supports):
+            if d == 0:
+                return None
+            if d != domains[i]:
+                domains[i] = d
+                changed.append(i)
+
+        # a required digit with a single possible cell is assigned there
+        for i in free:
+            others = 0
+            for j in free:
+                if j != i:
+                    others |= domains[j]
+            only = domains[i] & required & ~others
+            if only:
+                if MASK_LENGTH[only] > 1:
+                    return None # two required digits for one cell
+                if only != domains[i]:
+                    domains[i] = only
+                    changed.append(i)
+
+        return changed
+
+    def _search(self, domains, limit):
+        """Branch on the most constrained cell until all are assigned.
+
+        Cells are weighted by how often their runs failed to propagate
+        so that the search focuses on the hard parts of the puzzle.
+        Digits are tried in random order so that restarts explore
+        different parts of the tree.
+
+        Yields
+        ------
+        The assigned domains of each solution, then LIMIT if more than
+        `limit` nodes were visited.  A limit of None visits every node.
+        """
+        if domains is None:
+            return
+
+        # stack of (domains, cell, untried candidates)
+        stack = []
+        if limit is not None:
+            limit += self.nodes
+        while True:
+            self.nodes += 1
+            if limit is not None and self.nodes > limit:
+                yield LIMIT
+                return
+
+            # pick the free cell with the fewest candidates relative to
+            # the failures seen in its runs
+            best = None
+            best_score = None
+            for i, d in enumerate(domains):
+                length = MASK_LENGTH[d]
+                if length > 1:
+                    weight = 0
+                    for r in self.cell_runs[i]:
+                        weight += self.weights[r]
+                    # a cell outside every run has no weight and can
+                    # take any digit
+                    score = length / weight if weight else length
+                    if best is None or score < best_score:
+                        best = i
+                        best_score = score
+            if best is None:
+                yield domains # every cell is assigned
+            else:
+                stack.append((domains, best, domains[best]))
+
+            # try candidates until one propagates, backtracking as needed
+            domains = None
+            while domains is None:
+                if not stack:
+                    return
+                parent, i, untried = stack.pop()
+                if untried == 0:
+                    continue
+                bit = 1 << (self.random.choice(mask_digits(untried)) - 1)
+                stack.append((parent, i, untried & ~bit))
+
+                domains = list(parent)
+                domains[i] = bit
+                domains = self.propagate(domains, self.cell_runs[i])
+
+
+def solve_propagate(grid, domains=None, **options):
+    with trace_span("build"):
+        s = Solver(grid, domains)
+    with trace_span("search"):
+        solution = s.solve()
+    trace_count("nodes", s.nodes)
+    return solution
+
+
+def enumerate_solutions(grid, limit=None, domains=None, **options):
+    """Return up to `limit` solutions of a grid, all if limit is None.
+    """
+    with trace_span("build"):
+        s = Solver(grid, domains)
+    with trace_span("search"):
+        solutions = s.solutions(limit)
+    trace_count("nodes", s.nodes)
+    return solutions
@@ -0,0 +1,258 @@
+from array import array
+
+import numpy as np
+
+from .combinations import *
+from .solve_propagate import Solver
+from .trace import *
+from .verify import *
+
+# puzzles propagated together, which bounds the memory of the arrays
+CHUNK = 512
+
+# most digit sets of any run sum and length
+MAX_COMBINATIONS = max(len(combinations(s, n))
+                       for s in range(46) for n in range(1, 10))
+
+# popcount of each digit mask, and the digit of the masks of one digit
+POPCOUNT = np.array(MASK_LENGTH, dtype=np.int8)
+MASK_VALUE = np.where(POPCOUNT == 1, MASK_SUM, 0).astype(np.int8)
+
+# digit sets of each run sum and length, padded with empty sets
+_table = None
+
+
+class BatchSolver:
+    """Propagates the candidate digits of many puzzles at once.
+
+    The puzzles are stacked into arrays padded to the largest one: the
+    candidate mask of every cell, and for every run its sum and the
+    indices of its cells.  Each round narrows every run of every puzzle
+    with array operations, the same way solve_propagate.Solver narrows
+    one run, and intersects the candidates each cell gets from its two
+    runs.  Rounds repeat until no puzzle changes.
+
+    The arrays of the runs' cells are indexed by position in the run
+    first, so that the operations over the cells of a run combine whole
+    puzzles x runs arrays.
+    """
+    def __init__(self, grids):
+        """Stack the puzzles.
+
+        Arguments
+        ---------
+        grids   list of puzzles, they are left unchanged
+        """
+        self.grids = grids
+        ncells = max([len(g.coords) for g in grids] + [1])
+        nruns = max([len(g.constraints) for g in grids] + [1])
+        batch = len(grids)
+
+        # The cells of each puzzle are followed by a padding cell without
+        # candidates, which pads the runs' cell indices.  Each cell reads
+        # its narrowed candidates from its position in its two runs, the
+        # last position of the runs holds every digit for cells outside
+        # a run.
+        self.domains = np.zeros((batch, ncells + 1), dtype=np.int16)
+        self.cells = np.full((9, batch, nruns), ncells, dtype=np.intp)
+        self.lengths = np.zeros((batch, nruns), dtype=np.intp)
+        self.slots = np.full((batch, ncells + 1, 2), nruns * 9,
+                             dtype=np.intp)
+        self.real = np.zeros((batch, ncells + 1), dtype=bool)
+
+        # the runs of all puzzles are gathered as lists, and the position
+        # of every cell in its run is stored at once
+        run_puzzle = []
+        run_index = []
+        sums = []
+        lengths = []
+        vertical = []
+        ids = []
+        for b, grid in enumerate(grids):
+            n = len(grid.coords)
+            values = np.frombuffer(grid.values, dtype=np.int8)
+            self.domains[b, :n] = np.where(
+                values > 0, 1 << (values.astype(np.int16) - 1), ALL_DIGITS)
+            self.real[b, :n] = True
+            constraints = grid.constraints
+            run_puzzle.extend([b] * len(constraints))
+            run_index.extend(range(len(constraints)))
+            sums.extend([c.sum for c in constraints])
+            lengths.extend([c.length for c in constraints])
+            vertical.extend([c.vertical for c in constraints])
+            ids.extend([i for c in constraints for i in c.ids])
+
+        lengths = np.array(lengths, dtype=np.intp)
+        run_puzzle = np.array(run_puzzle, dtype=np.intp)
+        run_index = np.array(run_index, dtype=np.intp)
+        self.totals = np.zeros((batch, nruns), dtype=np.intp)
+        self.totals[run_puzzle, run_index] = sums
+        self.lengths[run_puzzle, run_index] = lengths
+        # sums over 45 have no digit sets
+        self.sums = np.where(self.totals <= 45, self.totals, 0)
+
+        ids = np.array(ids, dtype=np.intp)
+        puzzle = np.repeat(run_puzzle, lengths)
+        index = np.repeat(run_index, lengths)
+        first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        position = np.arange(len(ids)) - first
+        self.cells[position, puzzle, index] = ids
+        self.slots[puzzle, ids, np.repeat(np.array(vertical, dtype=np.intp),
+                                          lengths)] = position * nruns + index
+
+        # a cell outside every run takes any digit, 1 as merge() does
+        outside = (self.slots == nruns * 9).all(axis=2) & self.real
+        self.domains[outside & (self.domains == ALL_DIGITS)] = 1
+        self.valid = self.cells < ncells
+        self.failed = np.zeros(batch, dtype=bool)
+        self.rounds = 0 # number of rounds of the last propagate()
+
+    def propagate(self):
+        """Narrow the candidates of every puzzle until none changes.
+
+        Puzzles left with a cell without candidates are marked in
+        `failed`.
+        """
+        table = _combination_table()
+        # sets x puzzles x runs digit sets
+        sets = np.moveaxis(table[self.sums, self.lengths], 2, 0)
+        self.rounds = 0
+        active = ~self.failed
+        while active.any():
+            self.rounds += 1
+            d = self.domains[active]
+            rows = np.arange(len(d))[:, None]
+            narrowed = self._narrow(d[rows, self.cells[:, active]],
+                                    sets[:, active], self.valid[:, active])
+            # each cell keeps the candidates both its runs allow
+            flat = narrowed.transpose(1, 0, 2).reshape(len(d), -1)
+            flat = np.concatenate(
+                [flat, np.full((len(d), 1), ALL_DIGITS, dtype=flat.dtype)],
+                axis=1)
+            slots = self.slots[active]
+            new = d & np.take_along_axis(flat, slots[:, :, 0], axis=1) \
+                & np.take_along_axis(flat, slots[:, :, 1], axis=1)
+            new[:, -1] = 0
+
+            failed = ((new == 0) & self.real[active]).any(axis=1)
+            changed = (new != d).any(axis=1) & ~failed
+            self.domains[active] = new
+            index = np.flatnonzero(active)
+            self.failed[index[failed]] = True
+            active[index[~changed]] = False
+        trace_count("rounds", self.rounds)
+
+    def _narrow(self, cells, sets, valid):
+        # Return the candidates each run leaves to its cells, 0 where a
+        # run cannot be satisfied.  cells is 9 x puzzles x runs candidate
+        # masks, 0 for padding, sets is sets x puzzles x runs digit sets.
+        pop = POPCOUNT[cells]
+        single = np.where(pop == 1, cells, 0)
+        fixed = np.bitwise_or.reduce(single, axis=0)
+        union = np.bitwise_or.reduce(cells, axis=0)
+        repeated = single.sum(axis=0) != fixed
+
+        # a digit set is kept if every cell can take one of its digits
+        # and every digit can go in some cell
+        meets = ((cells[:, None] & sets[None]) != 0) | ~valid[:, None]
+        kept = meets.all(axis=0) & (sets & ~union == 0) & (sets != 0)
+        allowed = np.bitwise_or.reduce(np.where(kept, sets, 0), axis=0)
+        required = np.bitwise_and.reduce(np.where(kept, sets, ALL_DIGITS),
+                                         axis=0)
+
+        narrowed = cells & allowed
+        narrowed = np.where(pop > 1, narrowed & ~fixed, narrowed)
+
+        # a required digit with a single possible cell is assigned there
+        digits = (1 << np.arange(9, dtype=cells.dtype))[:, None, None]
+        holders = ((narrowed[:, None] & digits) != 0).sum(axis=0)
+        unique = ((holders == 1) * digits).sum(axis=0).astype(cells.dtype)
+        only = narrowed & required & unique
+        narrowed = np.where(only != 0, only, narrowed)
+        conflict = repeated | (POPCOUNT[only] > 1).any(axis=0)
+        return np.where(conflict, 0, narrowed)
+
+    def solutions(self):
+        """Return the solution of each puzzle, None if it has none.
+
+        Puzzles that propagation leaves with free cells are searched one
+        at a time by solve_propagate.Solver, starting from the narrowed
+        candidates.  The solutions are checked together, see check().
+        """
+        results = [None] * len(self.grids)
+        values = MASK_VALUE[self.domains]
+        searched = 0
+        for b, grid in enumerate(self.grids):
+            if self.failed[b]:
+                continue
+            n = len(grid.coords)
+            if (POPCOUNT[self.domains[b, :n]] > 1).any():
+                searched += 1
+                s = Solver(grid, self.domains[b, :n].tolist())
+                domains = s.search(list(s.domains), range(len(s.runs)))
+                if domains is None:
+                    continue
+                values[b, :n] = [MASK_SUM[d] for d in domains]
+            solution = grid.clone()
+            solution.values = array("b", values[b, :n].tobytes())
+            results[b] = solution
+        trace_count("searched", searched)
+
+        # a failed check is checked again for its messages
+        for b in np.flatnonzero(~self.check(values)):
+            if results[b] is not None:
+                check_solution(results[b], self.grids[b])
+        return results
+
+    def check(self, values):
+        """Return True for each puzzle whose cell values are a solution.
+
+        Arguments
+        ---------
+        values   puzzles x cells array of digits, 0 for the padding
+        """
+        rows = np.arange(len(values))[:, None]
+        digits = values[rows, self.cells]
+        masks = np.bitwise_or.reduce(
+            np.where(digits > 0, 1 << (digits.astype(np.int16) - 1), 0),
+            axis=0)
+        givens = np.zeros_like(values)
+        for b, grid in enumerate(self.grids):
+            givens[b, :len(grid.coords)] = grid.values
+        cells_ok = ((values >= 1) & (values <= 9) | ~self.real).all(axis=1)
+        givens_ok = ((givens == 0) | (givens == values)).all(axis=1)
+        sums_ok = (digits.sum(axis=0) == self.totals).all(axis=1)
+        unique_ok = (POPCOUNT[masks] == self.lengths).all(axis=1)
+        return cells_ok & givens_ok & sums_ok & unique_ok
+
+
+def solve_many(grids, chunk=CHUNK):
+    """Solve many puzzles with BatchSolver, `chunk` puzzles at a time.
+
+    Returns
+    -------
+    List of the solved grids, checked against the puzzles, see
+    check_solution(), with None for the puzzles that have no solution.
+    """
+    results = []
+    for start in range(0, len(grids), chunk):
+        batch = grids[start:start + chunk]
+        with trace_span("build"):
+            s = BatchSolver(batch)
+        with trace_span("propagate"):
+            s.propagate()
+        with trace_span("search"):
+            results.extend(s.solutions())
+    return results
+
+
+def _combination_table():
+    # digit sets indexed by run sum and length, padded with 0
+    global _table
+    if _table is None:
+        _table = np.zeros((46, 10, MAX_COMBINATIONS), dtype=np.int16)
+        for s in range(46):
+            for n in range(1, 10):
+                sets = combinations(s, n)
+                _table[s, n, :len(sets)] = sets
+    return _table
@@ -0,0 +1,110 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# formats of the trace file
+TRACE_FORMATS = ["json", "chrome"]
+
+# tracer recording the spans and counters of this process, None when
+# tracing is off so that trace_span() and trace_count() cost next to
+# nothing
+_tracer = None
+
+
+class Tracer:
+    """Timed spans and counters of one run.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []     # list of (name, start, duration, depth) in s
+        self.counters = {}  # dict of name -> total
+        self._depth = 0     # number of open spans
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Context manager timing a block as a span called name.
+        """
+        depth = self._depth
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._depth = depth
+            self.spans.append((name, start - self.start, end - start, depth))
+
+    def count(self, name, n=1):
+        """Add n to a counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_json(self):
+        """Return the spans, in start order, and the counters as a dict.
+        """
+        spans = [{"name": name, "start": start, "duration": duration,
+                  "depth": depth}
+                 for (name, start, duration, depth) in sorted(
+                     self.spans, key=lambda s: (s[1], s[3]))]
+        return {"spans": spans, "counters": dict(self.counters)}
+
+    def to_chrome(self):
+        """Return the trace in the Chrome trace event format.
+
+        The file can be opened in chrome://tracing or Perfetto.  Times
+        are in microseconds, and the counters are given at the end.
+        """
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = []
+        end = 0
+        for (name, start, duration, depth) in self.spans:
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                           "ts": start * 1e6, "dur": duration * 1e6})
+            end = max(end, start + duration)
+        for name, value in self.counters.items():
+            events.append({"name": name, "ph": "C", "pid": pid, "tid": tid,
+                           "ts": end * 1e6, "args": {name: value}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path, format="json"):
+        """Write the trace to a file in one of TRACE_FORMATS.
+        """
+        if format not in TRACE_FORMATS:
+            raise RuntimeError("unknown trace format '{}'".format(format))
+        data = self.to_chrome() if format == "chrome" else self.to_json()
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+
+
+def start_trace():
+    """Start recording spans and counters, and return the Tracer.
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_trace():
+    """Stop recording, and return the Tracer or None if there was none.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def trace_span(name):
+    """Return a context manager timing a block if tracing is on.
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.span(name)
+
+
+def trace_count(name, n=1):
+    """Add n to a counter if tracing is on.
+    """
+    if _tracer is not None:
+        _tracer.count(name, n)
@@ -0,0 +1,252 @@
+import csv
+
+from .grid import *
+
+# number of errors quoted by check_solution()
+MAX_QUOTED = 5
+
+
+class Verifier:
+    """Checks the solutions of a puzzle.
+
+    A solution must hold a digit 1..9 in every cell, keep the puzzle's
+    given digits, and every run must add up to its sum without repeated
+    digits.  Messages name the offending cell or constraint.
+    """
+    def __init__(self, puzzle, givens=True):
+        """
+        Arguments
+        ---------
+        puzzle   grid whose layout and given digits solutions must match
+        givens   False to only check the runs, for instance when the
+                 puzzle is itself a solution
+        """
+        self.puzzle = puzzle
+        self.constraints = list(puzzle.constraints)
+        self.givens = []
+        if givens:
+            self.givens = [(i, v) for i, v in enumerate(puzzle.values)
+                           if v != 0]
+        self._arrays = None # numpy arrays of check_batch()
+
+    def errors(self, solution):
+        """Return the list of error messages of a solution, empty if valid.
+        """
+        return self.value_errors(self._values(solution))
+
+    def value_errors(self, values):
+        """Return the error messages of the cell values of a solution.
+
+        Arguments
+        ---------
+        values   values in the order of the puzzle's cells, None if the
+                 solution has other cells
+        """
+        if values is None:
+            return ["the cells differ from the puzzle's"]
+
+        coords = self.puzzle.coords
+        errors = []
+        for i, v in enumerate(values):
+            if not 1 <= v <= 9:
+                errors.append("cell {} holds {}, not a digit 1..9".format(
+                    coord(*coords[i]), v))
+        for i, v in self.givens:
+            if values[i] != v:
+                errors.append("cell {} holds {} instead of the given {}"
+                              .format(coord(*coords[i]), values[i], v))
+        for c in self.constraints:
+            run = [values[i] for i in c.ids]
+            total = sum(run)
+            if total != c.sum:
+                errors.append("{} adds up to {} instead of {}".format(
+                    c, total, c.sum))
+            repeated = sorted(set(v for v in run if v and run.count(v) > 1))
+            if repeated:
+                errors.append("{} repeats {}".format(
+                    c, ", ".join(map(str, repeated))))
+        return errors
+
+    def check_batch(self, solutions):
+        """Check many solutions of the puzzle at once, see check_values().
+        """
+        return self.check_values([self._values(s) for s in solutions])
+
+    def check_values(self, rows):
+        """Check the cell values of many solutions at once.
+
+        The values of all solutions are stacked into one matrix, and the
+        digit range, the given digits, the sums and the repeated digits
+        of every run are checked in a single vectorized pass.  Only the
+        solutions that fail are checked again for messages.
+
+        Arguments
+        ---------
+        rows   list of values per solution, see value_errors()
+
+        Returns
+        -------
+        List of the errors of each solution, see value_errors().
+        """
+        import numpy as np
+
+        if self._arrays is None:
+            self._arrays = self._build_arrays()
+        (index, sums, lengths, given_ids, given_values, popcount) = \
+            self._arrays
+
+        n = len(self.puzzle.coords)
+        matrix = np.zeros((len(rows), n + 1), dtype=np.int32)
+        for k, values in enumerate(rows):
+            if values is not None:
+                matrix[k, :n] = values
+
+        cells_ok = ((matrix[:, :n] >= 1) & (matrix[:, :n] <= 9)).all(axis=1)
+        givens_ok = (matrix[:, given_ids] == given_values).all(axis=1)
+
+        # runs x 9 cells, padded with the zero in column n
+        digits = matrix[:, index]
+        sums_ok = (digits.sum(axis=2) == sums).all(axis=1)
+        masks = np.bitwise_or.reduce(
+            np.where(digits > 0, 1 << digits.clip(0, 9), 0), axis=2)
+        unique_ok = (popcount[masks] == lengths).all(axis=1)
+
+        valid = cells_ok & givens_ok & sums_ok & unique_ok
+        return [[] if ok and values is not None else self.value_errors(values)
+                for (ok, values) in zip(valid, rows)]
+
+    def _values(self, solution):
+        # return the solution's values in the order of the puzzle's
+        # cells, or None if the cells differ
+        coords = self.puzzle.coords
+        if solution.coords is coords or solution.coords == coords:
+            return solution.values
+        if len(solution.coords) != len(coords):
+            return None
+        try:
+            return solution.read_cells(coords)
+        except KeyError:
+            return None
+
+    def _build_arrays(self):
+        import numpy as np
+
+        n = len(self.puzzle.coords)
+        index = np.full((len(self.constraints), 9), n, dtype=np.intp)
+        for k, c in enumerate(self.constraints):
+            index[k, :c.length] = list(c.ids)
+        sums = np.array([c.sum for c in self.constraints], dtype=np.int32)
+        lengths = np.array([c.length for c in self.constraints],
+                           dtype=np.int32)
+        given_ids = np.array([i for (i, v) in self.givens], dtype=np.intp)
+        given_values = np.array([v for (i, v) in self.givens],
+                                dtype=np.int32)
+        popcount = np.array([bin(m).count("1") for m in range(1 << 10)],
+                            dtype=np.int32)
+        return (index, sums, lengths, given_ids, given_values, popcount)
+
+
+def verify(solution, puzzle=None):
+    """Return the error messages of a solution, empty if it is valid.
+
+    Arguments
+    ---------
+    solution   solved grid
+    puzzle     grid of the puzzle to check the given digits against, None
+               to only check the runs
+    """
+    if puzzle is None:
+        return Verifier(solution, givens=False).errors(solution)
+    return Verifier(puzzle).errors(solution)
+
+
+def check_solution(solution, puzzle=None):
+    """Raise RuntimeError if a solution is invalid, see verify().
+
+    Returns
+    -------
+    The solution.
+    """
+    errors = verify(solution, puzzle)
+    if errors:
+        more = ""
+        if len(errors) > MAX_QUOTED:
+            more = " and {} more".format(len(errors) - MAX_QUOTED)
+        raise RuntimeError("invalid solution: {}{}".format(
+            "; ".join(errors[:MAX_QUOTED]), more))
+    return solution
+
+
+def verify_files(paths, puzzle=None):
+    """Verify solution CSV files in bulk.
+
+    Files with the same layout, which is the text with the digits of the
+    cells left out, are parsed into a Grid once.  The digits of each
+    file are read from its CSV rows, and the solutions of each layout
+    are checked together, see Verifier.check_values().
+
+    Arguments
+    ---------
+    paths    list of solution CSV files
+    puzzle   puzzle grid whose runs and given digits all solutions must
+             keep, None to check each solution against its own runs
+
+    Returns
+    -------
+    List of dictionaries with the solution path, status ("valid",
+    "invalid" or "error") and the list of errors, in the order of paths.
+    """
+    records = [None] * len(paths)
+    layouts = {} # dict of layout -> (errors, verifier, coords, members)
+    verifier = Verifier(puzzle) if puzzle is not None else None
+    for k, path in enumerate(paths):
+        try:
+            with open(path, newline="") as f:
+                rows = [[cell.strip() for cell in row]
+                        for row in csv.reader(f)]
+            key = tuple(tuple("0" if len(cell) == 1 and cell.isdigit()
+                              else cell for cell in row) for row in rows)
+            if key not in layouts:
+                layouts[key] = _layout(rows, verifier) + ([],)
+            (errors, v, coords, members) = layouts[key]
+            if not errors:
+                members.append((k, [int(rows[i][j]) for (i, j) in coords]))
+        except (OSError, RuntimeError, ValueError) as e:
+            errors = ["{}: {}".format(type(e).__name__, e)]
+            records[k] = {"solution": path, "status": "error",
+                          "errors": errors}
+            continue
+        if errors:
+            records[k] = {"solution": path, "status": "invalid",
+                          "errors": errors}
+
+    for (errors, v, coords, members) in layouts.values():
+        if not members:
+            continue
+        results = v.check_values([values for (k, values) in members])
+        for (k, values), errors in zip(members, results):
+            records[k] = {"solution": paths[k],
+                          "status": "invalid" if errors else "valid",
+                          "errors": errors}
+    return records
+
+
+def _layout(rows, verifier):
+    # return the layout errors, the verifier and the cells of solutions
+    # given as CSV rows
+    grid = Grid()
+    grid.parse_text("\n".join(",".join(row) for row in rows))
+    if verifier is None:
+        return ([], Verifier(grid, givens=False), grid.coords)
+
+    puzzle = verifier.puzzle
+    if set(grid.coords) != set(puzzle.coords):
+        return (["the cells differ from the puzzle's"], verifier, None)
+    if _runs(grid) != _runs(puzzle):
+        return (["the runs differ from the puzzle's"], verifier, None)
+    return ([], verifier, puzzle.coords)
+
+
+def _runs(grid):
+    return sorted((c.row, c.col, c.vertical, c.length, c.sum)
+                  for c in grid.constraints)
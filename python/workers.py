@@ -0,0 +1,194 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import signal
+import stat
+import time
+
+from .algorithms import *
+from .decompose import *
+from .grid import *
+
+# seconds a worker is given to stop the workers it started before it is
+# killed
+KILL_GRACE = 0.2
+
+# True in a worker that is being terminated
+_terminating = False
+
+
+def warm(algos):
+    """Import the modules of algorithms ahead of the first puzzle.
+
+    Workers forked afterwards share the imported modules.  Algorithms
+    whose modules cannot be imported are skipped, solving with them
+    reports the error.
+
+    Returns
+    -------
+    List of the algorithms that were imported.
+    """
+    loaded = []
+    for algo in algos:
+        try:
+            load_algorithm(algo)
+            loaded.append(algo)
+        except Exception:
+            pass
+    return loaded
+
+
+def solve_text(text, algo, **options):
+    """Solve the CSV text of a puzzle and describe the outcome.
+
+    Arguments
+    ---------
+    text      CSV text of the puzzle
+    algo      name of the algorithm
+    options   options of the algorithm, see solve_decomposed()
+
+    Returns
+    -------
+    Dictionary with the algorithm, status ("solved" or "error"), time in
+    seconds and either the solution CSV text or the error.
+    """
+    record = {"algo": algo}
+    start = time.perf_counter()
+    try:
+        # the backends print progress which would garble the output
+        with contextlib.redirect_stdout(io.StringIO()):
+            grid = Grid()
+            grid.parse_text(text)
+            solution = solve_decomposed(grid, algo, **options)
+        record["status"] = "solved"
+        record["solution"] = solution.to_text()
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = "{}: {}".format(type(e).__name__, e)
+    record["time"] = time.perf_counter() - start
+    return record
+
+
+class Worker:
+    """Child process solving puzzles sent through a pipe.
+
+    The child leads its own process group, so kill() also stops the
+    programs it runs, such as the CBC process started by pulp.  It is
+    not a daemon so that it can start workers itself, it exits when its
+    pipe is closed.
+    """
+    def __init__(self, algos=()):
+        """Start the process.
+
+        Arguments
+        ---------
+        algos   algorithms to import before the first puzzle, see warm()
+        """
+        (self.conn, child_conn) = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main, args=(child_conn, list(algos)))
+        self.process.start()
+        child_conn.close()
+
+    def send(self, text, algo, options=None):
+        """Send a puzzle to solve, see solve_text() for the arguments.
+        """
+        self.conn.send((text, algo, options or {}))
+
+    def recv(self):
+        """Return the record of the puzzle sent last, waiting for it.
+
+        Raises EOFError if the process died.
+        """
+        return self.conn.recv()
+
+    def fileno(self):
+        """Return the file descriptor that is readable with a record.
+        """
+        return self.conn.fileno()
+
+    def kill(self):
+        """Stop the process and everything it started, see kill_workers().
+        """
+        kill_workers([self])
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            # the group is gone, or not yet created by the child
+            if self.process.is_alive():
+                os.kill(self.process.pid, sig)
+
+    def close(self):
+        """Let the process exit once it is done with its puzzle.
+        """
+        self.conn.close()
+        self.process.join()
+
+
+def kill_workers(workers):
+    """Stop worker processes and everything they started.
+
+    The process groups are terminated first, so that a worker running
+    workers of its own, in groups of their own, can stop them.  What is
+    left of the groups is killed after KILL_GRACE seconds, or at once in
+    a worker that is itself being terminated.
+    """
+    if not _terminating:
+        for worker in workers:
+            worker._signal(signal.SIGTERM)
+        deadline = time.monotonic() + KILL_GRACE
+        for worker in workers:
+            worker.process.join(max(0, deadline - time.monotonic()))
+    for worker in workers:
+        worker._signal(signal.SIGKILL)
+        worker.process.join()
+        worker.conn.close()
+
+
+def _worker_main(conn, algos):
+    # a new session makes this process the leader of a process group
+    # holding it and its children
+    os.setsid()
+    # the parent handles interrupts and stops the workers, termination
+    # unwinds so that the workers started here are stopped too
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _terminate)
+    _release_sockets(conn.fileno())
+    warm(algos)
+    while True:
+        try:
+            (text, algo, options) = conn.recv()
+        except EOFError:
+            return
+        conn.send(solve_text(text, algo, **options))
+
+
+def _terminate(signum, frame):
+    global _terminating
+    _terminating = True
+    raise SystemExit(1)
+
+
+def _release_sockets(keep):
+    # A forked worker inherits the sockets of its parent, such as the
+    # connections of a server, which would then stay open until the
+    # worker exits.  They are replaced with /dev/null rather than closed
+    # so that their descriptors are not reused while objects of the
+    # parent still refer to them.
+    try:
+        fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+    except OSError:
+        fds = range(3, 1024)
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in fds:
+        if fd <= 2 or fd == keep or fd == null:
+            continue
+        try:
+            if stat.S_ISSOCK(os.fstat(fd).st_mode):
+                os.dup2(null, fd)
+        except OSError:
+            pass
+    os.close(null)
@@ -0,0 +1,51 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, "examples")
+
+# the package lives in python/ and is installed as crosssums
+if "crosssums" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "crosssums", os.path.join(ROOT, "python", "__init__.py"),
+        submodule_search_locations=[os.path.join(ROOT, "python")])
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["crosssums"] = _module
+    _spec.loader.exec_module(_module)
+
+from crosssums.grid import Grid
+
+
+def example(name):
+    """Return the path of a puzzle in examples/."""
+    return os.path.join(EXAMPLES, name)
+
+
+def parse(text):
+    """Return the grid of the text of a CSV file."""
+    grid = Grid()
+    grid.parse_text(text)
+    return grid
+
+
+def is_solution(puzzle, solution):
+    """Return True if a grid solves a puzzle."""
+    for c in solution.constraints:
+        values = solution.read_cells(c.cells)
+        if sum(values) != c.sum or len(set(values)) != len(values):
+            return False
+    return all(v == 0 or solution.cells[c] == v
+               for c, v in puzzle.cells.items())
+
+
+@pytest.fixture
+def puzzle():
+    """Return a function parsing a puzzle in examples/."""
+    def load(name):
+        grid = Grid()
+        grid.parse_csv(example(name))
+        return grid
+    return load
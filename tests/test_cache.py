@@ -0,0 +1,69 @@
+from array import array
+
+from conftest import parse
+
+from crosssums.cache import Cache, fingerprint
+
+PUZZLE = """\
+*,17\\,21\\,*
+\\13,0,0,21\\
+\\18,0,0,0
+\\13,0,0,0
+\\15,0,0,0
+"""
+
+
+def transpose(text):
+    """Return a puzzle text mirrored along its diagonal."""
+    rows = [row.split(",") for row in text.splitlines()]
+    cols = max(len(row) for row in rows)
+    rows = [row + ["*"] * (cols - len(row)) for row in rows]
+    out = []
+    for j in range(cols):
+        cells = []
+        for row in rows:
+            cell = row[j]
+            if "\\" in cell:
+                v, h = cell.split("\\")
+                cell = h + "\\" + v
+            cells.append(cell)
+        out.append(",".join(cells))
+    return "\n".join(out) + "\n"
+
+
+def shift(text, rows, cols):
+    """Return a puzzle text moved down and right by blocked cells."""
+    lines = ["*," * cols + line for line in text.splitlines()]
+    width = len(lines[0].split(","))
+    return "\n".join([",".join(["*"] * width)] * rows + lines) + "\n"
+
+
+def test_fingerprint_invariant():
+    key, _ = fingerprint(parse(PUZZLE))
+    assert fingerprint(parse(transpose(PUZZLE)))[0] == key
+    assert fingerprint(parse(shift(PUZZLE, 2, 3)))[0] == key
+    assert fingerprint(parse(shift(transpose(PUZZLE), 1, 0)))[0] == key
+
+
+def test_fingerprint_differs():
+    key, _ = fingerprint(parse(PUZZLE))
+    assert fingerprint(parse(PUZZLE.replace("\\15", "\\16")))[0] != key
+    assert fingerprint(parse(PUZZLE.replace("\\18,0", "\\18,5")))[0] != key
+
+
+def test_cache_transposed(tmp_path):
+    grid = parse(PUZZLE)
+    solution = grid.clone()
+    solution.values = array("b", range(1, len(solution.values) + 1))
+
+    cache = Cache(str(tmp_path / "cache.sqlite"))
+    try:
+        assert cache.get(grid) is None
+        cache.put(grid, solution)
+
+        other = parse(transpose(PUZZLE))
+        found = cache.get(other)
+        for (r, c), value in solution.cells.items():
+            assert found.cells[(c, r)] == value
+    finally:
+        cache.close()
@@ -0,0 +1,45 @@
+import itertools
+import pickle
+
+import pytest
+
+from crosssums import combinations as comb
+
+
+def test_table():
+    # every entry agrees with the digit sets found by brute force
+    for length in range(1, 10):
+        sets = {}
+        for digits in itertools.combinations(range(1, 10), length):
+            sets.setdefault(sum(digits), []).append(comb.digit_mask(digits))
+        for total in range(0, 47):
+            masks = sorted(sets.get(total, []))
+            for excluded in range(comb.ALL_DIGITS + 1):
+                expected = tuple(m for m in masks if not m & excluded)
+                assert comb.combinations(total, length, excluded) == expected
+    assert comb.combinations(3, 2, comb.digit_mask([2])) == ()
+    assert list(comb.permutations(comb.digit_mask([1, 3]))) == \
+        [(1, 3), (3, 1)]
+
+
+def test_masks():
+    assert comb.digit_mask([1, 9]) == 0x101
+    assert comb.mask_digits(0x101) == [1, 9]
+    assert comb.MASK_SUM[0x101] == 10 and comb.MASK_LENGTH[0x101] == 2
+    for digit in (0, 10):
+        with pytest.raises(RuntimeError, match="invalid digit"):
+            comb.digit_mask([digit])
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / "table.pickle")
+    comb.save_table(path)
+    assert comb.load_table(path) == comb.build_table() == comb.TABLE
+
+    comb.save_table(path, {(3, 2, 0): (3,)})
+    assert comb.load_table(path) == {(3, 2, 0): (3,)}
+
+    with open(path, "wb") as f:
+        pickle.dump({"version": comb.TABLE_VERSION + 1, "table": {}}, f)
+    with pytest.raises(RuntimeError, match="unsupported"):
+        comb.load_table(path)
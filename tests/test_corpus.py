@@ -0,0 +1,65 @@
+import pytest
+
+from conftest import example, parse
+
+from crosssums import batch, corpus
+from crosssums import generate as gen
+
+NAMES = ["puzzle1", "puzzle2", "puzzle3"]
+
+
+def layout(grid):
+    return (grid.coords, list(grid.values),
+            [(c.row, c.col, c.vertical, c.length, c.sum)
+             for c in grid.constraints])
+
+
+def test_round_trip(puzzle, tmp_path):
+    path = str(tmp_path / "puzzles.xsc")
+    grids = [(n, puzzle(n + ".csv")) for n in NAMES]
+    grids.append(("unique", gen.generate(12, 14, seed=2, unique=True)))
+    # a run without a sum cell, and a cell outside every run
+    grids.append(("open", parse("*,*,3\\\n*,4\\,0\n\\3,0,0\n*,*,*,0\n")))
+    assert corpus.write_corpus(path, grids) == len(grids)
+
+    with corpus.Corpus(path) as c:
+        assert len(c) == len(grids)
+        for k, (name, grid) in enumerate(grids):
+            assert c.name(k) == name
+            assert layout(c[k]) == layout(parse(grid.to_text()))
+
+        record = c.record(-1)
+        assert (record.rows, record.cols) == (4, 4)
+        assert bytes(record.values) == bytes(4)
+        assert list(record.hsums) == [0, 3, 0]
+        assert list(record.vsums) == [3, 4, 0]
+        del record
+
+        with pytest.raises(IndexError):
+            c.record(len(grids))
+
+
+def test_files(tmp_path):
+    path = str(tmp_path / "examples.xsc")
+    paths = [example(n + ".csv") for n in NAMES]
+    assert corpus.pack_files(paths, path) == 3
+    outputs = corpus.unpack_files(path, str(tmp_path / "csv"))
+    assert outputs == [str(tmp_path / "csv" / (n + ".csv")) for n in NAMES]
+    for source, output in zip(paths, outputs):
+        assert layout(corpus.read_puzzle(output)) == \
+            layout(corpus.read_puzzle(source))
+
+    entries = batch.find_puzzles([path])
+    assert entries == [path + "#0", path + "#1", path + "#2"]
+    assert layout(corpus.read_puzzle(entries[1])) == \
+        layout(corpus.read_puzzle(paths[1]))
+    assert batch.output_paths(entries, "out") == [
+        "out/puzzle1.solution.csv", "out/puzzle2.solution.csv",
+        "out/puzzle3.solution.csv"]
+
+
+def test_not_corpus(tmp_path):
+    path = tmp_path / "puzzle.xsc"
+    path.write_bytes(b"*,3\\\n" * 10)
+    with pytest.raises(RuntimeError, match="not a puzzle corpus"):
+        corpus.Corpus(str(path))
@@ -0,0 +1,91 @@
+from array import array
+
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import decompose
+
+# a board with 13 solutions
+SMALL = """\
+*,19\\,23\\
+\\11,0,0
+\\15,0,0
+\\13,0,0
+\\3,0,0
+"""
+
+# 3 in two cells is {1,2} and 4 in two cells is {1,3}, one solution
+FORCED = """\
+*,3\\,4\\
+\\3,0,0
+\\4,0,0
+*,*,*
+*,*,*
+"""
+
+# SMALL and FORCED side by side, which share no run
+DISCONNECTED = "\n".join(a + ",*," + b for a, b in zip(
+    SMALL.splitlines(), FORCED.splitlines())) + "\n"
+
+
+def test_components():
+    grid = parse(DISCONNECTED)
+    parts = decompose.components(grid)
+    assert [len(p) for p in parts] == [6, 4]
+    # every run is in one component, which starts at its first run
+    assert sorted(map(id, sum(parts, []))) == \
+        sorted(map(id, grid.constraints))
+    firsts = [grid.constraints.index(p[0]) for p in parts]
+    assert firsts == sorted(firsts)
+    assert all(min(grid.constraints.index(c) for c in p) == f
+               for p, f in zip(parts, firsts))
+    assert len(decompose.components(parse(SMALL))) == 1
+
+
+def test_subgrid_merge():
+    grid = parse(DISCONNECTED)
+    parts = [decompose.subgrid(grid, c) for c in decompose.components(grid)]
+    assert [len(p.coords) for p in parts] == [8, 4]
+    assert set(parts[1].coords) == {(1, 5), (1, 6), (2, 5), (2, 6)}
+    assert all(c.length == 2 for c in parts[1].constraints)
+
+    parts[1].values = array("b", [2, 1, 1, 3])
+    merged = decompose.merge(grid, parts[1:])
+    assert [merged.cells[c] for c in parts[1].coords] == [2, 1, 1, 3]
+    assert all(merged.cells[c] == 0 for c in parts[0].coords)
+    assert all(v == 0 for v in grid.values)
+
+    # a cell outside every run is given 1
+    grid = parse("*,*,3\\\n*,1\\,0\n\\3,0,0\n*,*,*,0\n")
+    assert decompose.merge(grid, []).cells[(3, 3)] == 1
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("algo", ["custom", "propagate"])
+def test_solve_enumerate(algo, jobs):
+    grid = parse(DISCONNECTED)
+    for presolve in (True, False):
+        solution = decompose.solve_decomposed(grid, algo, jobs=jobs,
+                                              presolve=presolve)
+        assert is_solution(grid, solution)
+        solutions = decompose.enumerate_decomposed(grid, algo, jobs=jobs,
+                                                   presolve=presolve)
+        assert len(solutions) == 13
+        assert len({tuple(s.values) for s in solutions}) == 13
+        assert all(is_solution(grid, s) for s in solutions)
+        assert len(decompose.enumerate_decomposed(
+            grid, algo, 5, jobs=jobs, presolve=presolve)) == 5
+
+
+def test_no_solution():
+    # the columns of the right board need a repeated digit
+    grid = parse(SMALL.replace("\\3,0,0", "\\3,0,0,*,4\\,4\\")
+                 + "*,*,*,\\3,0,0\n*,*,*,\\5,0,0\n")
+    assert len(decompose.components(grid)) == 2
+    for jobs in (1, 2):
+        with pytest.raises(RuntimeError, match="no solution"):
+            decompose.solve_decomposed(grid, "custom", jobs=jobs,
+                                       presolve=False)
+        assert decompose.enumerate_decomposed(grid, "custom", jobs=jobs,
+                                              presolve=False) == []
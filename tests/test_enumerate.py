@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import decompose
+from crosssums.algorithms import load_enumerator
+
+# modules the optional backends need
+BACKEND_MODULES = {"cp": "ortools", "ip": "pulp"}
+
+# generated boards with 305 and 13 solutions
+BOARD = """\
+*,17\\,21\\,*
+\\13,0,0,21\\
+\\18,0,0,0
+\\13,0,0,0
+\\15,0,0,0
+"""
+SMALL = """\
+*,19\\,23\\
+\\11,0,0
+\\15,0,0
+\\13,0,0
+\\3,0,0
+"""
+
+
+@pytest.mark.parametrize("algo", ["custom", "propagate", "cp"])
+def test_counts_agree(algo):
+    if algo in BACKEND_MODULES:
+        pytest.importorskip(BACKEND_MODULES[algo])
+    grid = parse(BOARD)
+    solutions = load_enumerator(algo)(grid)
+    assert len(solutions) == 305
+    assert all(is_solution(grid, s) for s in solutions)
+    assert len({tuple(s.values) for s in solutions}) == 305
+
+
+@pytest.mark.parametrize("algo", ["custom", "propagate", "cp", "ip"])
+def test_counts_small(algo):
+    if algo in BACKEND_MODULES:
+        pytest.importorskip(BACKEND_MODULES[algo])
+    assert len(load_enumerator(algo)(parse(SMALL))) == 13
+
+
+@pytest.mark.parametrize("algo", ["custom", "propagate"])
+def test_limit(algo):
+    assert len(load_enumerator(algo)(parse(BOARD), 2)) == 2
+
+
+def test_components_multiply():
+    # two copies of SMALL side by side have 13 * 13 solutions
+    rows = SMALL.splitlines()
+    text = "\n".join(r + ",*," + r for r in rows) + "\n"
+    grid = parse(text)
+    assert len(decompose.components(grid)) == 2
+    assert len(decompose.enumerate_decomposed(grid, "propagate")) == 169
+    assert len(decompose.enumerate_decomposed(grid, "propagate", 20)) == 20
+
+
+def test_unique(puzzle):
+    grid = puzzle("puzzle3.csv")
+    assert len(decompose.enumerate_decomposed(grid, "propagate", 2)) == 1
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from crosssums import generate as gen
+from crosssums.decompose import enumerate_decomposed
+from crosssums.solve_propagate import solve_propagate
+
+from conftest import is_solution
+
+
+def test_fill_is_valid():
+    rnd = random.Random(5)
+    white = gen._layout(120, 120, 0.2, rnd)
+    values = gen._fill(white, rnd)
+    for vertical in (True, False):
+        for run in gen._runs(white, vertical):
+            digits = [values[c] for c in run]
+            assert 2 <= len(run) <= gen.MAX_RUN
+            assert len(set(digits)) == len(digits)
+
+
+def test_solvable():
+    grid = gen.generate(15, 15, 0.25, seed=1)
+    assert all(v == 0 for v in grid.values)
+    assert is_solution(grid, solve_propagate(grid))
+
+
+def test_seed_repeats():
+    a = gen.generate(20, 30, seed=4, unique=True)
+    b = gen.generate(20, 30, seed=4, unique=True)
+    assert a.to_text() == b.to_text()
+
+
+def test_unique():
+    for seed in range(5):
+        grid = gen.generate(20, 20, seed=seed, unique=True)
+        assert any(v != 0 for v in grid.values)
+        assert len(enumerate_decomposed(grid, "propagate", 2)) == 1
+
+
+def test_generate_files(tmp_path):
+    paths = sorted(gen.generate_files(10, 12, 3, str(tmp_path), seed=7,
+                                      jobs=1))
+    names = [gen.puzzle_name(10, 12, s) + ".csv" for s in (7, 8, 9)]
+    assert paths == [str(tmp_path / n) for n in names]
+
+
+def test_invalid():
+    for (rows, cols, density) in [(2, 2, 0.25), (10, 2, 0.25),
+                                  (10, 10, 1.0), (10, 10, -0.1)]:
+        with pytest.raises(RuntimeError):
+            gen.generate(rows, cols, density, seed=0)
+    # a layout with a run is unlikely at a density near 1
+    with pytest.raises(RuntimeError, match="attempts"):
+        gen.generate(3, 3, 0.999, seed=0)
+    assert gen.generate(3, 3, 0.0, seed=0).constraints
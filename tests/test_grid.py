@@ -0,0 +1,105 @@
+import pytest
+
+from conftest import example, parse
+
+from crosssums import generate as gen
+from crosssums.constraint import Constraint
+from crosssums.grid import Grid
+
+# 3 in two cells is {1,2} and 4 in two cells is {1,3}
+SMALL = "*,3\\,4\\\n\\3,0,0\n\\4,0,0\n"
+
+
+def test_clone_independent():
+    grid = parse(SMALL)
+    copy = grid.clone()
+    copy.cells[(1, 1)] = 2
+    assert grid.cells[(1, 1)] == 0 and copy.cells[(1, 1)] == 2
+
+    # a cell added to either grid leaves the other's layout unchanged
+    copy.cells[(3, 1)] = 5
+    assert (3, 1) not in grid.cells and len(grid.cells) == 4
+    grid.add_cell((0, 3), 7)
+    assert (0, 3) not in copy.cells and len(copy.cells) == 5
+    assert [len(g.constraints) for g in (grid, copy)] == [4, 4]
+
+
+def test_cells_setter():
+    grid = parse(SMALL)
+    copy = grid.clone()
+    old = list(grid.constraints)
+
+    # the cells are renumbered in a new order
+    grid.cells = {(2, 2): 3, (2, 1): 1, (1, 2): 1, (1, 1): 2}
+    assert grid.coords == [(2, 2), (2, 1), (1, 2), (1, 1)]
+    assert [list(c.ids) for c in grid.constraints] == \
+        [[3, 1], [2, 0], [3, 2], [1, 0]]
+    assert all(a is not b for a, b in zip(grid.constraints, old))
+    assert [sum(grid.values[i] for i in c.ids)
+            for c in grid.constraints] == [3, 4, 3, 4]
+
+    # the clone keeps its numbering and constraints
+    assert copy.coords == [(1, 1), (1, 2), (2, 1), (2, 2)]
+    assert copy.constraints == old
+    assert [list(c.ids) for c in copy.constraints] == \
+        [[0, 2], [1, 3], [0, 1], [2, 3]]
+    assert list(copy.values) == [0, 0, 0, 0]
+
+
+def test_overlaps():
+    grid = parse(SMALL)
+    with pytest.raises(RuntimeError, match="overlaps"):
+        grid.add_constraint(Constraint(3, 1, 1, True, 2))
+    with pytest.raises(RuntimeError, match="not in the grid"):
+        grid.add_constraint(Constraint(3, 1, 1, False, 3))
+
+
+def test_adjacency():
+    # the one pass adjacency agrees with testing every pair
+    grid = gen.generate(30, 30, seed=2)
+    for c in grid.constraints:
+        expected = [o for o in grid.constraints if c.intersects(o)]
+        assert sorted(map(id, grid.adjacency[c])) == \
+            sorted(map(id, expected))
+
+
+@pytest.mark.parametrize("name", ["puzzle1.csv", "puzzle2.csv",
+                                  "puzzle3.csv"])
+def test_csv_round_trip(name, tmp_path):
+    grid = Grid()
+    grid.parse_csv(example(name))
+    path = str(tmp_path / name)
+    grid.write_csv(path)
+    with open(path) as f:
+        assert f.read() == grid.to_text()
+
+    again = Grid()
+    again.parse_csv(path)
+    assert again.to_text() == grid.to_text()
+    assert again.coords == grid.coords
+    assert list(again.values) == list(grid.values)
+    assert [(c.sum, c.row, c.col, c.vertical, c.length)
+            for c in again.constraints] == \
+        [(c.sum, c.row, c.col, c.vertical, c.length)
+         for c in grid.constraints]
+
+
+def test_given_digits_round_trip():
+    text = "*,3\\,4\\\n\\3,2,0\n\\4,0,3\n"
+    # the written grid ends with a row and a column of blocked cells
+    written = parse(text).to_text()
+    assert written.splitlines()[1] == "\\3,2,0,*"
+    assert list(parse(written).values) == [2, 0, 0, 3]
+    assert parse(written).to_text() == written
+
+
+@pytest.mark.parametrize("text, message", [
+    ("*,3\\\n\\3,x\n", "invalid cell 'x' in cell"),
+    ("*,3\\\n\\3,10\n", "invalid cell '10' in cell"),
+    ("*,3\\1\\2\n*,0\n", "invalid constraint in cell"),
+    ("*,0\\\n*,0\n", "invalid vertical sum '0' in cell"),
+    ("*,*\n\\3,*\n", "horizontal sum in cell .* not next to empty cell"),
+])
+def test_invalid_cells(text, message):
+    with pytest.raises(RuntimeError, match=message):
+        parse(text)
@@ -0,0 +1,49 @@
+from array import array
+
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import parallel
+from crosssums.solve import constraint_adjacency, get_ordered_constraints
+
+# the columns need a repeated digit
+INFEASIBLE = "*,4\\,4\\\n\\3,0,0\n\\5,0,0\n"
+
+
+def test_split(puzzle):
+    grid = puzzle("puzzle1.csv")
+    constraints = get_ordered_constraints(grid, constraint_adjacency(grid),
+                                          "combos")
+    first = constraints[0]
+    children = parallel.split(grid, constraints, array("b", grid.values))
+    assert children
+    for values in children:
+        digits = [values[i] for i in first.ids]
+        assert sum(digits) == first.sum
+        assert len(set(digits)) == len(digits)
+        # only the cells of the first constraint are filled in
+        assert [v for i, v in enumerate(values) if i not in first.ids] == \
+            [v for i, v in enumerate(grid.values) if i not in first.ids]
+
+    # the solution is in one of the subproblems
+    solution = parallel.solve_parallel(grid, workers=1)
+    filling = [solution.values[i] for i in first.ids]
+    assert filling in [[c[i] for i in first.ids] for c in children]
+    assert parallel.split(grid, constraints, solution.values) is None
+
+
+@pytest.mark.parametrize("split_nodes", [parallel.SPLIT_NODES, 1])
+def test_solve(puzzle, split_nodes):
+    # a budget of one node splits every subproblem again
+    for name in ["puzzle1.csv", "puzzle2.csv", "puzzle3.csv"]:
+        grid = puzzle(name)
+        solution = parallel.solve_parallel(grid, workers=2,
+                                           split_nodes=split_nodes)
+        assert is_solution(grid, solution)
+
+
+def test_infeasible():
+    for workers in (1, 2):
+        with pytest.raises(RuntimeError, match="no solution"):
+            parallel.solve_parallel(parse(INFEASIBLE), workers=workers)
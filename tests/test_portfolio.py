@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import algorithms, portfolio, solve
+
+
+def test_race(puzzle, tmp_path):
+    log = str(tmp_path / "portfolio.jsonl")
+    grid = puzzle("puzzle3.csv")
+    for _ in range(2):
+        result = portfolio.solve_portfolio(grid, ["custom", "propagate"],
+                                           log=log)
+        assert is_solution(grid, result)
+        assert result.coords == grid.coords
+
+    with open(log) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 2
+    assert records[0]["winner"] in ["custom", "propagate"]
+    assert records[0]["cells"] == len(grid.coords)
+    stats = portfolio.portfolio_stats(log)
+    assert sum(s["wins"] for s in stats.values()) == 2
+
+
+def test_no_solution(tmp_path):
+    grid = parse("*,4\\,4\\\n\\3,0,0\n\\5,0,0\n")
+    with pytest.raises(RuntimeError, match="no engine solved"):
+        portfolio.solve_portfolio(grid, ["custom", "propagate"], log="")
+
+
+def test_engines(puzzle):
+    with pytest.raises(RuntimeError, match="cannot race itself"):
+        portfolio.solve_portfolio(puzzle("puzzle3.csv"), ["portfolio"])
+
+
+def solve_wrong(grid, **options):
+    # an engine answering with a wrong digit
+    solution = solve.solve(grid)
+    solution.values[0] = solution.values[0] % 9 + 1
+    return solution
+
+
+def test_invalid_solution(puzzle, monkeypatch):
+    # the workers are forked and find the engine in this module
+    monkeypatch.setitem(algorithms.ALGORITHMS, "wrong",
+                        "test_portfolio:solve_wrong")
+    grid = puzzle("puzzle3.csv")
+    with pytest.raises(RuntimeError, match="wrong: .*invalid solution"):
+        portfolio.solve_portfolio(grid, ["wrong"], log="")
+    result = portfolio.solve_portfolio(grid, ["wrong", "custom"], log="")
+    assert is_solution(grid, result)
+
+
+def test_read_solution(puzzle):
+    grid = puzzle("puzzle3.csv")
+    assert portfolio._read_solution(grid, grid.to_text()).coords is \
+        grid.coords
+    assert portfolio._read_solution(grid, "*,1\n") is None
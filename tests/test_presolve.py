@@ -0,0 +1,68 @@
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import decompose
+from crosssums.combinations import digit_mask
+from crosssums.presolve import Presolve
+
+# modules the optional backends need
+BACKEND_MODULES = {"cp": "ortools", "ip": "pulp"}
+
+# 3 in two cells is {1,2} and 4 in two cells is {1,3}, which fixes every
+# cell
+FORCED = "*,3\\,4\\\n\\3,0,0\n\\4,0,0\n"
+
+# the columns need a repeated digit
+INFEASIBLE = "*,4\\,4\\\n\\3,0,0\n\\5,0,0\n"
+
+# a board with 13 solutions, 3 in two cells is {1,2} which narrows the
+# columns
+PARTIAL = """\
+*,19\\,23\\
+\\11,0,0
+\\15,0,0
+\\13,0,0
+\\3,0,0
+"""
+
+
+def test_forced():
+    grid = parse(FORCED)
+    p = Presolve(grid)
+    assert p.domains == [digit_mask([2]), digit_mask([1]),
+                         digit_mask([1]), digit_mask([3])]
+    assert list(p.grid.values) == [2, 1, 1, 3]
+    assert list(grid.values) == [0, 0, 0, 0]
+    assert p.before == {"cells": 4, "candidates": 36}
+    assert p.after == {"cells": 0, "candidates": 0}
+
+
+def test_partial():
+    p = Presolve(parse(PARTIAL))
+    assert p.after == {"cells": 8, "candidates": 39}
+    assert p.domains[6] == p.domains[7] == digit_mask([1, 2])
+
+
+def test_infeasible():
+    with pytest.raises(RuntimeError, match="no solution"):
+        Presolve(parse(INFEASIBLE))
+    assert decompose.enumerate_decomposed(parse(INFEASIBLE), "custom") == []
+
+
+@pytest.mark.parametrize("algo", ["custom", "propagate", "cp", "ip"])
+def test_backends(puzzle, algo):
+    # every backend solves from the presolved grid and candidates
+    if algo in BACKEND_MODULES:
+        pytest.importorskip(BACKEND_MODULES[algo])
+    for name in ["puzzle1.csv", "puzzle2.csv", "puzzle3.csv"]:
+        grid = puzzle(name)
+        for presolve in (True, False):
+            solution = decompose.solve_decomposed(grid, algo,
+                                                  presolve=presolve)
+            assert is_solution(grid, solution)
+
+    grid = parse(PARTIAL)
+    counts = [len(decompose.enumerate_decomposed(grid, algo, presolve=p))
+              for p in (False, True)]
+    assert counts == [13, 13]
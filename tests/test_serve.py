@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from conftest import example
+
+from crosssums import serve
+
+# 3 in 2 twice in a column of a 4 in 2 and a 5 in 2 has no solution
+INFEASIBLE = "*,4\\,4\\\n\\3,0,0\n\\5,0,0\n"
+
+
+def run(coroutine_fnc, **options):
+    # run a coroutine taking a started server and its port
+    async def main():
+        server = serve.Server(algos=["custom", "propagate"], **options)
+        await server.start(port=0)
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            return await coroutine_fnc(server, port)
+        finally:
+            server.close()
+    return asyncio.run(main())
+
+
+def read(name):
+    with open(example(name)) as f:
+        return f.read().encode("utf-8")
+
+
+def test_solve():
+    async def check(server, port):
+        (status, record) = await serve.request(
+            "POST", "/solve?algo=custom", read("puzzle3.csv"), port=port)
+        assert status == 200
+        assert record["status"] == "solved" and record["algo"] == "custom"
+
+        body = json.dumps({"puzzle": INFEASIBLE}).encode("utf-8")
+        (status, record) = await serve.request("POST", "/solve", body,
+                                               port=port)
+        assert status == 422 and "no solution" in record["error"]
+
+        (status, record) = await serve.request(
+            "POST", "/solve?algo=nope", read("puzzle3.csv"), port=port)
+        assert status == 400
+        for timeout in ["nan", "inf", "-1", "0"]:
+            (status, record) = await serve.request(
+                "POST", "/solve?timeout=" + timeout, read("puzzle3.csv"),
+                port=port)
+            assert status == 400 and "timeout" in record["error"]
+
+        # a negative body length is refused before reading the body
+        (reader, writer) = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /solve HTTP/1.1\r\nContent-Length: -1\r\n\r\n")
+        await writer.drain()
+        assert (await reader.readline()).split()[1] == b"400"
+        writer.close()
+        await writer.wait_closed()
+        (status, record) = await serve.request("GET", "/health", port=port)
+        assert status == 200 and record["served"] == 2
+    run(check, workers=1)
+
+
+def test_timeout_replaces_worker():
+    async def check(server, port):
+        # a timeout of 1 us stops any puzzle
+        (status, _) = await serve.request(
+            "POST", "/solve?timeout=0.000001", read("puzzle1.csv"),
+            port=port)
+        assert status == 504
+        (status, record) = await serve.request(
+            "POST", "/solve", read("puzzle3.csv"), port=port)
+        assert status == 200
+        return server.health()
+    health = run(check, workers=1)
+    assert health["timeouts"] == 1 and health["idle"] == 1
+
+
+def test_backpressure():
+    async def check(server, port):
+        body = read("puzzle1.csv")
+        results = await asyncio.gather(*[
+            serve.request("POST", "/solve?algo=custom", body, port=port)
+            for _ in range(4)])
+        return sorted(status for (status, _) in results)
+    statuses = run(check, workers=1, queue_size=1)
+    assert statuses[:2] == [200, 200] and 503 in statuses
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from conftest import parse
+
+from crosssums import generate as gen
+from crosssums.session import Session
+from crosssums.verify import verify
+
+# the solution of PUZZLE is 2 1 / 1 3
+PUZZLE = "*,3\\,4\\\n\\3,0,0\n\\4,0,0\n"
+
+
+def test_edits(puzzle):
+    grid = puzzle("puzzle3.csv")
+    session = Session(grid)
+    state = session.state()
+    assert state["conflicts"] == [] and not state["solved"]
+    assert len(state["hints"]) == len(grid.coords)
+    assert verify(session.to_grid(), grid) == []
+
+    # a digit of the solution keeps it without a search
+    cell = grid.coords[0]
+    state = session.set_cell(cell, state["hints"][cell])
+    assert session.nodes == 0
+    assert cell not in state["hints"]
+
+    # a repeated digit in the same run
+    other = grid.coords[1]
+    state = session.set_cell(other, session.grid.cells[cell])
+    assert "Constraint(1,2) horizontal length(2) repeats {}".format(
+        session.grid.cells[cell]) in state["conflicts"]
+    assert state["hints"] == {}
+
+    state = session.clear_cell(other)
+    assert state["conflicts"] == []
+    assert all(v == 0 for v in grid.values)
+
+    with pytest.raises(RuntimeError, match="not a numerical cell"):
+        session.set_cell((0, 0), 1)
+
+
+def test_set_sum(puzzle):
+    grid = puzzle("puzzle3.csv")
+    session = Session(grid)
+    c = grid.constraints[0]
+    state = session.set_sum(c.cells[0], c.vertical, 2)
+    assert state["conflicts"] == ["{} cannot add up to 2".format(c)]
+    assert c.sum != 2
+
+    state = session.set_sum(c.cells[0], c.vertical, c.sum)
+    assert state["conflicts"] == []
+    assert verify(session.to_grid(), grid) == []
+
+
+def test_new_solution():
+    session = Session(gen.generate(12, 12, seed=3))
+    grid = gen.generate(12, 12, seed=3)
+    solution = session.to_grid()
+
+    # a digit the previous solution does not have is repaired around
+    # the edit, or reported as a conflict
+    rnd = random.Random(0)
+    for cell in rnd.sample(grid.coords, 20):
+        digit = solution.cells[cell] % 9 + 1
+        state = session.set_cell(cell, digit)
+        if state["conflicts"] or state["unknown"]:
+            state = session.clear_cell(cell)
+            assert state["conflicts"] == [] and state["unknown"] == []
+        else:
+            assert state["hints"].get(cell) is None
+            assert verify(session.to_grid(), session.grid) == []
+        solution = session.to_grid()
+
+
+def test_no_solution():
+    session = Session(parse(PUZZLE))
+    state = session.set_cell((1, 1), 1)
+    assert state["conflicts"] == [
+        "no solution for the runs from Constraint(1,1) vertical length(2)"]
+    state = session.set_cell((1, 1), 2)
+    assert state["conflicts"] == []
+    assert state["hints"] == {(1, 2): 1, (2, 1): 1, (2, 2): 3}
+    for cell, digit in state["hints"].items():
+        state = session.set_cell(cell, digit)
+    assert state["solved"]
@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import solve
+
+
+@pytest.mark.parametrize("name", ["puzzle1.csv", "puzzle2.csv", "puzzle3.csv"])
+def test_examples(puzzle, name):
+    grid = puzzle(name)
+    before = list(grid.values)
+    result = solve.solve(grid)
+    assert is_solution(grid, result)
+    assert list(grid.values) == before
+
+
+def test_given_digits():
+    # 3 in two cells is {1,2}, the given 2 leaves one solution
+    grid = parse("*,3\\,4\\\n\\3,2,0\n\\4,0,0\n")
+    solutions = solve.enumerate_solutions(grid)
+    assert [list(s.values) for s in solutions] == [[2, 1, 1, 3]]
+
+
+@pytest.mark.parametrize("text", [
+    "*,4\\,4\\\n\\3,0,0\n\\5,0,0\n",
+    "*,3\\,4\\\n\\3,1,1\n\\4,0,0\n",
+    "*,3\\,4\\\n\\3,2,1\n\\4,1,2\n",
+])
+def test_no_solution(text):
+    assert solve.Solver(parse(text)).solve() is None
+    with pytest.raises(RuntimeError, match="puzzle has no solution"):
+        solve.solve(parse(text))
+
+
+def test_verbose(puzzle, capsys):
+    solve.solve(puzzle("puzzle3.csv"))
+    assert "Satisfying" not in capsys.readouterr().out
+    solve.solve(puzzle("puzzle3.csv"), verbose=True)
+    assert "Satisfying constraint 0/" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("order", solve.ORDERINGS)
+def test_orderings(puzzle, order):
+    grid = puzzle("puzzle2.csv")
+    adj = solve.constraint_adjacency(grid)
+    ordered = solve.get_ordered_constraints(grid, adj, order)
+    assert sorted(map(id, ordered)) == sorted(map(id, grid.constraints))
+    assert ordered == solve.get_ordered_constraints(grid, adj, order)
+    assert is_solution(grid, solve.solve(grid, order=order))
+    assert len(solve.enumerate_solutions(parse(
+        "*,3\\,4\\\n\\3,0,0\n\\4,0,0\n"), order=order)) == 1
+
+
+def test_combos_order():
+    # 3 in 2 is {1,2} and 4 in 2 is {1,3}, ahead of 10 and 11 in 2
+    grid = parse("*,4\\,10\\\n\\3,0,0\n\\11,0,0\n")
+    adj = solve.constraint_adjacency(grid)
+    first = solve.get_ordered_constraints(grid, adj, "combos")[0]
+    assert (first.sum, first.length) in [(3, 2), (4, 2)]
+
+
+def test_unknown_order(puzzle):
+    with pytest.raises(RuntimeError, match="unknown constraint ordering"):
+        solve.solve(puzzle("puzzle3.csv"), order="random")
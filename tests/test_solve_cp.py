@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import is_solution, parse
+
+pytest.importorskip("ortools")
+
+from crosssums import solve_cp
+
+# a board with 13 solutions
+SMALL = """\
+*,19\\,23\\
+\\11,0,0
+\\15,0,0
+\\13,0,0
+\\3,0,0
+"""
+
+
+@pytest.mark.parametrize("name", ["puzzle1.csv", "puzzle2.csv",
+                                  "puzzle3.csv"])
+def test_encodings_agree(puzzle, name):
+    # the examples have one solution, which both encodings find
+    grid = puzzle(name)
+    solutions = [solve_cp.solve_cp(grid, encoding, workers=1)
+                 for encoding in solve_cp.ENCODINGS]
+    assert all(is_solution(grid, s) for s in solutions)
+    assert list(solutions[0].values) == list(solutions[1].values)
+    assert solve_cp.Solver(grid, "table").table_runs > 0
+
+
+def test_enumerate_encodings():
+    grid = parse(SMALL)
+    found = [{tuple(s.values)
+              for s in solve_cp.enumerate_solutions(grid, encoding=encoding)}
+             for encoding in solve_cp.ENCODINGS]
+    assert len(found[0]) == 13 and found[0] == found[1]
+
+
+@pytest.mark.parametrize("encoding", solve_cp.ENCODINGS)
+def test_infeasible(encoding):
+    # the columns need a repeated digit
+    grid = parse("*,4\\,4\\\n\\3,0,0\n\\5,0,0\n")
+    with pytest.raises(RuntimeError, match="no solution"):
+        solve_cp.solve_cp(grid, encoding)
+    assert solve_cp.enumerate_solutions(grid, encoding=encoding) == []
+
+
+def test_unknown_encoding(puzzle):
+    with pytest.raises(RuntimeError, match="unknown CP encoding"):
+        solve_cp.Solver(puzzle("puzzle3.csv"), "bits")
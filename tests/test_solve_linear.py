@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import parse
+
+from crosssums import solve
+from crosssums.combinations import MASK_LENGTH, MASK_SUM, digit_mask
+from crosssums.solve_linear import Solver
+
+
+def test_presolve_forced_cells(puzzle):
+    # puzzle3 is solved by narrowing the runs' combinations alone
+    grid = puzzle("puzzle3.csv")
+    s = Solver(grid)
+    assert all(MASK_LENGTH[d] == 1 for d in s.domains)
+    assert s.columns == []
+    expected = solve.solve(grid)
+    assert [MASK_SUM[d] for d in s.domains] == list(expected.values)
+
+
+def test_presolve_narrows():
+    # 3 in two cells is {1,2} and 4 in two cells is {1,3}
+    grid = parse("*,3\\,4\\\n\\3,0,0\n\\4,0,0\n")
+    s = Solver(grid)
+    assert s.domains == [digit_mask([2]), digit_mask([1]),
+                         digit_mask([1]), digit_mask([3])]
+
+
+@pytest.mark.parametrize("text", [
+    "*,4\\,4\\\n\\3,0,0\n\\5,0,0\n",   # the columns need a repeated digit
+    "*,3\\,4\\\n\\3,0,0\n\\4,0,2\n",   # a fixed digit outside the run's sets
+    "*,3\\,4\\\n\\3,1,1\n\\4,0,0\n",   # repeated fixed digits
+])
+def test_presolve_infeasible(text):
+    s = Solver(parse(text))
+    assert s.domains is None
+    assert s.solutions() == []
+    with pytest.raises(RuntimeError):
+        s.solve()
+
+
+def test_unknown_backend(puzzle):
+    with pytest.raises(RuntimeError):
+        Solver(puzzle("puzzle3.csv"), backend="glpk")
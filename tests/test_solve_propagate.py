@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import is_solution, parse
+
+from crosssums import solve, solve_propagate
+
+
+@pytest.mark.parametrize("name", ["puzzle2.csv", "puzzle3.csv"])
+def test_matches_custom(puzzle, name):
+    grid = puzzle(name)
+    expected = solve.solve(grid)
+    result = solve_propagate.solve_propagate(grid)
+    assert list(result.values) == list(expected.values)
+
+
+def test_solves_puzzle1(puzzle):
+    # the custom solver takes minutes on this one
+    grid = puzzle("puzzle1.csv")
+    assert is_solution(grid, solve_propagate.solve_propagate(grid))
+
+
+def test_no_solution():
+    grid = parse("*,4\\,4\\\n\\3,0,0\n\\5,0,0\n")
+    with pytest.raises(RuntimeError):
+        solve_propagate.solve_propagate(grid)
+
+
+def test_cell_outside_runs():
+    grid = parse("*,3\\,4\\,*\n\\3,0,0,*\n\\4,0,0,*\n*,*,*,0\n")
+    result = solve_propagate.solve_propagate(grid)
+    assert is_solution(grid, result)
+    assert 1 <= result.cells[(3, 3)] <= 9
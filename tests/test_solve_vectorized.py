@@ -0,0 +1,65 @@
+from conftest import example, is_solution, parse
+
+from crosssums import batch
+from crosssums import generate as gen
+from crosssums.combinations import MASK_LENGTH
+from crosssums.solve_vectorized import BatchSolver, solve_many
+
+# the columns need a repeated digit
+INFEASIBLE = "*,4\\,4\\\n\\3,0,0\n\\5,0,0\n"
+
+# a board with 13 solutions, which propagation leaves open
+OPEN = """\
+*,19\\,23\\
+\\11,0,0
+\\15,0,0
+\\13,0,0
+\\3,0,0
+"""
+
+
+def test_propagate():
+    # unique puzzles of different sizes are solved by propagation alone
+    grids = [gen.generate(size, size, seed=size, unique=True)
+             for size in (6, 8, 10)]
+    s = BatchSolver(grids + [parse(INFEASIBLE), parse(OPEN)])
+    s.propagate()
+    assert list(s.failed) == [False, False, False, True, False]
+    for b, grid in enumerate(grids):
+        assert all(MASK_LENGTH[d] == 1
+                   for d in s.domains[b, :len(grid.coords)])
+    assert any(MASK_LENGTH[d] > 1 for d in s.domains[4])
+
+
+def test_solve_many(puzzle):
+    grids = [puzzle(n) for n in ["puzzle1.csv", "puzzle2.csv",
+                                 "puzzle3.csv"]]
+    # a cell outside every run
+    grids += [parse(INFEASIBLE), parse(OPEN),
+              parse("*,*,3\\\n*,1\\,0\n\\3,0,0\n*,*,*,0\n")]
+    solutions = solve_many(grids, chunk=4)
+    assert [s is None for s in solutions] == [False] * 3 + [True, False, False]
+    for grid, solution in zip(grids, solutions):
+        assert solution is None or is_solution(grid, solution)
+    assert solutions[-1].cells[(3, 3)] == 1
+
+
+def test_solve_batch(puzzle, tmp_path):
+    path = str(tmp_path / "infeasible.csv")
+    with open(path, "w") as f:
+        f.write(INFEASIBLE)
+    paths = [path, "missing.csv", str(tmp_path)]
+    records = list(batch.solve_vectorized(paths, chunk=2))
+    assert [r["puzzle"] for r in records] == paths
+    assert [r["status"] for r in records] == ["error"] * 3
+    assert records[0]["error"] == "RuntimeError: puzzle has no solution"
+
+    # one at a time the errors are those of the solve subcommand
+    for algo in ["custom", "propagate"]:
+        record = batch.solve_puzzle(path, algo)
+        assert record["status"] == "error"
+        assert record["error"].startswith("RuntimeError: puzzle has no "
+                                          "solution")
+    record = batch.solve_puzzle(example("puzzle1.csv"), "custom")
+    assert record["status"] == "solved"
+    assert is_solution(puzzle("puzzle1.csv"), parse(record["solution"]))
@@ -0,0 +1,50 @@
+import json
+
+from crosssums import solve, trace
+
+
+def test_off_by_default(puzzle):
+    assert trace.stop_trace() is None
+    solve.solve(puzzle("puzzle3.csv"))
+    with trace.trace_span("nothing"):
+        trace.trace_count("nothing")
+    assert trace.stop_trace() is None
+
+
+def test_spans_and_counters(puzzle):
+    tracer = trace.start_trace()
+    try:
+        with trace.trace_span("outer"):
+            solve.solve(puzzle("puzzle3.csv"))
+    finally:
+        assert trace.stop_trace() is tracer
+
+    data = tracer.to_json()
+    depths = {s["name"]: s["depth"] for s in data["spans"]}
+    assert depths["outer"] == 0
+    assert depths["search"] == 1
+    assert data["counters"]["nodes"] > 0
+    outer = data["spans"][0]
+    assert outer["name"] == "outer"
+    assert all(s["start"] >= outer["start"] and
+               s["start"] + s["duration"] <= outer["start"] + outer["duration"]
+               for s in data["spans"][1:])
+
+
+def test_write(tmp_path):
+    tracer = trace.Tracer()
+    with tracer.span("a"):
+        tracer.count("nodes", 3)
+    tracer.count("nodes", 2)
+
+    path = tmp_path / "trace.json"
+    tracer.write(str(path))
+    data = json.loads(path.read_text())
+    assert [s["name"] for s in data["spans"]] == ["a"]
+    assert data["counters"] == {"nodes": 5}
+
+    tracer.write(str(path), "chrome")
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [(e["name"], e["ph"]) for e in events] == [("a", "X"),
+                                                      ("nodes", "C")]
+    assert events[1]["args"] == {"nodes": 5}
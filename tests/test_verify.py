@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import parse
+
+from crosssums import decompose, solve, verify
+
+PUZZLE = "*,3\\,4\\\n\\3,2,0\n\\4,0,0\n"
+SOLUTION = "*,3\\,4\\\n\\3,2,1\n\\4,1,3\n"
+
+
+def test_valid():
+    assert verify.verify(parse(SOLUTION)) == []
+    assert verify.verify(parse(SOLUTION), parse(PUZZLE)) == []
+
+
+def test_errors():
+    errors = verify.verify(parse("*,3\\,4\\\n\\3,1,2\n\\4,2,0\n"),
+                           parse(PUZZLE))
+    assert errors == [
+        "cell (2,2) holds 0, not a digit 1..9",
+        "cell (1,1) holds 1 instead of the given 2",
+        "Constraint(1,2) vertical length(2) adds up to 2 instead of 4",
+        "Constraint(2,1) horizontal length(2) adds up to 2 instead of 4",
+    ]
+
+
+def test_check_solution():
+    with pytest.raises(RuntimeError, match=r"Constraint\(1,1\) vertical "
+                       r"length\(2\) repeats 1"):
+        verify.check_solution(parse("*,3\\,4\\\n\\3,1,2\n\\4,1,3\n"))
+
+
+def test_batch(puzzle):
+    grid = puzzle("puzzle2.csv")
+    solution = solve.solve(grid)
+    wrong = solution.clone()
+    wrong.values[3] = wrong.values[3] % 9 + 1
+    verifier = verify.Verifier(grid)
+    results = verifier.check_batch([solution, wrong, solution])
+    assert results[0] == [] and results[2] == []
+    assert results[1] == verifier.errors(wrong) != []
+
+
+def test_files(puzzle, tmp_path):
+    grid = puzzle("puzzle2.csv")
+    solution = solve.solve(grid)
+    paths = []
+    for k in range(3):
+        paths.append(str(tmp_path / "s{}.csv".format(k)))
+        solution.write_csv(paths[-1])
+    wrong = solution.clone()
+    wrong.values[0] = wrong.values[0] % 9 + 1
+    wrong.write_csv(paths[1])
+    parse(SOLUTION).write_csv(str(tmp_path / "other.csv"))
+    paths += [str(tmp_path / "other.csv"), str(tmp_path / "missing.csv")]
+
+    records = verify.verify_files(paths)
+    assert [r["status"] for r in records] == [
+        "valid", "invalid", "valid", "valid", "error"]
+    records = verify.verify_files(paths[:4], grid)
+    assert [r["status"] for r in records] == [
+        "valid", "invalid", "valid", "invalid"]
+    assert records[3]["errors"] == ["the cells differ from the puzzle's"]
+
+
+@pytest.mark.parametrize("algo", ["custom", "propagate"])
+def test_cell_outside_runs(algo):
+    # cell (3,3) is in no run and takes any digit, on a board of one
+    # component and on a board of two
+    for text in [PUZZLE + "*,*,*,0\n",
+                 "*,3\\,4\\,*,3\\\n\\3,0,0,\\1,0\n\\4,0,0,*,0\n"
+                 "*,*,*,0,*\n"]:
+        grid = parse(text)
+        solution = decompose.solve_decomposed(grid, algo)
+        assert verify.verify(solution, grid) == []
+        assert 1 <= solution.cells[(3, 3)] <= 9